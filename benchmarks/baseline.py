@@ -0,0 +1,83 @@
+"""Saved baselines shared by the benchmark scripts.
+
+A benchmark adds the --save-baseline, --baseline and --threshold options with
+add_baseline_arguments and hands its results to check_baseline, which writes
+them out or reports the metrics that regressed against a previous run.
+"""
+
+import argparse
+import json
+from typing import Dict, List
+
+
+def add_baseline_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the baseline options to a benchmark's command line.
+
+    Args:
+        parser (argparse.ArgumentParser): The benchmark's argument parser
+    """
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare with a saved baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed relative regression (default 0.2)"
+    )
+
+
+def compare(
+    result: Dict[str, float],
+    baseline: Dict[str, float],
+    metrics: Dict[str, bool],
+    threshold: float,
+) -> List[str]:
+    """Lists the metrics that regressed beyond the threshold.
+
+    Args:
+        result (Dict[str, float]): The current run
+        baseline (Dict[str, float]): The saved baseline run
+        metrics (Dict[str, bool]): The compared metrics, and whether higher
+            values are better
+        threshold (float): Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        List[str]: One description per regressed metric
+    """
+    regressions = []
+    for name, higher_is_better in metrics.items():
+        current, previous = result.get(name), baseline.get(name)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(f"{name}: {previous:.1f} -> {current:.1f} ({change:+.0%})")
+    return regressions
+
+
+def check_baseline(
+    result: Dict[str, float], metrics: Dict[str, bool], args: argparse.Namespace
+) -> int:
+    """Saves the results and compares them with a baseline, as the options ask.
+
+    Args:
+        result (Dict[str, float]): The current run
+        metrics (Dict[str, bool]): The compared metrics, see compare
+        args (argparse.Namespace): The parsed command line, see add_baseline_arguments
+
+    Returns:
+        int: 1 if a metric regressed beyond the threshold, otherwise 0
+    """
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(result, baseline, metrics, args.threshold)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
@@ -0,0 +1,116 @@
+"""Benchmark of HTML text extraction on saved documentation pages.
+
+Compares the previous full-document path (BeautifulSoup + get_text) with the
+streaming extractor on each available backend, reporting time per page, peak
+Python memory and the size of the extracted text.
+
+Usage:
+    python benchmarks/bench_extraction.py [page.html ...] [--repeat N] [--chunk-size BYTES]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from extraction import StreamingExtractor, resolve_backend  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def beautifulsoup_full(html: str, chunk_size: int) -> str:
+    """The original fetch_url path: build a full tree, then get_text()."""
+    return BeautifulSoup(html, "html.parser").get_text()
+
+
+def streaming(backend: str) -> Callable[[str, int], str]:
+    """Builds a runner feeding the page to StreamingExtractor in chunks."""
+
+    def run(html: str, chunk_size: int) -> str:
+        extractor = StreamingExtractor(backend)
+        for start in range(0, len(html), chunk_size):
+            extractor.feed(html[start : start + chunk_size])
+        return extractor.close()
+
+    return run
+
+
+def measure(
+    runner: Callable[[str, int], str], html: str, repeat: int, chunk_size: int
+) -> Tuple[float, int, int]:
+    """Times a runner and records its peak memory.
+
+    Args:
+        runner: The extraction function to measure
+        html: The page HTML
+        repeat: Number of timed runs; the best one is reported
+        chunk_size: Characters per fed chunk for streaming runners
+
+    Returns:
+        Tuple[float, int, int]: Best time in ms, peak traced memory in bytes,
+            and extracted text length
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        runner(html, chunk_size)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    text = runner(html, chunk_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak, len(text)
+
+
+def main(paths: List[str], repeat: int, chunk_size: int) -> None:
+    """Runs every extraction path over every page and prints a table.
+
+    Args:
+        paths: HTML files to benchmark
+        repeat: Number of timed runs per page and path
+        chunk_size: Characters per fed chunk for streaming runners
+    """
+    runners = [("bs4 html.parser (full tree)", beautifulsoup_full)]
+    runners.append(("streaming html.parser", streaming("html.parser")))
+    if resolve_backend("lxml") == "lxml":
+        runners.append(("streaming lxml", streaming("lxml")))
+
+    header = (
+        f"{'page':<24} {'path':<30} {'size KB':>8} "
+        f"{'time ms':>9} {'peak KB':>9} {'text KB':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            html = file.read()
+        for name, runner in runners:
+            elapsed, peak, text_length = measure(runner, html, repeat, chunk_size)
+            print(
+                f"{os.path.basename(path):<24} {name:<30} {len(html) / 1024:>8.1f} "
+                f"{elapsed:>9.2f} {peak / 1024:>9.1f} {text_length / 1024:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "pages", nargs="*", help="HTML files (default: benchmarks/fixtures/*.html)"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per page")
+    parser.add_argument(
+        "--chunk-size", type=int, default=16384, help="Characters per streamed chunk"
+    )
+    args = parser.parse_args()
+    main(
+        args.pages or sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))),
+        args.repeat,
+        args.chunk_size,
+    )
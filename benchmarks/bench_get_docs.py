@@ -0,0 +1,277 @@
+"""End-to-end benchmark of get_docs against a local search provider and docs site.
+
+Starts a static documentation site on localhost serving the saved fixture
+pages, replaces DuckDuckGo with an in-process fake search provider, injects
+latency into both, and drives get_docs_impl from concurrent callers. The
+search and host rate limiters are lifted unless --rate-limits is given. Reports
+p50/p95/p99 latency, throughput and peak RSS, and can compare the run with a
+saved baseline to catch regressions before an upgrade.
+
+Usage:
+    python benchmarks/bench_get_docs.py [--callers N] [--requests N] [--warm] [--rate-limits]
+    python benchmarks/bench_get_docs.py --save-baseline baseline.json
+    python benchmarks/bench_get_docs.py --baseline baseline.json [--threshold 0.2]
+"""
+
+import argparse
+import asyncio
+import glob
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache  # noqa: E402
+import indexing  # noqa: E402
+import services  # noqa: E402
+from main import get_docs_impl  # noqa: E402
+from baseline import add_baseline_arguments, check_baseline  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Number of distinct pages the fake site serves
+SITE_PAGES = 50
+# Rate and burst that make a token bucket never wait
+UNLIMITED = 1e9
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {"p95_ms": False, "p99_ms": False, "throughput_rps": True, "peak_rss_kb": False}
+
+
+class DocsSite:
+    """A static documentation site on localhost with injected latency.
+
+    Page N serves fixture N modulo the number of fixtures, with its title
+    made unique so that every URL has its own content.
+    """
+
+    def __init__(self, fixtures: List[str], latency: float, jitter: float):
+        """Creates the site; call start() to begin serving.
+
+        Args:
+            fixtures (List[str]): HTML documents to serve
+            latency (float): Seconds to wait before answering each request
+            jitter (float): Maximum extra random delay in seconds
+        """
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(latency + random.uniform(0, jitter))
+                try:
+                    number = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+                except ValueError:
+                    self.send_error(404)
+                    return
+                html = fixtures[number % len(fixtures)].replace(
+                    "<title>", f"<title>Page {number} - ", 1
+                )
+                body = html.encode("utf-8")
+                site.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading once its output budget was met
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}/docs"
+
+    def start(self) -> None:
+        """Starts serving in a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def fake_search_provider(site_url: str, latency: float, jitter: float):
+    """Builds a drop-in replacement for the DDGS class.
+
+    Results are derived from a hash of the query, so the same query always
+    returns the same pages and different queries spread over the site.
+
+    Args:
+        site_url (str): Base URL of the local docs site
+        latency (float): Seconds each search takes
+        jitter (float): Maximum extra random delay in seconds
+
+    Returns:
+        type: A class with the DDGS(timeout=...).text(query, max_results=...) interface
+    """
+
+    class FakeDDGS:
+        calls = 0
+
+        def __init__(self, timeout: Optional[int] = None):
+            pass
+
+        def text(self, query: str, max_results: int = 10) -> List[Dict[str, str]]:
+            time.sleep(latency + random.uniform(0, jitter))
+            FakeDDGS.calls += 1
+            words = [term for term in query.split() if not term.startswith("site:")]
+            first = zlib.crc32(" ".join(words).encode("utf-8")) % SITE_PAGES
+            return [
+                {"href": f"{site_url}/page/{(first + offset) % SITE_PAGES}"}
+                for offset in range(max_results)
+            ]
+
+    return FakeDDGS
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Returns the peak resident set size of this process in KB, if available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def drive(callers: int, requests: int, queries: int, library: str) -> Dict[str, float]:
+    """Runs get_docs_impl from concurrent callers and measures latency.
+
+    Args:
+        callers (int): Number of concurrent callers
+        requests (int): Total number of calls across all callers
+        queries (int): Number of distinct queries cycled through
+        library (str): The library every call searches
+
+    Returns:
+        Dict[str, float]: Latency percentiles, throughput and error count
+    """
+    pending = iter(range(requests))
+    latencies: List[float] = []
+    errors = 0
+
+    async def caller() -> None:
+        nonlocal errors
+        for number in pending:
+            start = time.perf_counter()
+            result = await get_docs_impl(f"benchmark topic {number % queries}", library)
+            latencies.append(time.perf_counter() - start)
+            if result.startswith("❌") or not result:
+                errors += 1
+
+    services.get_http_client()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(caller() for _ in range(callers)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await services.close_http_client()
+        services.shutdown_search_executor()
+
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_rps": requests / elapsed,
+        "errors": errors,
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    """Runs the benchmark and prints the report.
+
+    Args:
+        args (argparse.Namespace): The parsed command line
+
+    Returns:
+        int: The process exit code, 1 if a regression was found
+    """
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as file:
+            fixtures.append(file.read())
+
+    site = DocsSite(fixtures, args.fetch_latency / 1000, args.jitter / 1000)
+    site.start()
+    fake = fake_search_provider(site.url, args.search_latency / 1000, args.jitter / 1000)
+
+    # Keep the run hermetic: fake search, no offline index, throwaway caches
+    logging.getLogger("docs").setLevel(logging.WARNING)
+    services.DDGS = fake
+    indexing.LOCAL_INDEX_ENABLED = False
+    cache.PAGE_CACHE_ENABLED = args.warm
+    cache.SEARCH_CACHE_ENABLED = args.warm
+    # The rate limiters would otherwise be what is measured, since the fake
+    # upstreams answer far faster than the real ones may be asked
+    if not args.rate_limits:
+        services.SEARCH_RATE_LIMIT = services.SEARCH_RATE_BURST = UNLIMITED
+        services.HOST_RATE_LIMIT = services.HOST_RATE_BURST = UNLIMITED
+        services.reset_upstream_state()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache.PAGE_CACHE_PATH = os.path.join(directory, "pages.sqlite3")
+        try:
+            result = asyncio.run(
+                drive(args.callers, args.requests, args.queries, args.library)
+            )
+        finally:
+            cache.close_page_cache()
+            site.stop()
+
+    result["peak_rss_kb"] = peak_rss_kb() or 0
+    result["searches"] = fake.calls
+    result["page_requests"] = site.requests
+
+    print(
+        f"callers={args.callers} requests={args.requests} queries={args.queries} "
+        f"warm={args.warm} search={args.search_latency}ms fetch={args.fetch_latency}ms"
+    )
+    print(f"  p50          {result['p50_ms']:>10.1f} ms")
+    print(f"  p95          {result['p95_ms']:>10.1f} ms")
+    print(f"  p99          {result['p99_ms']:>10.1f} ms")
+    print(f"  throughput   {result['throughput_rps']:>10.1f} req/s")
+    print(f"  peak RSS     {result['peak_rss_kb'] / 1024:>10.1f} MB")
+    print(f"  searches     {result['searches']:>10}")
+    print(f"  page fetches {result['page_requests']:>10}")
+    print(f"  errors       {result['errors']:>10}")
+
+    return check_baseline(result, COMPARED_METRICS, args) or int(result["errors"] > 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=8, help="Concurrent callers")
+    parser.add_argument("--requests", type=int, default=100, help="Total get_docs calls")
+    parser.add_argument("--queries", type=int, default=25, help="Distinct queries cycled through")
+    parser.add_argument("--library", default="nextjs", help="Library passed to get_docs")
+    parser.add_argument("--search-latency", type=float, default=150, help="Search latency in ms")
+    parser.add_argument("--fetch-latency", type=float, default=80, help="Page latency in ms")
+    parser.add_argument("--jitter", type=float, default=20, help="Maximum extra random latency in ms")
+    parser.add_argument("--warm", action="store_true", help="Enable the page and search caches")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for latency jitter")
+    parser.add_argument(
+        "--rate-limits", action="store_true", help="Keep the search and host rate limiters"
+    )
+    add_baseline_arguments(parser)
+    sys.exit(main(parser.parse_args()))
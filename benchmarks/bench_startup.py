@@ -0,0 +1,127 @@
+"""Benchmark of server cold start: import time and time until tools are listed.
+
+Every stdio MCP session starts a fresh `python main.py`, so startup cost is
+paid per session. This runs `python -X importtime -c "import main"` in fresh
+interpreters to measure the import time and list the slowest modules, then
+starts the server over stdio and times the handshake until the tool list
+arrives. It fails if a deferred dependency (httpx, duckduckgo_search, bs4,
+lxml, numpy) is imported at startup again, and can compare with a saved baseline.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--top N]
+    python benchmarks/bench_startup.py --save-baseline startup.json
+    python benchmarks/bench_startup.py --baseline startup.json [--threshold 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Tuple
+from baseline import add_baseline_arguments, check_baseline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported on first use or by the background warm-up, never at startup
+DEFERRED_MODULES = ("httpx", "duckduckgo_search", "bs4", "lxml", "numpy")
+# Metrics compared against a baseline, and whether higher values are better
+COMPARED_METRICS = {"import_ms": False, "ready_ms": False}
+
+
+def import_profile(module: str = "main") -> Dict[str, Tuple[int, int]]:
+    """Imports a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): The module to import
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Self and cumulative microseconds per imported module
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+async def time_until_ready() -> float:
+    """Starts the server over stdio and waits for its tool list.
+
+    Returns:
+        float: Seconds from process start until list_tools answered
+    """
+    from fastmcp import Client
+    from fastmcp.client.transports import PythonStdioTransport
+
+    with tempfile.TemporaryDirectory() as home, open(os.devnull, "w") as log:
+        # A throwaway HOME keeps the caches of the benchmark out of the real ones
+        transport = PythonStdioTransport(
+            os.path.join(ROOT, "main.py"),
+            cwd=ROOT,
+            env={**os.environ, "HOME": home},
+            keep_alive=False,
+            log_file=log,
+        )
+        start = time.perf_counter()
+        async with Client(transport) as client:
+            await client.list_tools()
+            return time.perf_counter() - start
+
+
+def main(args: argparse.Namespace) -> int:
+    """Runs the benchmark and prints the report.
+
+    Args:
+        args (argparse.Namespace): The parsed command line
+
+    Returns:
+        int: The process exit code, 1 on a regression or an eager heavy import
+    """
+    profiles = [import_profile() for _ in range(args.runs)]
+    import_times = [profile["main"][1] / 1000 for profile in profiles]
+    ready_times = [asyncio.run(time_until_ready()) * 1000 for _ in range(args.runs)]
+    result = {
+        "import_ms": statistics.median(import_times),
+        "ready_ms": statistics.median(ready_times),
+    }
+
+    print(f"runs={args.runs}")
+    print(f"  import main  {result['import_ms']:>10.1f} ms (median)")
+    print(f"  tools listed {result['ready_ms']:>10.1f} ms (median, incl. process start)")
+    if args.top:
+        print("Slowest imports (self time, last run):")
+    slowest = sorted(profiles[-1].items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[: args.top]:
+        print(f"  {self_us / 1000:>8.1f} ms  {name} (cumulative {cumulative_us / 1000:.1f} ms)")
+
+    eager = [
+        name
+        for name in profiles[-1]
+        if name.split(".")[0] in DEFERRED_MODULES
+    ]
+    status = 0
+    if eager:
+        print(f"Deferred modules imported at startup: {', '.join(sorted(eager)[:10])}")
+        status = 1
+
+    return check_baseline(result, COMPARED_METRICS, args) or status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    add_baseline_arguments(parser)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,778 @@
+"""Caches for fetched documentation pages and search results."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from config import (
+    PAGE_CACHE_ENABLED,
+    PAGE_CACHE_PATH,
+    PAGE_CACHE_MAX_BYTES,
+    PAGE_CACHE_DEFAULT_TTL,
+    PAGE_CACHE_MAX_STALE,
+    PAGE_CACHE_ACCESS_FLUSH_EVERY,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_NEGATIVE_TTL,
+    SEARCH_CACHE_MAX_ENTRIES,
+    SEARCH_CACHE_MAX_STALE,
+    SEARCH_CACHE_BACKEND,
+    SEARCH_CACHE_PATH,
+    POPULARITY_WINDOW,
+    POPULARITY_FLUSH_EVERY,
+)
+from registry import get_library
+
+
+# SimHash fingerprint of a page's text and of each of its passages
+PageFingerprints = Tuple[int, List[int]]
+
+
+@dataclass
+class CachedPage:
+    """A cached page with the validators needed for conditional requests."""
+
+    url: str
+    content: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    ttl: float
+    read_for_chars: Optional[int] = None
+
+    @property
+    def partial(self) -> bool:
+        """Whether only the beginning of the page was read."""
+        return self.read_for_chars is not None
+
+    @property
+    def is_fresh(self) -> bool:
+        """Whether the page can be served without contacting the origin."""
+        return time.time() - self.fetched_at < self.ttl
+
+    @property
+    def is_servable(self) -> bool:
+        """Whether the page may be served while it is revalidated in the background."""
+        return time.time() - self.fetched_at < self.ttl + PAGE_CACHE_MAX_STALE
+
+    def covers(self, max_chars: Optional[int]) -> bool:
+        """Whether the cached text is long enough to answer a request.
+
+        Pages read only up to an output budget are cached as partial pages;
+        they can answer requests for at most that budget. The budget is kept
+        rather than compared with the cached text, which is shorter once
+        extra whitespace has been removed.
+
+        Args:
+            max_chars (Optional[int]): Characters requested, None for the whole page
+
+        Returns:
+            bool: True if the request can be served from this page
+        """
+        if not self.partial:
+            return True
+        return max_chars is not None and max_chars <= self.read_for_chars
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Builds the revalidation headers for this page.
+
+        Returns:
+            Dict[str, str]: If-None-Match / If-Modified-Since headers, if known
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """SQLite-backed cache of extracted page text keyed by URL.
+
+    Content is stored zlib-compressed. The total stored size is bounded by
+    max_bytes, evicting the least recently used pages first. Freshness is
+    decided per library using the TTLs configured in config.py.
+
+    The same database keeps a popularity log: how often each page was
+    requested, so the most requested pages can be kept fresh across
+    restarts. Requests are counted in memory and written in batches, and so
+    are the access times of cache hits, so that reading a page is not a
+    write. Triggers keep the total size in the cache_size table, so no
+    write has to add up the sizes of all pages.
+    """
+
+    def __init__(self, path: str, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        """Opens (and creates if needed) the cache database.
+
+        Args:
+            path (str): Path of the SQLite database file
+            max_bytes (int): Maximum total size of compressed content to keep
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                library TEXT,
+                content BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                fingerprints TEXT,
+                read_for_chars INTEGER
+            )
+            """
+        )
+        # Added after the first release; older databases lack the columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "fingerprints" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN fingerprints TEXT")
+        if "read_for_chars" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN read_for_chars INTEGER")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)"
+        )
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cache_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                bytes INTEGER NOT NULL
+            );
+            CREATE TRIGGER IF NOT EXISTS pages_size_insert AFTER INSERT ON pages BEGIN
+                UPDATE cache_size SET bytes = bytes + NEW.size;
+            END;
+            CREATE TRIGGER IF NOT EXISTS pages_size_update AFTER UPDATE OF size ON pages BEGIN
+                UPDATE cache_size SET bytes = bytes + NEW.size - OLD.size;
+            END;
+            CREATE TRIGGER IF NOT EXISTS pages_size_delete AFTER DELETE ON pages BEGIN
+                UPDATE cache_size SET bytes = bytes - OLD.size;
+            END;
+            """
+        )
+        # Databases from before the triggers existed are summed up once
+        self._conn.execute(
+            """
+            INSERT OR IGNORE INTO cache_size (id, bytes)
+            SELECT 0, COALESCE(SUM(size), 0) FROM pages
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS popularity (
+                url TEXT PRIMARY KEY,
+                library TEXT NOT NULL,
+                hits INTEGER NOT NULL,
+                last_hit REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        # Requests not yet written to the popularity table: (library, count) per URL
+        self._hits: Dict[str, Tuple[str, int]] = {}
+        self._unflushed = 0
+        # Access times of cache hits not yet written to the pages table
+        self._accessed: Dict[str, float] = {}
+        self._unwritten_hits = 0
+
+    def get(self, url: str, library: Optional[str] = None) -> Optional[CachedPage]:
+        """Looks up a page and marks it as recently used.
+
+        Args:
+            url (str): The page URL
+            library (Optional[str]): The library the page belongs to, for its TTL
+
+        Returns:
+            Optional[CachedPage]: The cached page (fresh or stale), or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT content, etag, last_modified, fetched_at, read_for_chars
+                FROM pages WHERE url = ?
+                """,
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[url] = time.time()
+            self._unwritten_hits += 1
+            if self._unwritten_hits >= PAGE_CACHE_ACCESS_FLUSH_EVERY:
+                self._write_accessed()
+                self._conn.commit()
+        content, etag, last_modified, fetched_at, read_for_chars = row
+        return CachedPage(
+            url=url,
+            content=zlib.decompress(content).decode("utf-8"),
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at,
+            ttl=get_ttl(library),
+            read_for_chars=read_for_chars,
+        )
+
+    def put(
+        self,
+        url: str,
+        content: str,
+        library: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fingerprints: Optional[PageFingerprints] = None,
+        read_for_chars: Optional[int] = None,
+    ) -> None:
+        """Stores a page, evicting least recently used pages if over budget.
+
+        Args:
+            url (str): The page URL
+            content (str): The extracted page text
+            library (Optional[str]): The library the page belongs to
+            etag (Optional[str]): The ETag response header, if any
+            last_modified (Optional[str]): The Last-Modified response header, if any
+            fingerprints (Optional[PageFingerprints]): SimHash fingerprints of
+                the page and its passages, see dedup.py
+            read_for_chars (Optional[int]): The character budget the page was
+                read for if the download stopped there, None for a whole page
+        """
+        blob = zlib.compress(content.encode("utf-8"))
+        now = time.time()
+        encoded = json.dumps(fingerprints) if fingerprints else None
+        with self._lock:
+            # Eviction goes by access time, so it must see the pending ones
+            self._accessed.pop(url, None)
+            self._write_accessed()
+            self._conn.execute(
+                """
+                INSERT INTO pages
+                    (url, library, content, size, etag, last_modified, fetched_at, accessed_at,
+                     fingerprints, read_for_chars)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    library = excluded.library,
+                    content = excluded.content,
+                    size = excluded.size,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    fetched_at = excluded.fetched_at,
+                    accessed_at = excluded.accessed_at,
+                    fingerprints = excluded.fingerprints,
+                    read_for_chars = excluded.read_for_chars
+                """,
+                (
+                    url,
+                    library,
+                    blob,
+                    len(blob),
+                    etag,
+                    last_modified,
+                    now,
+                    now,
+                    encoded,
+                    read_for_chars,
+                ),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        """Marks a page as revalidated, restarting its TTL.
+
+        Args:
+            url (str): The page URL
+        """
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(url, None)
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url),
+            )
+            self._conn.commit()
+
+    def get_fingerprints(self, url: str) -> Optional[PageFingerprints]:
+        """Returns the stored fingerprints of a page, without reading its content.
+
+        Args:
+            url (str): The page URL
+
+        Returns:
+            Optional[PageFingerprints]: The page and passage fingerprints, or
+                None if the page is not cached or has none
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprints FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        page, passages = json.loads(row[0])
+        return page, passages
+
+    def pages(self, library: str) -> Dict[str, str]:
+        """Returns all cached pages of a library, without marking them as used.
+
+        Args:
+            library (str): The library name
+
+        Returns:
+            Dict[str, str]: The extracted text of each page, by URL
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, content FROM pages WHERE library = ?", (library,)
+            ).fetchall()
+        return {url: zlib.decompress(content).decode("utf-8") for url, content in rows}
+
+    def fetched_at(self, url: str) -> Optional[float]:
+        """Returns when a page was last fetched or revalidated, without reading it.
+
+        Args:
+            url (str): The page URL
+
+        Returns:
+            Optional[float]: The Unix time, or None if the page is not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_hit(self, url: str, library: str) -> None:
+        """Counts a request for a page in the popularity log.
+
+        Args:
+            url (str): The page URL
+            library (str): The library the page belongs to
+        """
+        with self._lock:
+            _, count = self._hits.get(url, (library, 0))
+            self._hits[url] = (library, count + 1)
+            self._unflushed += 1
+            if self._unflushed >= POPULARITY_FLUSH_EVERY:
+                self._flush_hits()
+
+    def popular(self, library: str, limit: int) -> List[str]:
+        """Lists the most requested pages of a library.
+
+        Only requests within the last POPULARITY_WINDOW seconds count, so
+        pages nobody asks for anymore drop out of the list.
+
+        Args:
+            library (str): The library name
+            limit (int): Maximum number of pages
+
+        Returns:
+            List[str]: Page URLs, most requested first
+        """
+        with self._lock:
+            self._flush_hits()
+            rows = self._conn.execute(
+                """
+                SELECT url FROM popularity WHERE library = ? AND last_hit >= ?
+                ORDER BY hits DESC, last_hit DESC LIMIT ?
+                """,
+                (library, time.time() - POPULARITY_WINDOW, limit),
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def _flush_hits(self) -> None:
+        """Writes the counted requests to the popularity table."""
+        if not self._hits:
+            return
+        now = time.time()
+        self._conn.executemany(
+            """
+            INSERT INTO popularity (url, library, hits, last_hit) VALUES (?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                library = excluded.library,
+                hits = hits + excluded.hits,
+                last_hit = excluded.last_hit
+            """,
+            [(url, library, count, now) for url, (library, count) in self._hits.items()],
+        )
+        self._conn.commit()
+        self._hits.clear()
+        self._unflushed = 0
+
+    def _write_accessed(self) -> None:
+        """Writes the access times of recent cache hits, without committing."""
+        if not self._accessed:
+            return
+        self._conn.executemany(
+            "UPDATE pages SET accessed_at = ? WHERE url = ?",
+            [(accessed_at, url) for url, accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+        self._unwritten_hits = 0
+
+    def total_bytes(self) -> int:
+        """Returns the total size of compressed content currently stored."""
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        """Reads the running size total kept by the triggers."""
+        (total,) = self._conn.execute("SELECT bytes FROM cache_size").fetchone()
+        return total
+
+    def _evict(self) -> None:
+        """Deletes least recently used pages until the cache fits max_bytes."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT url, size FROM pages ORDER BY accessed_at ASC"
+        ).fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+
+    def close(self) -> None:
+        """Writes pending popularity counts and access times, and closes the database."""
+        with self._lock:
+            self._flush_hits()
+            self._write_accessed()
+            self._conn.commit()
+            self._conn.close()
+
+
+def get_ttl(library: Optional[str]) -> float:
+    """Gets the cache TTL in seconds for a library.
+
+    Args:
+        library (Optional[str]): The normalized library name
+
+    Returns:
+        float: The TTL from the library's registry entry, or the default TTL
+    """
+    entry = get_library(library)
+    return entry.ttl if entry and entry.ttl else PAGE_CACHE_DEFAULT_TTL
+
+
+_page_cache: Optional[PageCache] = None
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Returns the shared page cache, opening it on first use.
+
+    Returns:
+        Optional[PageCache]: The page cache, or None if caching is disabled
+    """
+    global _page_cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    if _page_cache is None:
+        _page_cache = PageCache(PAGE_CACHE_PATH)
+    return _page_cache
+
+
+def close_page_cache() -> None:
+    """Closes the shared page cache if it is open."""
+    global _page_cache
+    if _page_cache is not None:
+        _page_cache.close()
+        _page_cache = None
+
+
+def normalize_search_key(query: str, max_results: Optional[int] = None) -> str:
+    """Normalizes a search query so equivalent queries share a cache entry.
+
+    The query is lowercased, whitespace is collapsed, and "site:" operators
+    are moved to the end so that the different strategy strings for the same
+    query and site map to the same key.
+
+    Args:
+        query (str): The search query
+        max_results (Optional[int]): The number of results requested, kept
+            apart in the key since a longer result list is a different answer
+
+    Returns:
+        str: The normalized cache key
+    """
+    terms = query.lower().split()
+    sites = sorted(term for term in terms if term.startswith("site:"))
+    words = [term for term in terms if not term.startswith("site:")]
+    limit = [f"#{max_results}"] if max_results is not None else []
+    return " ".join(words + sites + limit)
+
+
+class SearchCache:
+    """In-memory LRU cache of search result URLs with expiry.
+
+    Non-empty results are kept for ttl seconds. Empty results are cached
+    as well (negative caching) but for the shorter negative_ttl, so a query
+    with no matches is not repeated against the search provider right away.
+    Expired non-empty results stay available to get_stale() for max_stale
+    seconds, to be served while they are refreshed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL,
+        negative_ttl: float = SEARCH_CACHE_NEGATIVE_TTL,
+        max_stale: float = SEARCH_CACHE_MAX_STALE,
+    ):
+        """Creates an empty search cache.
+
+        Args:
+            max_entries (int): Maximum number of queries to keep
+            ttl (float): Seconds to keep non-empty results
+            negative_ttl (float): Seconds to keep empty results
+            max_stale (float): Seconds past expiry that results are kept for get_stale()
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_stale = max_stale
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Looks up unexpired results for a normalized query.
+
+        Args:
+            key (str): The key from normalize_search_key
+
+        Returns:
+            Optional[List[str]]: A copy of the cached URLs (possibly empty), or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, urls = entry
+        now = time.monotonic()
+        if now >= expires_at:
+            if not urls or now >= expires_at + self.max_stale:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(urls)
+
+    def get_stale(self, key: str) -> Optional[List[str]]:
+        """Looks up expired results that may be served while they are refreshed.
+
+        Args:
+            key (str): The key from normalize_search_key
+
+        Returns:
+            Optional[List[str]]: A copy of the expired URLs, or None if there are
+                none or they are unexpired, empty or too old
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, urls = entry
+        now = time.monotonic()
+        if not urls or now < expires_at or now >= expires_at + self.max_stale:
+            return None
+        self._entries.move_to_end(key)
+        return list(urls)
+
+    def put(self, key: str, urls: List[str]) -> None:
+        """Stores results for a normalized query, evicting the oldest entries.
+
+        Args:
+            key (str): The key from normalize_search_key
+            urls (List[str]): The result URLs, empty for a negative entry
+        """
+        ttl = self.ttl if urls else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, list(urls))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all cached results."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedSearchCache:
+    """SQLite-backed search result cache shared by processes on one host.
+
+    Behaves like SearchCache, but entries live in a database file so that
+    every worker of a multi-process server sees the searches of the others.
+    Expiry uses wall-clock time since the entries outlive any one process.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        ttl: float = SEARCH_CACHE_TTL,
+        negative_ttl: float = SEARCH_CACHE_NEGATIVE_TTL,
+        max_stale: float = SEARCH_CACHE_MAX_STALE,
+    ):
+        """Opens (and creates if needed) the cache database.
+
+        Args:
+            path (str): Path of the SQLite database file
+            max_entries (int): Maximum number of queries to keep
+            ttl (float): Seconds to keep non-empty results
+            negative_ttl (float): Seconds to keep empty results
+            max_stale (float): Seconds past expiry that results are kept for get_stale()
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                urls TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS searches_accessed_at ON searches (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Looks up unexpired results for a normalized query.
+
+        Args:
+            key (str): The key from normalize_search_key
+
+        Returns:
+            Optional[List[str]]: The cached URLs (possibly empty), or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls, expires_at FROM searches WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now >= row[1]:
+                if row[0] == "[]" or now >= row[1] + self.max_stale:
+                    self._conn.execute("DELETE FROM searches WHERE key = ?", (key,))
+                    self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE searches SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def get_stale(self, key: str) -> Optional[List[str]]:
+        """Looks up expired results that may be served while they are refreshed.
+
+        Args:
+            key (str): The key from normalize_search_key
+
+        Returns:
+            Optional[List[str]]: The expired URLs, or None if there are none or
+                they are unexpired, empty or too old
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls FROM searches WHERE key = ? AND expires_at <= ? AND expires_at > ?",
+                (key, now, now - self.max_stale),
+            ).fetchone()
+        if row is None or row[0] == "[]":
+            return None
+        return json.loads(row[0])
+
+    def put(self, key: str, urls: List[str]) -> None:
+        """Stores results for a normalized query, evicting the oldest entries.
+
+        Args:
+            key (str): The key from normalize_search_key
+            urls (List[str]): The result URLs, empty for a negative entry
+        """
+        now = time.time()
+        ttl = self.ttl if urls else self.negative_ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                (key, json.dumps(urls), now + ttl, now),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM searches WHERE key IN (
+                    SELECT key FROM searches ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Removes all cached results."""
+        with self._lock:
+            self._conn.execute("DELETE FROM searches")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()
+        return count
+
+
+_search_cache = SearchCache()
+_shared_search_cache: Optional[SharedSearchCache] = None
+
+
+def get_search_cache() -> Optional[Union[SearchCache, SharedSearchCache]]:
+    """Returns the shared search result cache.
+
+    With SEARCH_CACHE_BACKEND set to "sqlite" the cache is kept in the
+    SEARCH_CACHE_PATH database, opened on first use, and shared by all
+    server processes; otherwise it is kept in memory.
+
+    Returns:
+        Optional[Union[SearchCache, SharedSearchCache]]: The search cache, or
+            None if caching is disabled
+    """
+    global _shared_search_cache
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    if SEARCH_CACHE_BACKEND != "sqlite":
+        return _search_cache
+    if _shared_search_cache is None:
+        _shared_search_cache = SharedSearchCache(SEARCH_CACHE_PATH)
+    return _shared_search_cache
+
+
+def close_search_cache() -> None:
+    """Closes the shared search cache database if it is open."""
+    global _shared_search_cache
+    if _shared_search_cache is not None:
+        _shared_search_cache.close()
+        _shared_search_cache = None
@@ -1,5 +1,7 @@
 """Configuration settings for the MCP Documentation Search Server."""
 
+import os
+
 # Documentation URLs for supported libraries
 DOCS_URLS = {
     "nillion": "https://docs.nillion.com",
@@ -19,6 +21,148 @@ LIBRARY_ALIASES = {
     "fastmcp": "mcp",
 }
 
+# Optional TOML or JSON file defining the supported libraries (see registry.py).
+# When unset, the DOCS_URLS and LIBRARY_ALIASES above are used.
+LIBRARY_REGISTRY_PATH = os.environ.get("DOCS_LIBRARY_REGISTRY") or None
+REGISTRY_CHECK_INTERVAL = 2.0  # Seconds between checks of the file for changes
+
 # HTTP client settings
 HTTP_TIMEOUT = 30.0
-MAX_SEARCH_RESULTS = 2
\ No newline at end of file
+MAX_SEARCH_RESULTS = 2  # Result pages fetched per get_docs call, unless max_results is given
+MAX_SEARCH_RESULTS_LIMIT = 10  # Largest max_results accepted by get_docs
+MAX_CONCURRENT_FETCHES = 4  # Result pages fetched in parallel per request
+FETCH_DEADLINE = 20.0  # Seconds to wait for all result pages of one request
+OUTPUT_BUDGET_CHARS = 40_000  # Default get_docs output size (~10k tokens at ~4 chars/token)
+MAX_BATCH_QUERIES = 10  # Queries accepted by one get_docs_batch call
+
+# Query-relevant passage ranking of fetched pages
+PASSAGE_RANKING_ENABLED = True
+PASSAGE_TOP_K = 8  # Passages returned per get_docs call
+PASSAGE_MAX_CHARS = 1500  # Sections longer than this are split at blank lines
+PASSAGE_READ_FACTOR = 4  # Pages are read up to this multiple of the output budget for ranking
+
+# How search strategies are combined: "sequential", "race" or "merge"
+SEARCH_STRATEGY_MODE = "sequential"
+
+# Search providers tried in order until one finds results (see providers.py).
+# A library's search_providers in the registry replaces this chain.
+SEARCH_PROVIDERS = ["duckduckgo"]
+
+# Shared HTTP connection pool settings
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY = 60.0
+HTTP_MAX_CONNECTIONS_PER_HOST = 4
+HTTP2_ENABLED = False  # Requires the optional "h2" package
+
+# Limits on the pages fetched from search results. httpx decompresses gzip and
+# deflate responses, and brotli ones when the optional "brotli" package is installed.
+MAX_RESPONSE_BYTES = 5 * 1024 * 1024  # Decompressed bytes read per page; the rest is dropped
+FETCH_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "text/markdown")
+
+# Duplicate elimination across result pages (see dedup.py)
+DEDUP_ENABLED = True
+TRACKING_PARAMS = ("ref", "ref_src", "source", "fbclid", "gclid", "msclkid")  # And utm_*
+# Differing fingerprint bits (of 64) for texts to count as duplicates. Unrelated
+# passages differ in 16 or more bits; one changed word in a paragraph flips about 4.
+SIMHASH_MAX_DISTANCE = 6
+
+# HTML parser used to extract page text: "lxml" (faster) or "html.parser"
+EXTRACTION_BACKEND = "lxml"
+
+# Persistent page cache settings
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "mcp-server-documentation", "pages.sqlite3"
+)
+PAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Compressed content kept on disk
+PAGE_CACHE_DEFAULT_TTL = 24 * 60 * 60  # Seconds before a page is revalidated
+PAGE_CACHE_TTLS = {
+    "nillion": 24 * 60 * 60,
+    "nextjs": 24 * 60 * 60,
+    "tailwind": 7 * 24 * 60 * 60,
+    "mcp": 24 * 60 * 60,
+}
+PAGE_CACHE_MAX_STALE = 7 * 24 * 60 * 60  # Seconds past its TTL a page is still served while refreshed
+PAGE_CACHE_ACCESS_FLUSH_EVERY = 50  # Cache hits kept in memory before their access times are written
+
+# Dedicated thread pool for blocking DuckDuckGo searches
+SEARCH_EXECUTOR_WORKERS = 4
+SEARCH_TIMEOUT = 10.0  # Seconds before a search is abandoned
+WARM_UP_DELAY = 0.5  # Seconds after startup before httpx and DDGS are imported in the background
+
+# Search result cache settings
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_TTL = 60 * 60  # Seconds to keep non-empty results
+SEARCH_CACHE_NEGATIVE_TTL = 5 * 60  # Seconds to keep empty results
+SEARCH_CACHE_MAX_ENTRIES = 1024
+SEARCH_CACHE_MAX_STALE = 24 * 60 * 60  # Seconds past expiry results are still served while refreshed
+# "memory" keeps results per process; "sqlite" shares them between server workers
+SEARCH_CACHE_BACKEND = os.environ.get("DOCS_SEARCH_CACHE", "memory")
+SEARCH_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "mcp-server-documentation", "searches.sqlite3"
+)
+
+# Background refresh of stale and popular pages (see refresh.py)
+REFRESH_ENABLED = True
+REFRESH_CONCURRENCY = 2  # Refresh jobs running at once
+REFRESH_RATE_LIMIT = 1.0  # Refresh jobs started per second
+REFRESH_QUEUE_SIZE = 256  # Queued refresh jobs; further ones are dropped
+REFRESH_IDLE_WAIT = 0.2  # Seconds between checks while live requests are running
+# With several server workers only the one holding this lock runs the refresh
+REFRESH_SINGLE_WORKER = os.environ.get("DOCS_REFRESH_SINGLE_WORKER") == "1"
+REFRESH_LOCK_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "mcp-server-documentation", "refresh.lock"
+)
+PREWARM_PAGES_PER_LIBRARY = 20  # Most requested pages kept fresh per library
+PREWARM_INTERVAL = 10 * 60  # Seconds between checks of the popular pages
+POPULARITY_WINDOW = 30 * 24 * 60 * 60  # Requests older than this no longer make a page popular
+POPULARITY_FLUSH_EVERY = 20  # Page requests counted in memory before they are written
+
+# Offline documentation index settings (build it with `python indexing.py`)
+LOCAL_INDEX_ENABLED = True
+LOCAL_INDEX_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "mcp-server-documentation", "index.sqlite3"
+)
+LOCAL_INDEX_TOP_K = 5  # Sections returned for a query
+LOCAL_INDEX_MIN_SCORE = 0.0  # Minimum BM25 score for a section to count as a hit
+LOCAL_INDEX_MIN_COVERAGE = 0.5  # Fraction of the query terms (stop-words aside) a hit must contain
+LOCAL_PROVIDER_MIN_COVERAGE = 0.25  # Same for pages returned by the "local" search provider
+CRAWL_MAX_PAGES = 500  # Pages visited per library per crawl
+CRAWL_CONCURRENCY = 4  # Pages fetched in parallel while crawling
+
+# Local vector retrieval over cached and indexed passages (see vectors.py, requires numpy)
+SEMANTIC_SEARCH_ENABLED = False
+VECTOR_INDEX_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "mcp-server-documentation", "vectors"
+)
+VECTOR_MODEL = None  # Local sentence-transformers model, e.g. "all-MiniLM-L6-v2"; None for feature hashing
+VECTOR_DIM = 512  # Dimensions of feature-hashed vectors
+VECTOR_TOP_K = 5  # Passages returned for a query
+VECTOR_MIN_SCORE = 0.2  # Minimum cosine similarity for a passage to count as a hit
+
+# Rate limiting, retries and circuit breaking for searches and page fetches
+# DuckDuckGo answers bursts from one address with rate-limit errors, so searches
+# are paced. A race-mode request spends up to one token per search strategy (4),
+# and the burst lets two such requests through back to back.
+SEARCH_RATE_LIMIT = 2.0  # DuckDuckGo searches per second
+SEARCH_RATE_BURST = 8  # Searches allowed back to back before the rate applies
+HOST_RATE_LIMIT = 8.0  # Requests per second per docs host, unless the registry sets rate_limit
+HOST_RATE_BURST = 8
+RETRY_MAX_ATTEMPTS = 3  # Attempts per search or fetch, including the first
+RETRY_BASE_DELAY = 0.5  # Seconds; doubled on each retry, with full jitter
+RETRY_MAX_DELAY = 8.0
+RETRY_AFTER_MAX = 30.0  # Longest Retry-After honored, in seconds
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures before an upstream is skipped
+BREAKER_COOLDOWN = 30.0  # Seconds an upstream is skipped after tripping the breaker
+
+# Network transport (python main.py --transport http)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+SERVER_WORKERS = 1  # Worker processes sharing the port
+SERVER_PATH = "/mcp"  # Endpoint of the MCP protocol
+
+# Observability: JSON stage timings on stderr (stdout carries the stdio transport)
+TRACE_ENABLED = True
+LOG_LEVEL = "INFO"
+OTEL_ENABLED = False  # Mirror stages as OpenTelemetry spans when opentelemetry is installed
@@ -0,0 +1,222 @@
+"""Duplicate elimination for search result pages and their passages.
+
+Docs sites serve the same content under several URLs: with and without a
+trailing slash, with tracking parameters such as ?ref= or utm_source, under
+versioned paths, or on mirrors. Result URLs are first reduced to a canonical
+form so that spelling variants are fetched once. Content that is still
+duplicated is found with SimHash fingerprints: texts whose 64-bit
+fingerprints differ in at most SIMHASH_MAX_DISTANCE bits are treated as the
+same text, and only the first (best ranked) copy is kept. The page cache
+stores the fingerprints of each page, so duplicates seen in earlier requests
+are skipped before they are fetched again.
+"""
+
+import hashlib
+from typing import Collection, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, unquote_plus, urlencode, urlsplit, urlunsplit
+from config import TRACKING_PARAMS, SIMHASH_MAX_DISTANCE
+from indexing import Section, tokenize
+from ranking import split_passages
+
+# Words per shingle, the features a fingerprint is computed from
+SHINGLE_SIZE = 3
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# Per bit of a byte (most significant first), maps each byte value to that bit
+_BIT_TABLES = [bytes((value >> (7 - bit)) & 1 for value in range(256)) for bit in range(8)]
+
+
+def _is_tracking_param(name: str) -> bool:
+    """Whether a query parameter only tracks where a visitor came from."""
+    name = name.lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+def clean_url(url: str) -> str:
+    """Removes the fragment and tracking parameters from a URL.
+
+    The result addresses the same document as the input, so it is what gets
+    fetched and cached. The remaining query parameters are kept exactly as
+    written, since servers may tell "?a" from "?a=" or "%20" from "+".
+
+    Args:
+        url (str): A result URL
+
+    Returns:
+        str: The URL without fragment and tracking parameters
+    """
+    parts = urlsplit(url)
+    query = "&".join(
+        pair
+        for pair in parts.query.split("&")
+        if not _is_tracking_param(unquote_plus(pair.partition("=")[0]))
+    )
+    return urlunsplit(parts._replace(query=query, fragment=""))
+
+
+def canonical_url(url: str) -> str:
+    """Reduces a URL to a key shared by the spellings of the same page.
+
+    Besides cleaning the URL, the scheme and host are lowercased, default
+    ports, trailing slashes and a final index.html are dropped, and the
+    query parameters are sorted.
+
+    Args:
+        url (str): A result URL
+
+    Returns:
+        str: The canonical form, only used to compare URLs
+    """
+    parts = urlsplit(clean_url(url))
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path
+    if path.endswith("/index.html"):
+        path = path[: -len("index.html")]
+    path = path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def unique_urls(urls: Iterable[str]) -> List[str]:
+    """Cleans result URLs and drops those naming an earlier page again.
+
+    Args:
+        urls (Iterable[str]): Result URLs, best first
+
+    Returns:
+        List[str]: The cleaned URLs of distinct pages, in the same order
+    """
+    seen = set()
+    unique = []
+    for url in urls:
+        key = canonical_url(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(clean_url(url))
+    return unique
+
+
+def _shingle_hashes(text: str) -> Set[bytes]:
+    """Hashes the distinct word shingles of a text to 64 bits each."""
+    words = tokenize(text)
+    size = min(SHINGLE_SIZE, len(words))
+    if not size:
+        return set()
+    return {
+        hashlib.blake2b(" ".join(words[i : i + size]).encode(), digest_size=8).digest()
+        for i in range(len(words) - size + 1)
+    }
+
+
+def _combine(hashes: Collection[bytes]) -> int:
+    """Builds a fingerprint from feature hashes by a per-bit majority vote."""
+    if not hashes:
+        return 0
+    # Count the set bits per position over all hashes at once: take the
+    # same byte of every hash, then map each byte to its bit with translate()
+    joined = b"".join(hashes)
+    half = len(hashes) / 2
+    fingerprint = 0
+    for offset in range(8):
+        column = joined[offset::8]
+        for table in _BIT_TABLES:
+            fingerprint = (fingerprint << 1) | (column.translate(table).count(1) > half)
+    return fingerprint
+
+
+def simhash(text: str) -> int:
+    """Computes the 64-bit SimHash fingerprint of a text.
+
+    The features are the distinct word shingles of the text. Each bit of
+    the fingerprint is set when that bit is set in the hashes of more than
+    half of the features, so similar texts get fingerprints that differ in
+    only a few bits.
+
+    Args:
+        text (str): The text
+
+    Returns:
+        int: The fingerprint, 0 for a text without words
+    """
+    return _combine(_shingle_hashes(text))
+
+
+def hamming_distance(first: int, second: int) -> int:
+    """Counts the bits in which two fingerprints differ."""
+    return bin(first ^ second).count("1")
+
+
+def is_near_duplicate(
+    fingerprint: int, seen: Iterable[int], max_distance: int = SIMHASH_MAX_DISTANCE
+) -> bool:
+    """Checks whether a fingerprint is close to any of the given ones.
+
+    Args:
+        fingerprint (int): The fingerprint to check
+        seen (Iterable[int]): Fingerprints of the texts already kept
+        max_distance (int): Most differing bits for a near-duplicate
+
+    Returns:
+        bool: True if the text is a near-duplicate of a kept one
+    """
+    return any(hamming_distance(fingerprint, other) <= max_distance for other in seen)
+
+
+def passage_fingerprints(passages: Sequence[Section]) -> List[int]:
+    """Computes the fingerprint of each passage, heading included.
+
+    Args:
+        passages (Sequence[Section]): The passages of a page
+
+    Returns:
+        List[int]: One fingerprint per passage
+    """
+    return [simhash(f"{passage.heading}\n{passage.text}") for passage in passages]
+
+
+def dedupe_passages(
+    passages: Sequence[Section], fingerprints: Optional[Sequence[int]] = None
+) -> List[Section]:
+    """Drops passages that repeat an earlier passage nearly word for word.
+
+    Args:
+        passages (Sequence[Section]): The passages of all result pages, best page first
+        fingerprints (Optional[Sequence[int]]): Their fingerprints, if already known
+
+    Returns:
+        List[Section]: The passages without near-duplicates, in the same order
+    """
+    if fingerprints is None:
+        fingerprints = passage_fingerprints(passages)
+    kept: List[Section] = []
+    seen: List[int] = []
+    for passage, fingerprint in zip(passages, fingerprints):
+        if fingerprint and is_near_duplicate(fingerprint, seen):
+            continue
+        kept.append(passage)
+        seen.append(fingerprint)
+    return kept
+
+
+def page_fingerprints(url: str, content: str) -> Tuple[int, List[int]]:
+    """Computes the fingerprints stored with a cached page.
+
+    The page fingerprint is built from the shingles of all its passages, so
+    each shingle is hashed only once.
+
+    Args:
+        url (str): The page URL
+        content (str): The extracted page text
+
+    Returns:
+        Tuple[int, List[int]]: The fingerprint of the whole page and of each
+            passage, as split by ranking.split_passages
+    """
+    passages = [
+        _shingle_hashes(f"{passage.heading}\n{passage.text}")
+        for passage in split_passages(url, content)
+    ]
+    return _combine(set().union(*passages)), [_combine(hashes) for hashes in passages]
@@ -0,0 +1,388 @@
+"""Incremental HTML-to-text extraction for documentation pages.
+
+Pages are parsed chunk by chunk while the response body is streamed, so the
+full HTML never has to be held in memory or turned into a document tree.
+Script, style and navigation content is dropped, as are page headers and
+footers outside the main content; headings and code blocks from the main
+content are kept. Plain text and Markdown responses are collected as they
+are by PlainTextExtractor.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import EXTRACTION_BACKEND
+
+# Elements whose content is never useful documentation text
+NOISE_TAGS = frozenset(
+    {
+        "script", "style", "nav", "noscript", "svg", "template", "iframe",
+    }
+)
+# Page chrome, dropped only outside the main content: an <article> often
+# opens with a <header> holding its title and summary
+CHROME_TAGS = frozenset({"header", "footer"})
+# Elements that start a new line in the extracted text
+BLOCK_TAGS = frozenset(
+    {
+        "p", "div", "section", "li", "ul", "ol", "table", "tr", "br", "dt", "dd",
+        "blockquote", "hr", "aside", "details", "summary", "figure",
+    }
+)
+HEADING_TAGS = {f"h{level}": "#" * level for level in range(1, 7)}
+MAIN_TAGS = frozenset({"main", "article"})
+# Void elements never receive an end tag from the stdlib parser
+VOID_TAGS = frozenset(
+    {
+        "area", "base", "br", "col", "embed", "hr",
+        "img", "input", "link", "meta", "source", "wbr",
+    }
+)
+
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+_SELECTOR_RE = re.compile(r"^([a-z][a-z0-9]*)?(?:\.([\w-]+)|#([\w-]+))?$")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def parse_selector(selector: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """Parses a simple CSS selector: "tag", ".class", "#id", "tag.class" or "tag#id".
+
+    Args:
+        selector (str): The selector
+
+    Returns:
+        Tuple[Optional[str], Optional[str], Optional[str]]: Tag, class and id
+
+    Raises:
+        ValueError: If the selector is not one of the supported forms
+    """
+    match = _SELECTOR_RE.match(selector.strip().lower())
+    if not match or not any(match.groups()):
+        raise ValueError(f"unsupported selector: {selector!r}")
+    return match.groups()
+
+
+class TextBuilder:
+    """Builds text from parser events (start tag, end tag, character data).
+
+    The same builder serves every backend: the stdlib parser forwards its
+    callbacks to it, and lxml drives it directly as a parser target.
+
+    Main content is taken from <main> and <article> elements, or from the
+    elements matching the given selectors when a library defines them.
+    """
+
+    def __init__(self, selectors: Sequence[str] = ()):
+        """Creates an empty builder.
+
+        Args:
+            selectors (Sequence[str]): Simple CSS selectors of the elements
+                holding the main content, see parse_selector
+        """
+        self._selectors = [parse_selector(selector) for selector in selectors]
+        # Open element count per tag, and the (tag, count) of matched elements
+        self._open: Dict[str, int] = {}
+        self._selected: List[Tuple[str, int]] = []
+        self._all: List[str] = []
+        self._main: List[str] = []
+        # Noise and chrome elements being skipped, innermost last
+        self._skipped: List[str] = []
+        self._main_depth = 0
+        self._pre_depth = 0
+        self._last_char = "\n"
+        self._all_chars = 0
+        self._main_chars = 0
+        self._title: List[str] = []
+        self._in_title = False
+
+    def start(self, tag: str, attrib: Optional[Dict[str, str]] = None) -> None:
+        """Handles an opening tag."""
+        tag = tag.lower()
+        if self._skipped:
+            if tag in NOISE_TAGS or tag in CHROME_TAGS:
+                self._skipped.append(tag)
+            return
+        if tag in NOISE_TAGS or (tag in CHROME_TAGS and not self._main_depth):
+            self._skipped.append(tag)
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if self._selectors:
+            if tag not in VOID_TAGS:
+                depth = self._open.get(tag, 0) + 1
+                self._open[tag] = depth
+                if self._matches(tag, attrib or {}):
+                    self._selected.append((tag, depth))
+                    self._main_depth += 1
+        elif tag in MAIN_TAGS:
+            self._main_depth += 1
+        if tag in HEADING_TAGS:
+            self._emit(f"\n\n{HEADING_TAGS[tag]} ")
+        elif tag == "pre":
+            self._pre_depth += 1
+            self._emit("\n```\n")
+        elif tag in BLOCK_TAGS:
+            self._emit("\n")
+
+    def end(self, tag: str) -> None:
+        """Handles a closing tag."""
+        tag = tag.lower()
+        if self._skipped:
+            if tag in self._skipped:
+                # Also closes skipped elements left open inside this one
+                while self._skipped.pop() != tag:
+                    pass
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag in HEADING_TAGS:
+            self._emit("\n")
+        elif tag == "pre" and self._pre_depth:
+            self._pre_depth -= 1
+            self._emit("\n```\n")
+        elif tag in BLOCK_TAGS:
+            self._emit("\n")
+        if self._selectors:
+            depth = self._open.get(tag, 0)
+            if depth:
+                if self._selected and self._selected[-1] == (tag, depth):
+                    self._selected.pop()
+                    self._main_depth -= 1
+                self._open[tag] = depth - 1
+        elif tag in MAIN_TAGS and self._main_depth:
+            self._main_depth -= 1
+
+    def _matches(self, tag: str, attrib: Dict[str, str]) -> bool:
+        """Checks whether an element matches one of the content selectors."""
+        classes = (attrib.get("class") or "").lower().split()
+        element_id = (attrib.get("id") or "").lower()
+        return any(
+            (not want_tag or want_tag == tag)
+            and (not want_class or want_class in classes)
+            and (not want_id or want_id == element_id)
+            for want_tag, want_class, want_id in self._selectors
+        )
+
+    def data(self, data: str) -> None:
+        """Handles character data between tags."""
+        if self._skipped:
+            return
+        if self._in_title:
+            self._title.append(data)
+            return
+        if not self._pre_depth:
+            data = _SPACE_RE.sub(" ", data.replace("\n", " "))
+            # Text split across chunks arrives as several events; collapse the seam
+            if data.startswith(" ") and self._last_char in (" ", "\n"):
+                data = data[1:]
+        if data:
+            self._emit(data)
+
+    @property
+    def chars(self) -> int:
+        """Characters of main content extracted so far, before clean-up.
+
+        Text outside the main content is not counted: it is dropped as soon
+        as main content turns up, which may be further down the page.
+        """
+        return self._main_chars
+
+    @property
+    def title(self) -> str:
+        """The document title, which is not part of text()."""
+        return _SPACE_RE.sub(" ", "".join(self._title).replace("\n", " ")).strip()
+
+    def comment(self, text: str) -> None:
+        """Ignores comments (lxml target callback)."""
+
+    def close(self) -> str:
+        """Finishes extraction (lxml target callback)."""
+        return self.text()
+
+    def text(self) -> str:
+        """Returns the extracted text, preferring the main content if present.
+
+        Returns:
+            str: The cleaned-up text
+        """
+        parts = self._main if self._main else self._all
+        lines = []
+        in_code = False
+        for line in "".join(parts).split("\n"):
+            if line.strip() == "```":
+                in_code = not in_code
+                lines.append("```")
+            else:
+                # Keep indentation inside code blocks, tidy everything else
+                lines.append(line.rstrip() if in_code else line.strip())
+        return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+    def _emit(self, text: str) -> None:
+        """Appends text to the output buffers."""
+        self._all.append(text)
+        self._all_chars += len(text)
+        if self._main_depth:
+            self._main.append(text)
+            self._main_chars += len(text)
+        self._last_char = text[-1]
+
+
+class _StdlibParser(HTMLParser):
+    """Stdlib HTMLParser forwarding its callbacks to a TextBuilder."""
+
+    def __init__(self, builder: TextBuilder):
+        super().__init__(convert_charrefs=True)
+        self.builder = builder
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, dict(attrs))
+        if tag in VOID_TAGS:
+            self.builder.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.start(tag, dict(attrs))
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+
+class StreamingExtractor:
+    """Extracts documentation text from HTML fed in chunks.
+
+    Usage::
+
+        extractor = StreamingExtractor()
+        async for chunk in response.aiter_text():
+            extractor.feed(chunk)
+        text = extractor.close()
+    """
+
+    def __init__(self, backend: Optional[str] = None, selectors: Sequence[str] = ()):
+        """Creates an extractor using the given parser backend.
+
+        Args:
+            backend (Optional[str]): "lxml" or "html.parser"; defaults to
+                EXTRACTION_BACKEND, falling back to "html.parser" if lxml is
+                not installed
+            selectors (Sequence[str]): Elements holding the main content,
+                e.g. ["div.content"]; defaults to <main> and <article>
+        """
+        self.builder = TextBuilder(selectors)
+        self.backend = resolve_backend(backend or EXTRACTION_BACKEND)
+        if self.backend == "lxml":
+            from lxml import etree
+
+            self._parser = etree.HTMLParser(target=self.builder)
+        else:
+            self._parser = _StdlibParser(self.builder)
+
+    @property
+    def chars(self) -> int:
+        """Number of main content characters extracted so far, see TextBuilder.chars."""
+        return self.builder.chars
+
+    @property
+    def title(self) -> str:
+        """The document title seen so far."""
+        return self.builder.title
+
+    def feed(self, chunk: str) -> None:
+        """Parses the next chunk of HTML.
+
+        Args:
+            chunk (str): A decoded piece of the response body
+        """
+        if chunk:
+            self._parser.feed(chunk)
+
+    def close(self) -> str:
+        """Finishes parsing and returns the extracted text.
+
+        Returns:
+            str: The extracted documentation text
+        """
+        try:
+            self._parser.close()
+        except SyntaxError:
+            # lxml raises on documents that ended up empty; the text so far stands
+            pass
+        return self.builder.text()
+
+
+class PlainTextExtractor:
+    """Collects plain text or Markdown fed in chunks, keeping its lines.
+
+    Has the interface of StreamingExtractor, for responses that are not
+    HTML and must not be parsed as such.
+    """
+
+    def __init__(self):
+        """Creates an empty extractor."""
+        self._parts: List[str] = []
+        self._chars = 0
+
+    @property
+    def chars(self) -> int:
+        """Number of text characters received so far."""
+        return self._chars
+
+    def feed(self, chunk: str) -> None:
+        """Adds the next chunk of text.
+
+        Args:
+            chunk (str): A decoded piece of the response body
+        """
+        self._parts.append(chunk)
+        self._chars += len(chunk)
+
+    def close(self) -> str:
+        """Returns the received text with its line structure intact.
+
+        Returns:
+            str: The text, with line endings normalized and runs of blank lines collapsed
+        """
+        text = "".join(self._parts).replace("\r\n", "\n")
+        return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def resolve_backend(backend: str) -> str:
+    """Picks an available parser backend.
+
+    Args:
+        backend (str): The requested backend name
+
+    Returns:
+        str: "lxml" if requested and installed, otherwise "html.parser"
+    """
+    if backend == "lxml":
+        try:
+            import lxml.etree  # noqa: F401
+        except ImportError:
+            return "html.parser"
+        return "lxml"
+    return "html.parser"
+
+
+def extract_text(
+    html: str, backend: Optional[str] = None, selectors: Sequence[str] = ()
+) -> str:
+    """Extracts documentation text from a complete HTML document.
+
+    Args:
+        html (str): The page HTML
+        backend (Optional[str]): The parser backend, see StreamingExtractor
+        selectors (Sequence[str]): Elements holding the main content
+
+    Returns:
+        str: The extracted documentation text
+    """
+    extractor = StreamingExtractor(backend, selectors)
+    extractor.feed(html)
+    return extractor.close()
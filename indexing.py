@@ -0,0 +1,677 @@
+"""Offline documentation index: crawler and BM25 inverted index.
+
+Each library in the registry can be crawled once (via its sitemap.xml, or by
+following links under the documentation prefix), split into sections by
+heading, and stored in a local SQLite inverted index. Queries are then
+answered from the index without any network access.
+
+Run ``python indexing.py [library ...]`` to crawl or re-crawl libraries.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ElementTree
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+from config import (
+    HTTP_TIMEOUT,
+    LOCAL_INDEX_ENABLED,
+    LOCAL_INDEX_PATH,
+    LOCAL_INDEX_TOP_K,
+    LOCAL_INDEX_MIN_SCORE,
+    LOCAL_INDEX_MIN_COVERAGE,
+    CRAWL_MAX_PAGES,
+    CRAWL_CONCURRENCY,
+)
+from registry import get_library, get_registry
+from extraction import StreamingExtractor
+
+# httpx and bs4 are only needed by the crawler, so the server does not import them
+if TYPE_CHECKING:
+    import httpx
+
+# BM25 tuning parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_]*")
+# Lines that extraction.py makes of h1-h3 headings
+_SECTION_HEADING_RE = re.compile(r"^#{1,3} (.*)$")
+# Words too common to tell sections apart; they are ignored in queries
+STOP_WORDS = frozenset(
+    """
+    a an and are as at be by can do does for from how i in is it my of on or
+    the this to use using what when where which why with you your
+    """.split()
+)
+
+
+@dataclass
+class Section:
+    """A part of a documentation page under a single heading."""
+
+    url: str
+    heading: str
+    text: str
+
+
+@dataclass
+class SearchHit:
+    """A section matching a query, with its BM25 score."""
+
+    url: str
+    heading: str
+    text: str
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase alphanumeric terms.
+
+    Args:
+        text (str): The text to tokenize
+
+    Returns:
+        List[str]: The terms in order of appearance
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def query_terms(query: str) -> Set[str]:
+    """Lists the distinct terms of a query that are worth searching for.
+
+    Args:
+        query (str): The search query
+
+    Returns:
+        Set[str]: The query terms without stop-words
+    """
+    return set(tokenize(query)) - STOP_WORDS
+
+
+def split_sections(url: str, html: str, selectors: Sequence[str] = ()) -> List[Section]:
+    """Splits an HTML page into sections at its h1-h3 headings.
+
+    The text is extracted like fetched pages are (see extraction.py), so the
+    same noise is dropped and the main content is used when the page has one.
+
+    Args:
+        url (str): The page URL
+        html (str): The page HTML
+        selectors (Sequence[str]): Elements holding the main content, see
+            StreamingExtractor
+
+    Returns:
+        List[Section]: The non-empty sections of the page, in document order
+    """
+    extractor = StreamingExtractor(selectors=selectors)
+    extractor.feed(html)
+    text = extractor.close()
+
+    sections = []
+    heading, lines = extractor.title, []
+    in_code = False
+    for line in text.split("\n") + ["# "]:
+        if line == "```":
+            in_code = not in_code
+        match = None if in_code else _SECTION_HEADING_RE.match(line)
+        if match:
+            if lines:
+                sections.append(Section(url=url, heading=heading, text="\n".join(lines)))
+            heading, lines = match.group(1).strip(), []
+        elif line.strip():
+            lines.append(line)
+    return sections
+
+
+class DocsIndex:
+    """SQLite-backed BM25 inverted index over documentation sections.
+
+    Pages are tracked with a content hash and their HTTP validators so that
+    re-crawls only reindex pages that changed.
+    """
+
+    def __init__(self, path: str):
+        """Opens (and creates if needed) the index database.
+
+        Args:
+            path (str): Path of the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                library TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                links TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sections (
+                id INTEGER PRIMARY KEY,
+                library TEXT NOT NULL,
+                url TEXT NOT NULL,
+                heading TEXT NOT NULL,
+                text TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                section_id INTEGER NOT NULL,
+                tf INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sections_url ON sections (url);
+            CREATE INDEX IF NOT EXISTS sections_library ON sections (library);
+            CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+            CREATE INDEX IF NOT EXISTS postings_section ON postings (section_id);
+            """
+        )
+        # Added after the first release; older databases lack the column
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "links" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN links TEXT")
+        self._conn.commit()
+
+    def page_state(self, url: str) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        """Gets the stored hash and validators of an indexed page.
+
+        Args:
+            url (str): The page URL
+
+        Returns:
+            Optional[Tuple[str, Optional[str], Optional[str]]]: (content hash, ETag,
+                Last-Modified), or None if the page is not indexed
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT content_hash, etag, last_modified FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def page_links(self, url: str) -> List[str]:
+        """Gets the in-scope links found on an indexed page when it was last fetched.
+
+        Args:
+            url (str): The page URL
+
+        Returns:
+            List[str]: The stored link URLs, empty if none are known
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT links FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else []
+
+    def set_page_links(self, url: str, links: List[str]) -> None:
+        """Stores the in-scope links of an indexed page.
+
+        Args:
+            url (str): The page URL
+            links (List[str]): The link URLs found on the page
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET links = ? WHERE url = ?", (json.dumps(links), url)
+            )
+            self._conn.commit()
+
+    def index_page(
+        self,
+        library: str,
+        url: str,
+        sections: List[Section],
+        content_hash: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        links: Optional[List[str]] = None,
+    ) -> None:
+        """Replaces the indexed sections of a page.
+
+        Args:
+            library (str): The library the page belongs to
+            url (str): The page URL
+            sections (List[Section]): The page sections to index
+            content_hash (str): Hash of the page content, for change detection
+            etag (Optional[str]): The ETag response header, if any
+            last_modified (Optional[str]): The Last-Modified response header, if any
+            links (Optional[List[str]]): In-scope links found on the page, followed
+                again by re-crawls that get a 304 for it
+        """
+        with self._lock:
+            self._delete_sections(url)
+            for section in sections:
+                terms = Counter(tokenize(f"{section.heading} {section.text}"))
+                cursor = self._conn.execute(
+                    """
+                    INSERT INTO sections (library, url, heading, text, length)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (library, url, section.heading, section.text, sum(terms.values())),
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, section_id, tf) VALUES (?, ?, ?)",
+                    [(term, cursor.lastrowid, tf) for term, tf in terms.items()],
+                )
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO pages
+                    (url, library, content_hash, etag, last_modified, links)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    library,
+                    content_hash,
+                    etag,
+                    last_modified,
+                    json.dumps(links) if links is not None else None,
+                ),
+            )
+            self._conn.commit()
+
+    def remove_page(self, url: str) -> None:
+        """Removes a page and its sections from the index.
+
+        Args:
+            url (str): The page URL
+        """
+        with self._lock:
+            self._delete_sections(url)
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def page_urls(self, library: str) -> Set[str]:
+        """Returns the URLs of all indexed pages of a library.
+
+        Args:
+            library (str): The library name
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM pages WHERE library = ?", (library,)
+            ).fetchall()
+        return {url for (url,) in rows}
+
+    def sections(self, library: str) -> List[Section]:
+        """Returns all indexed sections of a library, in page order.
+
+        Args:
+            library (str): The library name
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, heading, text FROM sections WHERE library = ? ORDER BY id",
+                (library,),
+            ).fetchall()
+        return [Section(url=url, heading=heading, text=text) for url, heading, text in rows]
+
+    def search(
+        self,
+        library: str,
+        query: str,
+        top_k: int = LOCAL_INDEX_TOP_K,
+        min_coverage: float = 0.0,
+    ) -> List[SearchHit]:
+        """Ranks the sections of a library against a query with BM25.
+
+        Stop-words in the query are ignored, so a section sharing only words
+        like "the" or "how" with the query does not match.
+
+        Args:
+            library (str): The library to search
+            query (str): The search query
+            top_k (int): Maximum number of sections to return
+            min_coverage (float): Fraction of the query terms a section must contain
+
+        Returns:
+            List[SearchHit]: The best matching sections, highest score first
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            count, average_length = self._conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM sections WHERE library = ?", (library,)
+            ).fetchone()
+            if not count:
+                return []
+            scores: Dict[int, float] = {}
+            matched: Counter = Counter()
+            for term in terms:
+                postings = self._conn.execute(
+                    """
+                    SELECT p.section_id, p.tf, s.length FROM postings p
+                    JOIN sections s ON s.id = p.section_id
+                    WHERE p.term = ? AND s.library = ?
+                    """,
+                    (term, library),
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for section_id, tf, length in postings:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    score = idf * tf * (BM25_K1 + 1) / norm
+                    scores[section_id] = scores.get(section_id, 0.0) + score
+                    matched[section_id] += 1
+
+            covered = [
+                (section_id, score)
+                for section_id, score in scores.items()
+                if matched[section_id] >= min_coverage * len(terms)
+            ]
+            best = sorted(covered, key=lambda item: item[1], reverse=True)[:top_k]
+            hits = []
+            for section_id, score in best:
+                url, heading, text = self._conn.execute(
+                    "SELECT url, heading, text FROM sections WHERE id = ?", (section_id,)
+                ).fetchone()
+                hits.append(SearchHit(url=url, heading=heading, text=text, score=score))
+        return hits
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _delete_sections(self, url: str) -> None:
+        """Deletes the sections and postings of a page (lock must be held)."""
+        self._conn.execute(
+            """
+            DELETE FROM postings
+            WHERE section_id IN (SELECT id FROM sections WHERE url = ?)
+            """,
+            (url,),
+        )
+        self._conn.execute("DELETE FROM sections WHERE url = ?", (url,))
+
+
+def _in_scope(url: str, docs_url: str) -> bool:
+    """Checks whether a URL lies under a documentation site prefix."""
+    return url == docs_url or url.startswith(docs_url.rstrip("/") + "/")
+
+
+async def discover_sitemap_urls(
+    client: "httpx.AsyncClient", docs_url: str, sitemap_url: Optional[str] = None
+) -> List[str]:
+    """Lists documentation page URLs from the site's sitemap.xml.
+
+    Sitemap indexes are followed one level deep.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client to use
+        docs_url (str): The documentation site URL
+        sitemap_url (Optional[str]): The sitemap to read, defaults to /sitemap.xml
+
+    Returns:
+        List[str]: The in-scope page URLs, or an empty list if there is no sitemap
+    """
+    import httpx
+
+    parts = urlsplit(docs_url)
+    pending = [sitemap_url or f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+    seen_sitemaps: Set[str] = set()
+    urls: List[str] = []
+    while pending:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen_sitemaps:
+            continue
+        seen_sitemaps.add(sitemap_url)
+        try:
+            response = await client.get(sitemap_url, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            root = ElementTree.fromstring(response.content)
+        except (httpx.HTTPError, ElementTree.ParseError):
+            continue
+        locations = [
+            element.text.strip()
+            for element in root.iter()
+            if element.tag.endswith("loc") and element.text
+        ]
+        if root.tag.endswith("sitemapindex"):
+            pending.extend(locations)
+        else:
+            urls.extend(url for url in locations if _in_scope(url, docs_url))
+    return list(dict.fromkeys(urls))
+
+
+def extract_links(base_url: str, html: str, docs_url: str) -> List[str]:
+    """Finds in-scope links on a page, without fragments.
+
+    Args:
+        base_url (str): The URL of the page the HTML came from
+        html (str): The page HTML
+        docs_url (str): The documentation site URL bounding the crawl
+
+    Returns:
+        List[str]: The absolute in-scope link URLs, deduplicated
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        url, _ = urldefrag(urljoin(base_url, anchor["href"]))
+        if _in_scope(url, docs_url):
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+
+@dataclass
+class CrawlStats:
+    """Counts of what a crawl did, per page outcome."""
+
+    indexed: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    removed: int = 0
+
+
+async def crawl_library(
+    library: str,
+    index: "DocsIndex",
+    client: "httpx.AsyncClient",
+    max_pages: int = CRAWL_MAX_PAGES,
+) -> CrawlStats:
+    """Crawls a library's documentation site into the index.
+
+    Page URLs come from the sitemap when available, otherwise links are
+    followed from the documentation root. Pages whose validators or content
+    hash are unchanged are skipped; the links stored when they were indexed
+    are followed instead, as they are for pages that failed to fetch. Pages
+    that disappeared are removed from the index, but only after a complete
+    crawl without failed fetches, since otherwise pages may just not have
+    been reached.
+
+    Args:
+        library (str): The library name from the registry
+        index (DocsIndex): The index to update
+        client (httpx.AsyncClient): The HTTP client to use
+        max_pages (int): Maximum number of pages to visit
+
+    Returns:
+        CrawlStats: What happened to the visited pages
+    """
+    import httpx
+
+    entry = get_library(library)
+    docs_url = entry.url
+    stats = CrawlStats()
+    sitemap_urls = await discover_sitemap_urls(client, docs_url, entry.sitemap)
+    follow_links = not sitemap_urls
+    queue = sitemap_urls or [docs_url]
+    seen: Set[str] = set(queue)
+    visited: Set[str] = set()
+    semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+    async def visit(url: str) -> List[str]:
+        async with semaphore:
+            state = index.page_state(url)
+            headers = {}
+            if state and state[1]:
+                headers["If-None-Match"] = state[1]
+            if state and state[2]:
+                headers["If-Modified-Since"] = state[2]
+            try:
+                response = await client.get(url, timeout=HTTP_TIMEOUT, headers=headers)
+                if response.status_code == 304:
+                    stats.unchanged += 1
+                    return index.page_links(url) if follow_links else []
+                response.raise_for_status()
+            except httpx.HTTPError:
+                stats.failed += 1
+                return index.page_links(url) if follow_links else []
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            return []
+        html = response.text
+        links = extract_links(url, html, docs_url) if follow_links else []
+        content_hash = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        if state and state[0] == content_hash:
+            stats.unchanged += 1
+            index.set_page_links(url, links)
+        else:
+            index.index_page(
+                library,
+                url,
+                split_sections(url, html, entry.selectors),
+                content_hash,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                links=links,
+            )
+            stats.indexed += 1
+        return links
+
+    while queue and len(visited) < max_pages:
+        batch = queue[: max_pages - len(visited)]
+        queue = queue[len(batch):]
+        visited.update(batch)
+        for links in await asyncio.gather(*(visit(url) for url in batch)):
+            for link in links:
+                if link not in seen:
+                    seen.add(link)
+                    queue.append(link)
+
+    if not queue and not stats.failed:
+        for url in index.page_urls(library) - visited:
+            index.remove_page(url)
+            stats.removed += 1
+    return stats
+
+
+def format_hits(hits: List[SearchHit]) -> str:
+    """Formats index hits as the text returned by get_docs.
+
+    Args:
+        hits (List[SearchHit]): The ranked sections
+
+    Returns:
+        str: The sections with their headings and source URLs
+    """
+    blocks = []
+    for hit in hits:
+        heading = f"## {hit.heading}\n" if hit.heading else ""
+        blocks.append(f"{heading}{hit.text}\nSource: {hit.url}")
+    return "\n\n".join(blocks)
+
+
+_docs_index: Optional[DocsIndex] = None
+
+
+def get_docs_index() -> Optional[DocsIndex]:
+    """Returns the shared documentation index, opening it on first use.
+
+    Returns:
+        Optional[DocsIndex]: The index, or None if the local index is disabled
+    """
+    global _docs_index
+    if not LOCAL_INDEX_ENABLED:
+        return None
+    if _docs_index is None:
+        _docs_index = DocsIndex(LOCAL_INDEX_PATH)
+    return _docs_index
+
+
+def close_docs_index() -> None:
+    """Closes the shared documentation index if it is open."""
+    global _docs_index
+    if _docs_index is not None:
+        _docs_index.close()
+        _docs_index = None
+
+
+def search_local_index(library: str, query: str) -> Optional[str]:
+    """Answers a query from the local index if it has relevant sections.
+
+    A section is relevant when it contains at least LOCAL_INDEX_MIN_COVERAGE
+    of the query's terms, stop-words aside.
+
+    Args:
+        library (str): The normalized library name
+        query (str): The search query
+
+    Returns:
+        Optional[str]: The formatted matching sections, or None on a miss
+    """
+    index = get_docs_index()
+    if index is None:
+        return None
+    hits = [
+        hit
+        for hit in index.search(library, query, min_coverage=LOCAL_INDEX_MIN_COVERAGE)
+        if hit.score > LOCAL_INDEX_MIN_SCORE
+    ]
+    return format_hits(hits) if hits else None
+
+
+async def main(libraries: List[str]) -> None:
+    """Crawls the given libraries (or all of them) into the local index.
+
+    Args:
+        libraries (List[str]): Library names from the registry
+    """
+    from services import get_http_client, close_http_client
+
+    index = DocsIndex(LOCAL_INDEX_PATH)
+    client = get_http_client()
+    try:
+        for library in libraries:
+            stats = await crawl_library(library, index, client)
+            print(
+                f"{library}: {stats.indexed} indexed, {stats.unchanged} unchanged, "
+                f"{stats.failed} failed, {stats.removed} removed"
+            )
+    finally:
+        await close_http_client()
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawl documentation sites into the local index."
+    )
+    parser.add_argument(
+        "libraries", nargs="*", help="Libraries to crawl (default: all)"
+    )
+    selected = parser.parse_args().libraries or get_registry().names()
+    unknown = [library for library in selected if not get_library(library)]
+    if unknown:
+        parser.error(f"unknown libraries: {', '.join(unknown)}")
+    asyncio.run(main(selected))
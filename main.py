@@ -1,58 +1,519 @@
 """Main entry point for the MCP Documentation Search Server."""
 
-from fastmcp import FastMCP
-from utils import validate_library, get_library_url
-from services import search_documentation
+import argparse
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypedDict
+from fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from utils import resolve_library, unsupported_library_message
+from registry import get_registry
+from services import (
+    PageCallback,
+    assemble_results,
+    search_documentation,
+    warm_up,
+    close_http_client,
+    shutdown_search_executor,
+    search_queue_depth,
+    start_background_refresh,
+    stop_background_refresh,
+    wait_for_embeddings,
+)
+from cache import close_page_cache, close_search_cache
+from indexing import search_local_index, close_docs_index
+from vectors import get_vector_store, search_vectors, close_vector_store
+from config import (
+    OUTPUT_BUDGET_CHARS,
+    MAX_BATCH_QUERIES,
+    MAX_SEARCH_RESULTS_LIMIT,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_PATH,
+)
+from singleflight import SingleFlight
+from tracing import metrics, span, trace
 
-mcp = FastMCP("docs")
 
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Owns the shared HTTP client and caches for the lifetime of the server.
 
-async def get_docs_impl(query: str, library: str) -> str:
+    The HTTP and search libraries are imported and the pooled client is
+    opened in the background once the server starts, so the handshake does
+    not wait for them while connections and TLS sessions are still reused
+    across tool calls. The background refresh of stale and popular pages
+    runs for as long as the server does. On shutdown the client is closed
+    together with the search executor and the cache, local index and
+    vector databases. In HTTP mode every worker process runs its own lifespan,
+    but only one of several workers runs the background refresh.
+
+    Args:
+        server (FastMCP): The server instance being started
+    """
+    warming = asyncio.create_task(warm_up())
+    start_background_refresh()
+    try:
+        yield
+    finally:
+        warming.cancel()
+        await asyncio.gather(warming, return_exceptions=True)
+        await stop_background_refresh()
+        await close_http_client()
+        shutdown_search_executor()
+        close_page_cache()
+        close_search_cache()
+        close_docs_index()
+        await wait_for_embeddings()
+        close_vector_store()
+
+
+mcp = FastMCP("docs", lifespan=lifespan)
+
+# In-flight get_docs answers, keyed on (library, normalized query, budget, max_results)
+_docs_flight = SingleFlight()
+
+
+class DocsQuery(TypedDict):
+    """One question of a get_docs_batch call."""
+
+    query: str
+    library: str
+
+
+class DocsResult(TypedDict):
+    """The answer to one question of a get_docs_batch call."""
+
+    query: str
+    library: str
+    result: str
+
+
+async def get_docs_impl(
+    query: str,
+    library: str,
+    max_chars: Optional[int] = None,
+    on_page: Optional[PageCallback] = None,
+    max_results: Optional[int] = None,
+) -> str:
     """Implementation of the documentation search functionality.
     
     This function performs the following steps:
     1. Normalizes the library name to handle variations
     2. Validates the library is supported
-    3. Performs a site-specific search
-    4. Fetches and returns the content from search results
+    3. Answers from the local documentation index when it has matches
+    4. Otherwise performs a site-specific web search
+    5. Fetches and returns the content from search results
+
+    Concurrent calls for the same library and query (compared case- and
+    whitespace-insensitively) and the same max_chars and max_results share one answer
+    instead of each searching and fetching on their own.
 
     Args:
         query (str): The search query (e.g. "Chroma DB")
         library (str): The library to search docs for (e.g. "nillion")
+        max_chars (Optional[int]): Maximum response length, defaults to OUTPUT_BUDGET_CHARS
+        on_page (Optional[PageCallback]): Called with the URL and content (or
+            error message) of each web result page as soon as it is fetched
+        max_results (Optional[int]): Number of result pages to fetch, at most
+            MAX_SEARCH_RESULTS_LIMIT, defaults to MAX_SEARCH_RESULTS
 
     Returns:
         str: Combined text content from the search results or error message
     """
-    # Validate library and get normalized name
-    normalized_library = validate_library(library)
-    if not normalized_library:
-        from config import DOCS_URLS
+    budget = max_chars if max_chars and max_chars > 0 else OUTPUT_BUDGET_CHARS
+    if max_results is not None:
+        max_results = min(max(max_results, 1), MAX_SEARCH_RESULTS_LIMIT)
+
+    with trace("get_docs", library=library, query=query) as attributes:
+        # Resolve the normalized library name and its URL in one lookup
+        with span("normalize_library", library=library):
+            resolved = resolve_library(library)
+        if not resolved:
+            return unsupported_library_message(library)
+        normalized_library, docs_url = resolved
+
+        if on_page is not None:
+            # Page callbacks belong to one caller, so these calls are not shared
+            source, result = await _answer_docs(
+                query, normalized_library, docs_url, budget, max_results, on_page
+            )
+        else:
+            key = (normalized_library, " ".join(query.lower().split()), budget, max_results)
+            attributes["coalesced"] = _docs_flight.running(key)
+            if attributes["coalesced"]:
+                metrics.increment("get_docs_coalesced")
+            source, result = await _docs_flight.do(
+                key,
+                lambda: _answer_docs(
+                    query, normalized_library, docs_url, budget, max_results
+                ),
+            )
+        attributes["source"] = source
+        return result
 
-        return f"❌ Library not supported: {library}. Available libraries: {', '.join(DOCS_URLS.keys())}"
 
-    # Get documentation URL
-    docs_url = get_library_url(normalized_library)
-    if not docs_url:
-        return f"❌ Documentation URL not found for library: {library}"
+async def _answer_docs(
+    query: str,
+    library: str,
+    docs_url: str,
+    budget: int,
+    max_results: Optional[int] = None,
+    on_page: Optional[PageCallback] = None,
+) -> Tuple[str, str]:
+    """Answers a query about a resolved library.
+
+    Args:
+        query (str): The search query
+        library (str): The normalized library name
+        docs_url (str): The library's documentation URL
+        budget (int): Maximum response length
+        max_results (Optional[int]): Number of result pages to fetch
+        on_page (Optional[PageCallback]): Called with each web result page
+
+    Returns:
+        Tuple[str, str]: Where the answer came from ("index", "vectors" or
+            "web") and the answer
+    """
+    # Answer from the offline index, falling back to web search on a miss
+    with span("local_index", library=library) as index_attributes:
+        indexed = search_local_index(library, query)
+        index_attributes["hit"] = bool(indexed)
+    if indexed:
+        return "index", indexed[:budget]
+
+    # Passages similar in meaning, if vector retrieval is enabled
+    if get_vector_store() is not None:
+        with span("vector_search", library=library) as vector_attributes:
+            similar = await asyncio.to_thread(search_vectors, library, query)
+            vector_attributes["hit"] = bool(similar)
+        if similar:
+            return "vectors", similar[:budget]
 
     # Search documentation and return results
-    return await search_documentation(query, docs_url)
+    return "web", await search_documentation(
+        query, docs_url, max_chars=budget, on_page=on_page, max_results=max_results
+    )
+
+
+def format_sources(pages: List[Tuple[str, str]]) -> str:
+    """Summarizes which result pages could be used.
+
+    Args:
+        pages (List[Tuple[str, str]]): (url, content or error message) per page
+
+    Returns:
+        str: One line per page, marked ✅ if fetched or ❌ with the reason
+    """
+    lines = ["Sources:"]
+    for url, content in pages:
+        if content.startswith("❌"):
+            lines.append(f"❌ {url} ({content.lstrip('❌ ')})")
+        else:
+            lines.append(f"✅ {url}")
+    return "\n".join(lines)
+
+
+async def get_docs_progressive_impl(
+    query: str,
+    library: str,
+    max_chars: Optional[int] = None,
+    on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+    max_results: Optional[int] = None,
+) -> str:
+    """Documentation search that reports partial results while pages arrive.
+
+    Each result page is passed to on_partial as soon as it is fetched and
+    parsed, reduced to its passages most relevant to the query, so a client
+    can show useful content before the slowest page has arrived. The final
+    answer ends with a summary of which URLs succeeded.
+
+    Args:
+        query (str): The search query
+        library (str): The library to search docs for
+        max_chars (Optional[int]): Maximum response length, defaults to OUTPUT_BUDGET_CHARS
+        on_partial (Optional[Callable[[str], Awaitable[None]]]): Receives the
+            partial content of each page
+        max_results (Optional[int]): Number of result pages to fetch
+
+    Returns:
+        str: The combined answer followed by the source summary
+    """
+    budget = max_chars if max_chars and max_chars > 0 else OUTPUT_BUDGET_CHARS
+    pages: List[Tuple[str, str]] = []
+
+    async def on_page(url: str, content: str) -> None:
+        pages.append((url, content))
+        if on_partial and not content.startswith("❌"):
+            await on_partial(assemble_results(query, [(url, content)], budget))
+
+    result = await get_docs_impl(
+        query, library, max_chars, on_page=on_page, max_results=max_results
+    )
+    if not pages:
+        return result
+    return f"{result}\n\n{format_sources(pages)}"
+
+
+async def get_docs_batch_impl(
+    queries: List[DocsQuery],
+    max_chars: Optional[int] = None,
+    on_result: Optional[Callable[[int, DocsResult], Awaitable[None]]] = None,
+) -> List[DocsResult]:
+    """Answers several documentation questions concurrently.
+
+    Identical (query, library) pairs are answered once. Searches and page
+    fetches that overlap between different questions are shared as well,
+    since concurrent identical searches and fetches run only once.
+
+    Args:
+        queries (List[DocsQuery]): The questions, each with a query and a library
+        max_chars (Optional[int]): Maximum response length per question
+        on_result (Optional[Callable[[int, DocsResult], Awaitable[None]]]): Called
+            with the position and result of each question as soon as it is answered
+
+    Returns:
+        List[DocsResult]: One result per question, in the order given
+    """
+    results: List[Optional[DocsResult]] = [None] * len(queries)
+    positions: Dict[Tuple[str, str], List[int]] = {}
+    for index, item in enumerate(queries):
+        if index < MAX_BATCH_QUERIES:
+            positions.setdefault((item["query"], item["library"]), []).append(index)
+        else:
+            results[index] = DocsResult(
+                query=item["query"],
+                library=item["library"],
+                result=f"❌ Batch limit reached: at most {MAX_BATCH_QUERIES} queries per call",
+            )
+
+    async def answer(key: Tuple[str, str]) -> Tuple[Tuple[str, str], str]:
+        try:
+            return key, await get_docs_impl(key[0], key[1], max_chars)
+        except Exception as e:
+            return key, f"❌ Error: {e}"
+
+    with span("get_docs_batch", queries=len(queries), unique=len(positions)):
+        tasks = [asyncio.ensure_future(answer(key)) for key in positions]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                (query, library), result = await next_done
+                for index in positions[(query, library)]:
+                    results[index] = DocsResult(query=query, library=library, result=result)
+                    if on_result:
+                        await on_result(index, results[index])
+        finally:
+            for task in tasks:
+                task.cancel()
+    return results
 
 
 @mcp.tool()
-async def get_docs(query: str, library: str) -> str:
+async def get_docs(
+    query: str,
+    library: str,
+    max_chars: Optional[int] = None,
+    progressive: bool = False,
+    max_results: Optional[int] = None,
+    ctx: Context = None,
+) -> str:
     """Search the documentation of a library.
-    Supports nillion, nextjs, tailwind, mcp.
+    Call list_libraries for the supported libraries.
 
     Args:
         query (str): The search query (e.g. "Chroma DB")
         library (str): The library to search docs for (e.g. "nillion")
+        max_chars (Optional[int]): Maximum number of characters to return
+        progressive (bool): Send the content of each page as a progress
+            notification as soon as it is fetched, and end the answer with
+            a summary of which URLs succeeded
+        max_results (Optional[int]): Number of result pages to read (default 2,
+            at most 10); more pages give broader answers but take longer
 
     Returns:
         str: Combined text content from the search results or error message
     """
-    return await get_docs_impl(query, library)
+    if not progressive:
+        return await get_docs_impl(query, library, max_chars, max_results=max_results)
+
+    received = 0
+
+    async def report(partial: str) -> None:
+        nonlocal received
+        received += 1
+        if ctx is not None:
+            await ctx.report_progress(received, None, partial)
+
+    return await get_docs_progressive_impl(
+        query, library, max_chars, on_partial=report, max_results=max_results
+    )
+
+
+@mcp.tool()
+def list_libraries() -> List[str]:
+    """List the libraries whose documentation can be searched.
+
+    Returns:
+        List[str]: The supported library names
+    """
+    return get_registry().names()
+
+
+@mcp.tool()
+async def get_docs_batch(
+    queries: List[DocsQuery], max_chars: Optional[int] = None, ctx: Context = None
+) -> List[DocsResult]:
+    """Search the documentation of several libraries in one call.
+    Each query is a {"query", "library"} pair, e.g. the same concept in
+    nextjs and tailwind. Queries run concurrently and each answer is sent
+    as a progress notification as soon as it is ready.
+
+    Args:
+        queries (List[DocsQuery]): The questions to answer (at most 10)
+        max_chars (Optional[int]): Maximum number of characters per answer
+
+    Returns:
+        List[DocsResult]: The answer to each query, in the order given
+    """
+    completed = 0
+
+    async def report(index: int, result: DocsResult) -> None:
+        nonlocal completed
+        completed += 1
+        if ctx is not None:
+            await ctx.report_progress(
+                completed,
+                len(queries),
+                f"## {result['library']}: {result['query']}\n\n{result['result']}",
+            )
+
+    return await get_docs_batch_impl(queries, max_chars, on_result=report)
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    """Reports that the worker answering the request is up.
+
+    Args:
+        request (Request): The HTTP request
+
+    Returns:
+        JSONResponse: The worker's process id, library count and search queue depth
+    """
+    return JSONResponse(
+        {
+            "status": "ok",
+            "pid": os.getpid(),
+            "libraries": len(get_registry().names()),
+            "search_queue_depth": search_queue_depth(),
+        }
+    )
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Exports the counters and stage timings of the answering worker.
+
+    Args:
+        request (Request): The HTTP request
+
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text format
+    """
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        headers={"X-Worker-Pid": str(os.getpid())},
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+def create_http_app():
+    """Builds the ASGI app serving MCP over HTTP, plus /health and /metrics.
+
+    Called by uvicorn in each worker process. The transport and session
+    mode are read from DOCS_MCP_TRANSPORT and DOCS_MCP_STATELESS, which
+    serve_http sets before starting the workers.
+
+    Returns:
+        StarletteWithLifespan: The ASGI application
+    """
+    return mcp.http_app(
+        path=SERVER_PATH,
+        transport=os.environ.get("DOCS_MCP_TRANSPORT", "http"),
+        stateless_http=os.environ.get("DOCS_MCP_STATELESS") == "1",
+    )
+
+
+def serve_http(transport: str, host: str, port: int, workers: int) -> None:
+    """Serves MCP over the network from one or more worker processes.
+
+    With several workers, consecutive requests of one client may reach
+    different processes, so sessions are made stateless and the search
+    cache is moved to SQLite, where the page cache and local index already
+    live, so that all workers share one warm cache tier. The background
+    refresh of that tier then runs in a single worker.
+
+    Args:
+        transport (str): "http" (streamable HTTP) or "sse"
+        host (str): The interface to listen on
+        port (int): The port to listen on
+        workers (int): Number of worker processes
+
+    Raises:
+        ValueError: If SSE is combined with several workers
+    """
+    if transport == "sse" and workers > 1:
+        raise ValueError("SSE sessions cannot span workers; use --transport http")
+    import uvicorn
+
+    os.environ["DOCS_MCP_TRANSPORT"] = transport
+    if workers > 1:
+        os.environ["DOCS_MCP_STATELESS"] = "1"
+        os.environ["DOCS_REFRESH_SINGLE_WORKER"] = "1"
+        os.environ.setdefault("DOCS_SEARCH_CACHE", "sqlite")
+    uvicorn.run(
+        "main:create_http_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parses the server command line.
+
+    Args:
+        argv (Optional[List[str]]): The arguments, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: The transport and HTTP serving options
+    """
+    parser = argparse.ArgumentParser(description="MCP documentation search server.")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http", "sse"],
+        default="stdio",
+        help="stdio for a single client, http or sse to serve over the network",
+    )
+    parser.add_argument("--host", default=SERVER_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on")
+    parser.add_argument(
+        "--workers", type=int, default=SERVER_WORKERS, help="Worker processes (http only)"
+    )
+    args = parser.parse_args(argv)
+    if args.transport == "sse" and args.workers > 1:
+        parser.error("SSE sessions cannot span workers; use --transport http")
+    return args
 
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    args = parse_args()
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        serve_http(args.transport, args.host, args.port, args.workers)
\ No newline at end of file
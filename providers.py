@@ -0,0 +1,168 @@
+"""Search providers that find documentation pages for a query.
+
+A provider turns a query about one library into result page URLs. get_docs
+tries the providers named by the library's registry entry (or the default
+SEARCH_PROVIDERS chain) in order and falls back to the next one when a
+provider is unavailable or finds nothing, so hot libraries can be answered
+from a fast local provider while the web search covers the long tail.
+
+Built-in providers:
+
+- "duckduckgo": site-restricted web search (services.find_result_urls)
+- "local": pages of the offline documentation index (indexing.py)
+
+Other providers subclass SearchProvider and are added with register_provider().
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+from config import LOCAL_PROVIDER_MIN_COVERAGE
+from indexing import get_docs_index
+from tracing import get_logger, span
+
+logger = get_logger("docs.providers")
+
+
+class SearchUnavailableError(Exception):
+    """Raised when a search provider keeps failing or is being skipped."""
+
+
+class SearchProvider(ABC):
+    """Finds documentation page URLs for a query.
+
+    Subclasses set name and implement search(); one that does not cannot be
+    instantiated. A provider that cannot
+    answer at all (as opposed to finding nothing) raises
+    SearchUnavailableError, so that the next provider in the chain is tried.
+    """
+
+    name = ""
+
+    @abstractmethod
+    async def search(
+        self, query: str, library: Optional[str], site_url: str, max_results: int
+    ) -> List[str]:
+        """Finds result pages for a query.
+
+        Args:
+            query (str): The search query
+            library (Optional[str]): The normalized library name, None for unknown sites
+            site_url (str): The library's documentation URL
+            max_results (int): Maximum number of URLs to return
+
+        Returns:
+            List[str]: Result URLs, best first
+
+        Raises:
+            SearchUnavailableError: If the provider cannot search right now
+        """
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Web search restricted to the documentation site."""
+
+    name = "duckduckgo"
+
+    async def search(
+        self, query: str, library: Optional[str], site_url: str, max_results: int
+    ) -> List[str]:
+        # Imported here since services uses this module to pick providers
+        from services import find_result_urls
+
+        return (await find_result_urls(query, site_url, max_results))[:max_results]
+
+
+class LocalIndexProvider(SearchProvider):
+    """Pages of the offline index with sections partly matching the query.
+
+    get_docs answers from the index directly when a section contains at
+    least LOCAL_INDEX_MIN_COVERAGE of the query terms, so this provider only
+    runs after such a miss. It returns the pages of weaker matches, sections
+    with at least LOCAL_PROVIDER_MIN_COVERAGE of the terms, which are then
+    fetched and ranked in full.
+    """
+
+    name = "local"
+
+    async def search(
+        self, query: str, library: Optional[str], site_url: str, max_results: int
+    ) -> List[str]:
+        index = get_docs_index()
+        if index is None:
+            raise SearchUnavailableError("local index is disabled")
+        if library is None:
+            raise SearchUnavailableError(f"no indexed library for {site_url}")
+        urls: List[str] = []
+        # A page can match with several sections, so look at a few more
+        hits = index.search(
+            library, query, top_k=max_results * 4, min_coverage=LOCAL_PROVIDER_MIN_COVERAGE
+        )
+        for hit in hits:
+            if hit.url not in urls:
+                urls.append(hit.url)
+        return urls[:max_results]
+
+
+_providers: Dict[str, SearchProvider] = {}
+
+
+def register_provider(provider: SearchProvider) -> None:
+    """Makes a provider available to provider chains under its name.
+
+    Args:
+        provider (SearchProvider): The provider, replacing any with the same name
+    """
+    _providers[provider.name] = provider
+
+
+def get_provider(name: str) -> Optional[SearchProvider]:
+    """Returns the provider registered under a name, if any."""
+    return _providers.get(name)
+
+
+register_provider(DuckDuckGoProvider())
+register_provider(LocalIndexProvider())
+
+
+async def search_providers(
+    chain: Sequence[str],
+    query: str,
+    library: Optional[str],
+    site_url: str,
+    max_results: int,
+) -> List[str]:
+    """Finds result URLs with the first provider of a chain that has any.
+
+    Args:
+        chain (Sequence[str]): Provider names, in the order to try them
+        query (str): The search query
+        library (Optional[str]): The normalized library name
+        site_url (str): The library's documentation URL
+        max_results (int): Maximum number of URLs to return
+
+    Returns:
+        List[str]: The result URLs, or an empty list if no provider found any
+
+    Raises:
+        SearchUnavailableError: If nothing was found and a provider was unavailable,
+            since its results might have been found otherwise
+    """
+    error: Optional[SearchUnavailableError] = None
+    for name in chain:
+        provider = _providers.get(name)
+        if provider is None:
+            logger.warning("unknown_search_provider", extra={"fields": {"provider": name}})
+            continue
+        with span("search_provider", provider=name) as attributes:
+            try:
+                urls = await provider.search(query, library, site_url, max_results)
+            except SearchUnavailableError as e:
+                attributes["unavailable"] = str(e)
+                error = e
+                continue
+            attributes["results"] = len(urls)
+        if urls:
+            return urls[:max_results]
+    if error is not None:
+        raise error
+    return []
@@ -0,0 +1,118 @@
+"""Query-relevant passage ranking for fetched documentation pages.
+
+Fetched pages are split into passages at headings and paragraph boundaries,
+scored against the query with BM25 over the whole candidate set at once, and
+only the best passages are returned with their source URLs.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import List
+from config import PASSAGE_TOP_K, PASSAGE_MAX_CHARS
+from indexing import BM25_B, BM25_K1, SearchHit, Section, tokenize
+
+_HEADING_RE = re.compile(r"^(#{1,6}) (.+)$")
+
+
+def split_passages(
+    url: str, text: str, max_chars: int = PASSAGE_MAX_CHARS
+) -> List[Section]:
+    """Splits extracted page text into passages.
+
+    A new passage starts at every markdown-style heading produced by the
+    extractor, and long sections are split further at blank lines once they
+    exceed max_chars. Code blocks are never split.
+
+    Args:
+        url (str): The page URL
+        text (str): The extracted page text
+        max_chars (int): Soft maximum passage length
+
+    Returns:
+        List[Section]: The non-empty passages in page order
+    """
+    passages: List[Section] = []
+    heading = ""
+    lines: List[str] = []
+    in_code = False
+
+    def flush() -> None:
+        body = "\n".join(lines).strip()
+        if body:
+            passages.append(Section(url=url, heading=heading, text=body))
+        lines.clear()
+
+    for line in text.split("\n"):
+        if line.strip() == "```":
+            in_code = not in_code
+        elif not in_code:
+            match = _HEADING_RE.match(line)
+            if match:
+                flush()
+                heading = match.group(2).strip()
+                continue
+            if not line.strip() and sum(len(part) + 1 for part in lines) >= max_chars:
+                flush()
+                continue
+        lines.append(line)
+    flush()
+    return passages
+
+
+def rank_passages(
+    query: str, passages: List[Section], top_k: int = PASSAGE_TOP_K
+) -> List[SearchHit]:
+    """Ranks passages against a query with BM25.
+
+    Document frequencies and length normalization are computed over all
+    candidate passages together. If no passage shares a term with the query,
+    the first top_k passages are returned in page order instead.
+
+    Args:
+        query (str): The search query
+        passages (List[Section]): The candidate passages
+        top_k (int): Maximum number of passages to return
+
+    Returns:
+        List[SearchHit]: The best passages, highest score first
+    """
+    if not passages:
+        return []
+
+    term_counts = [Counter(tokenize(f"{p.heading} {p.text}")) for p in passages]
+    lengths = [sum(counts.values()) for counts in term_counts]
+    average_length = sum(lengths) / len(lengths) or 1.0
+    count = len(passages)
+
+    idf = {}
+    for term in set(tokenize(query)):
+        frequency = sum(1 for counts in term_counts if term in counts)
+        if frequency:
+            idf[term] = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+    scores = []
+    for counts, length in zip(term_counts, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        scores.append(
+            sum(
+                weight * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+                for term, weight in idf.items()
+                if term in counts
+            )
+        )
+
+    order = sorted(range(count), key=lambda index: scores[index], reverse=True)
+    if scores[order[0]] <= 0:
+        order = list(range(count))
+    else:
+        order = [index for index in order if scores[index] > 0]
+    return [
+        SearchHit(
+            url=passages[index].url,
+            heading=passages[index].heading,
+            text=passages[index].text,
+            score=scores[index],
+        )
+        for index in order[:top_k]
+    ]
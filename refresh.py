@@ -0,0 +1,164 @@
+"""Background refresh of cached pages and search results.
+
+Stale cache entries are served immediately while a refresh job brings them
+up to date in the background (stale-while-revalidate), and popular pages are
+refreshed ahead of time so that they rarely go stale at all. Refresh jobs
+run with limited concurrency and their own rate limit, and wait while live
+requests are in flight, so refresh traffic never competes with get_docs.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, List, Optional, Set
+from config import (
+    REFRESH_CONCURRENCY,
+    REFRESH_RATE_LIMIT,
+    REFRESH_QUEUE_SIZE,
+    REFRESH_IDLE_WAIT,
+)
+from resilience import TokenBucket
+from tracing import get_logger, metrics, span
+
+logger = get_logger("docs.refresh")
+
+# A refresh job: called with no arguments, its result is ignored
+RefreshJob = Callable[[], Awaitable[Any]]
+
+
+class RefreshScheduler:
+    """Runs refresh jobs in the background at low priority.
+
+    Jobs are queued under a key; a key that is already queued or running is
+    not queued again, and jobs beyond queue_size are dropped. Each worker
+    waits until is_busy() returns False and for a token from the refresh
+    rate limiter before starting a job. Failed jobs are logged and counted
+    but otherwise ignored, since the stale entry simply stays in the cache.
+    """
+
+    def __init__(
+        self,
+        is_busy: Callable[[], bool],
+        concurrency: int = REFRESH_CONCURRENCY,
+        rate: float = REFRESH_RATE_LIMIT,
+        queue_size: int = REFRESH_QUEUE_SIZE,
+    ):
+        """Creates a stopped scheduler; call start() from the event loop.
+
+        Args:
+            is_busy (Callable[[], bool]): Returns True while live requests are running
+            concurrency (int): Maximum number of jobs running at once
+            rate (float): Maximum number of jobs started per second
+            queue_size (int): Maximum number of queued jobs
+        """
+        self.is_busy = is_busy
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._limiter = TokenBucket(rate, max(1.0, rate))
+        self._queue: Optional[asyncio.Queue] = None
+        self._keys: Set[Hashable] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        """Whether the scheduler has been started and not stopped."""
+        return bool(self._tasks)
+
+    def pending(self) -> int:
+        """Returns the number of jobs queued or running."""
+        return len(self._keys)
+
+    def start(self) -> None:
+        """Starts the worker tasks on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Cancels the workers and periodic tasks and drops queued jobs."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+        self._keys.clear()
+
+    def schedule(self, key: Hashable, job: RefreshJob) -> bool:
+        """Queues a job unless one with the same key is already pending.
+
+        Args:
+            key (Hashable): Identifies what the job refreshes, e.g. ("page", url)
+            job (RefreshJob): Performs the refresh
+
+        Returns:
+            bool: True if the job is queued or an equivalent one already is,
+                False if the scheduler is stopped or its queue is full
+        """
+        if not self.running:
+            return False
+        if key in self._keys:
+            return True
+        try:
+            self._queue.put_nowait((key, job))
+        except asyncio.QueueFull:
+            metrics.increment("refresh", result="dropped")
+            return False
+        self._keys.add(key)
+        return True
+
+    def every(self, interval: float, plan: Callable[[], Any], delay: float = 0.0) -> None:
+        """Calls plan after delay seconds and then every interval seconds.
+
+        Args:
+            interval (float): Seconds between calls
+            plan (Callable[[], Any]): Schedules refresh jobs, e.g. for popular pages
+            delay (float): Seconds before the first call
+        """
+
+        async def repeat() -> None:
+            await asyncio.sleep(delay)
+            while True:
+                try:
+                    plan()
+                except Exception:
+                    logger.exception("refresh_plan_error")
+                await asyncio.sleep(interval)
+
+        self._tasks.append(asyncio.create_task(repeat()))
+
+    async def _work(self) -> None:
+        """Runs queued jobs one at a time, yielding to live requests."""
+        while True:
+            key, job = await self._queue.get()
+            try:
+                while self.is_busy():
+                    await asyncio.sleep(REFRESH_IDLE_WAIT)
+                await self._limiter.acquire()
+                with span("refresh", key=_describe(key)):
+                    await job()
+                metrics.increment("refresh", result="ok")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.increment("refresh", result="error")
+                logger.warning(
+                    "refresh_error",
+                    extra={"fields": {"key": _describe(key), "error": repr(e)}},
+                )
+            finally:
+                self._keys.discard(key)
+
+
+def _describe(key: Hashable) -> str:
+    """Formats a job key for logs, e.g. "page:https://...".
+
+    Args:
+        key (Hashable): The job key
+
+    Returns:
+        str: A readable form of the key
+    """
+    if isinstance(key, tuple):
+        return ":".join(str(part) for part in key)
+    return str(key)
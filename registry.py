@@ -0,0 +1,289 @@
+"""Registry of the documentation libraries the server supports.
+
+Library definitions (documentation URL, aliases, sitemap, cache TTL, content
+selectors, rate limit and search providers) are read from the TOML or JSON file named by
+LIBRARY_REGISTRY_PATH. The file is loaded on first use and reloaded when it
+changes on disk, so libraries can be added without restarting the server.
+Without a registry file the built-in libraries from config are used.
+
+Example registry file (TOML)::
+
+    [libraries.nextjs]
+    url = "https://nextjs.org/docs"
+    aliases = ["next", "next.js"]
+    sitemap = "https://nextjs.org/sitemap.xml"
+    ttl = 86400
+    selectors = ["article"]
+    rate_limit = 5.0
+    search_providers = ["local", "duckduckgo"]
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from config import (
+    DOCS_URLS,
+    LIBRARY_ALIASES,
+    PAGE_CACHE_TTLS,
+    LIBRARY_REGISTRY_PATH,
+    REGISTRY_CHECK_INTERVAL,
+)
+from extraction import parse_selector
+from tracing import get_logger
+
+logger = get_logger("docs.registry")
+
+
+class RegistryError(ValueError):
+    """Raised when a registry file is malformed."""
+
+
+@dataclass(frozen=True)
+class LibraryEntry:
+    """The definition of one supported library."""
+
+    name: str
+    url: str
+    aliases: Tuple[str, ...] = ()
+    # Sitemap used by the crawler instead of <host>/sitemap.xml
+    sitemap: Optional[str] = None
+    # Seconds fetched pages stay fresh in the page cache
+    ttl: Optional[float] = None
+    # Elements holding the documentation text, e.g. "article" or "div.content"
+    selectors: Tuple[str, ...] = ()
+    # Maximum requests per second to the documentation host
+    rate_limit: Optional[float] = None
+    # Search providers tried in order, instead of the SEARCH_PROVIDERS default
+    search_providers: Tuple[str, ...] = ()
+
+
+def _string_list(name: str, field: str, value: Any) -> Tuple[str, ...]:
+    """Validates a list of strings from a registry entry."""
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise RegistryError(f"library {name!r}: {field} must be a list of strings")
+    return tuple(value)
+
+
+def _number(name: str, field: str, value: Any) -> Optional[float]:
+    """Validates an optional positive number from a registry entry."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise RegistryError(f"library {name!r}: {field} must be a positive number")
+    return float(value)
+
+
+def parse_registry(data: Mapping[str, Any]) -> Dict[str, LibraryEntry]:
+    """Builds library entries from a parsed registry document.
+
+    Args:
+        data (Mapping[str, Any]): The document, with a "libraries" table
+            mapping each library name to its definition
+
+    Returns:
+        Dict[str, LibraryEntry]: The entries by library name
+
+    Raises:
+        RegistryError: If an entry is missing its URL or has invalid fields
+    """
+    libraries = data.get("libraries")
+    if not isinstance(libraries, dict):
+        raise RegistryError('registry must contain a "libraries" table')
+    entries = {}
+    for name, definition in libraries.items():
+        if not isinstance(definition, dict):
+            raise RegistryError(f"library {name!r}: definition must be a table")
+        url = definition.get("url")
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            raise RegistryError(f"library {name!r}: url must be an http(s) URL")
+        sitemap = definition.get("sitemap")
+        if sitemap is not None and not isinstance(sitemap, str):
+            raise RegistryError(f"library {name!r}: sitemap must be a URL")
+        selectors = _string_list(name, "selectors", definition.get("selectors", []))
+        for selector in selectors:
+            try:
+                parse_selector(selector)
+            except ValueError as e:
+                raise RegistryError(f"library {name!r}: {e}") from e
+        entries[name.lower()] = LibraryEntry(
+            name=name.lower(),
+            url=url,
+            aliases=_string_list(name, "aliases", definition.get("aliases", [])),
+            sitemap=sitemap,
+            ttl=_number(name, "ttl", definition.get("ttl")),
+            selectors=selectors,
+            rate_limit=_number(name, "rate_limit", definition.get("rate_limit")),
+            search_providers=_string_list(
+                name, "search_providers", definition.get("search_providers", [])
+            ),
+        )
+    return entries
+
+
+def load_registry_file(path: str) -> Dict[str, LibraryEntry]:
+    """Reads library entries from a TOML or JSON file.
+
+    Args:
+        path (str): Path to a .toml or .json registry file
+
+    Returns:
+        Dict[str, LibraryEntry]: The entries by library name
+
+    Raises:
+        RegistryError: If the file format is unknown or the content is invalid
+        OSError: If the file cannot be read
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as file:
+        raw = file.read()
+    if extension == ".json":
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            raise RegistryError(f"{path}: {e}") from e
+    elif extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        try:
+            data = tomllib.loads(raw.decode("utf-8"))
+        except ValueError as e:
+            raise RegistryError(f"{path}: {e}") from e
+    else:
+        raise RegistryError(f"{path}: registry files must be .toml or .json")
+    return parse_registry(data)
+
+
+def builtin_libraries() -> Dict[str, LibraryEntry]:
+    """Builds entries for the libraries configured in config.py."""
+    aliases: Dict[str, List[str]] = {}
+    for alias, name in LIBRARY_ALIASES.items():
+        aliases.setdefault(name, []).append(alias)
+    return {
+        name: LibraryEntry(
+            name=name,
+            url=url,
+            aliases=tuple(aliases.get(name, ())),
+            ttl=PAGE_CACHE_TTLS.get(name),
+        )
+        for name, url in DOCS_URLS.items()
+    }
+
+
+class LibraryRegistry:
+    """Lazily loaded, hot-reloaded set of library definitions.
+
+    The file is only parsed on first access. Afterwards its modification
+    time and size are checked at most every check_interval seconds and it
+    is parsed again when they change. If a changed file is invalid the
+    previous definitions stay in effect and a warning is logged.
+    """
+
+    def __init__(
+        self, path: Optional[str], check_interval: float = REGISTRY_CHECK_INTERVAL
+    ):
+        """Creates a registry; nothing is read until it is first used.
+
+        Args:
+            path (Optional[str]): The registry file, or None for the built-in libraries
+            check_interval (float): Minimum seconds between checks for changes
+        """
+        self.path = path
+        self.check_interval = check_interval
+        # Incremented on every (re)load so dependents can rebuild derived tables
+        self.version = 0
+        self._entries: Optional[Dict[str, LibraryEntry]] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def entries(self) -> Dict[str, LibraryEntry]:
+        """Returns all library entries by name, reloading the file if it changed."""
+        now = time.monotonic()
+        if self._entries is None or now - self._checked_at >= self.check_interval:
+            self._refresh(now)
+        return self._entries
+
+    def get(self, name: Optional[str]) -> Optional[LibraryEntry]:
+        """Returns the entry for a normalized library name, if it exists."""
+        return self.entries().get(name) if name else None
+
+    def names(self) -> List[str]:
+        """Returns the names of all supported libraries."""
+        return list(self.entries())
+
+    def _refresh(self, now: float) -> None:
+        """Loads the registry file if it is new or has changed."""
+        with self._lock:
+            if self._entries is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            if not self.path:
+                if self._entries is None:
+                    self._install(builtin_libraries(), None)
+                return
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+            if self._entries is not None and signature == self._signature:
+                return
+            if signature is None:
+                logger.warning(
+                    "registry file missing, using built-in libraries",
+                    extra={"fields": {"path": self.path}},
+                )
+                self._install(builtin_libraries(), None)
+                return
+            try:
+                entries = load_registry_file(self.path)
+            except (OSError, RegistryError) as e:
+                logger.warning(
+                    "registry file invalid, keeping previous libraries",
+                    extra={"fields": {"path": self.path, "error": str(e)}},
+                )
+                self._signature = signature
+                if self._entries is None:
+                    self._install(builtin_libraries(), signature)
+                return
+            self._install(entries, signature)
+            logger.info(
+                "registry loaded",
+                extra={"fields": {"path": self.path, "libraries": len(entries)}},
+            )
+
+    def _install(
+        self, entries: Dict[str, LibraryEntry], signature: Optional[Tuple[int, int]]
+    ) -> None:
+        """Replaces the current entries."""
+        self._entries = entries
+        self._signature = signature
+        self.version += 1
+
+
+_registry: Optional[LibraryRegistry] = None
+
+
+def get_registry() -> LibraryRegistry:
+    """Returns the shared library registry."""
+    global _registry
+    if _registry is None:
+        _registry = LibraryRegistry(LIBRARY_REGISTRY_PATH)
+    return _registry
+
+
+def get_library(name: Optional[str]) -> Optional[LibraryEntry]:
+    """Returns the registry entry for a normalized library name.
+
+    Args:
+        name (Optional[str]): The normalized library name
+
+    Returns:
+        Optional[LibraryEntry]: The entry, or None if the library is unknown
+    """
+    return get_registry().get(name)
@@ -0,0 +1,177 @@
+"""Rate limiting, retry backoff and circuit breaking for upstream calls.
+
+Searches and page fetches go through a token bucket per search provider and
+per documentation host, so bursts are smoothed into a steady request rate.
+Retries wait with jittered exponential backoff (or as long as the server's
+Retry-After asks), and a circuit breaker stops calling an upstream that keeps
+failing until a cooldown has passed, instead of feeding a retry storm.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from config import RETRY_AFTER_MAX
+
+
+class TokenBucket:
+    """Token bucket rate limiter.
+
+    Holds up to burst tokens, refilled at rate tokens per second. Each
+    acquire() takes one token, waiting until one is available. Waiters are
+    served in the order they arrive, since each reserves its token up front.
+    The bucket is not tied to an event loop and may be shared across threads.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """Creates a full bucket.
+
+        Args:
+            rate (float): Tokens added per second
+            burst (float): Maximum number of tokens
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token, possibly one not yet refilled.
+
+        Returns:
+            float: Seconds to wait before the reserved token may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        """Waits until a token is available and takes it.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        delay = self.reserve()
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Give the unused token back so cancelled callers do not slow others
+                with self._lock:
+                    self._tokens += 1
+                raise
+        return delay
+
+
+class CircuitBreaker:
+    """Stops calls to an upstream after repeated failures.
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() returns False for cooldown seconds. Then a single trial call is
+    let through (half-open): success closes the breaker again, failure
+    reopens it for another cooldown. A trial whose outcome is never recorded
+    (e.g. because it was cancelled) is replaced after another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        """Creates a closed breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker
+            cooldown (float): Seconds the breaker stays open
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Checks whether a call may be made now.
+
+        Returns:
+            bool: True if the call may proceed
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            waiting_since = self._trial_started or self._opened_at
+            if now - waiting_since < self.cooldown:
+                return False
+            self._trial_started = now
+            return True
+
+    def record_success(self) -> None:
+        """Records a successful call, closing the breaker."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        """Records a failed call, opening the breaker at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_started is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_started = None
+
+    def retry_in(self) -> float:
+        """Returns the seconds until calls are allowed again (0 if closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header.
+
+    Args:
+        value (Optional[str]): Seconds, or an HTTP date
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if absent or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(
+    attempt: int, base: float, cap: float, retry_after: Optional[float] = None
+) -> float:
+    """Computes how long to wait before retrying.
+
+    Uses exponential backoff with full jitter, so that callers failing
+    together do not retry together. A server-provided Retry-After is a lower
+    bound, capped at RETRY_AFTER_MAX.
+
+    Args:
+        attempt (int): Number of attempts made so far (1 after the first failure)
+        base (float): Delay scale in seconds
+        cap (float): Maximum backoff in seconds
+        retry_after (Optional[float]): Seconds the server asked to wait
+
+    Returns:
+        float: Seconds to wait
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_AFTER_MAX))
+    return delay
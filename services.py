@@ -1,108 +1,1282 @@
-"""Services for web search and content fetching."""
+"""Services for web search and content fetching.
 
-from typing import List
-import httpx
-from bs4 import BeautifulSoup
-from duckduckgo_search import DDGS
-from config import HTTP_TIMEOUT, MAX_SEARCH_RESULTS
+httpx and duckduckgo_search are imported on first use rather than with this
+module, since every stdio session starts a new process and should be ready to
+list its tools quickly. The server lifespan calls warm_up() to import them in
+the background right after startup.
+
+While the lifespan's background refresh is running, stale cached pages and
+search results are answered at once and refreshed by the RefreshScheduler
+(refresh.py), and the most requested pages are refreshed before they expire.
+"""
+
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    IO,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+from urllib.parse import urlsplit
+from config import (
+    HTTP_TIMEOUT,
+    MAX_SEARCH_RESULTS,
+    MAX_CONCURRENT_FETCHES,
+    FETCH_DEADLINE,
+    SEARCH_STRATEGY_MODE,
+    SEARCH_PROVIDERS,
+    PASSAGE_RANKING_ENABLED,
+    PASSAGE_READ_FACTOR,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP2_ENABLED,
+    SEARCH_EXECUTOR_WORKERS,
+    SEARCH_TIMEOUT,
+    WARM_UP_DELAY,
+    SEARCH_RATE_LIMIT,
+    SEARCH_RATE_BURST,
+    HOST_RATE_LIMIT,
+    HOST_RATE_BURST,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_COOLDOWN,
+    REFRESH_ENABLED,
+    REFRESH_SINGLE_WORKER,
+    REFRESH_LOCK_PATH,
+    PREWARM_PAGES_PER_LIBRARY,
+    PREWARM_INTERVAL,
+    MAX_RESPONSE_BYTES,
+    FETCH_CONTENT_TYPES,
+    DEDUP_ENABLED,
+)
+from extraction import PlainTextExtractor, StreamingExtractor
+from cache import (
+    PageFingerprints,
+    get_page_cache,
+    get_search_cache,
+    get_ttl,
+    normalize_search_key,
+)
+from dedup import (
+    dedupe_passages,
+    is_near_duplicate,
+    page_fingerprints,
+    passage_fingerprints,
+    unique_urls,
+)
+from singleflight import SingleFlight
+from resilience import CircuitBreaker, TokenBucket, backoff_delay, parse_retry_after
+from utils import get_library_for_url
+from registry import get_library, get_registry
+from refresh import RefreshJob, RefreshScheduler
+from indexing import format_hits
+from vectors import get_vector_store, index_page_vectors
+from providers import SearchUnavailableError, search_providers
+from ranking import split_passages, rank_passages
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from tracing import get_logger, metrics, record, span
 import asyncio
+import codecs
+import os
+import threading
+import time
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = get_logger("docs.services")
+
+# Receives the URL and content (or error message) of each fetched page
+PageCallback = Callable[[str, str], Awaitable[None]]
+
+# Shared HTTP client state, owned by the server lifespan in main.py
+_http_client: Optional["httpx.AsyncClient"] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+# The DuckDuckGo client class, imported by _search_client_class() on first search
+DDGS = None
+
+# Concurrent identical searches share one in-flight DuckDuckGo request
+_search_flight = SingleFlight()
+
+# Concurrent fetches of the same page share one in-flight download
+_fetch_flight = SingleFlight()
+
+# Dedicated executor for blocking DuckDuckGo calls, and how many are queued or running
+_search_executor: Optional[ThreadPoolExecutor] = None
+_search_queue_depth = 0
+_search_queue_lock = threading.Lock()
+
+# Name of the search strategy that last succeeded, keyed by documentation site URL
+_preferred_strategies: Dict[str, str] = {}
+
+# Rate limiters and circuit breakers for the search provider and each docs host
+_search_limiter = TokenBucket(SEARCH_RATE_LIMIT, SEARCH_RATE_BURST)
+_search_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+_host_limiters: Dict[str, TokenBucket] = {}
+_host_breakers: Dict[str, CircuitBreaker] = {}
+
+# Background refresh of stale and popular pages, owned by the server lifespan
+_refresher: Optional[RefreshScheduler] = None
+# Open lock file of the worker chosen to run the refresh, see _claim_refresh
+_refresh_lock: Optional[IO] = None
+# Searches and fetches made for tool calls now running; refresh jobs wait for 0
+_live_requests = 0
+# Newly cached pages being embedded for vector retrieval in the background
+_embedding_tasks: Set[asyncio.Task] = set()
+
+# Responses worth retrying after a delay
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Accepted content types whose text is kept as it is rather than parsed as HTML
+PLAIN_TEXT_TYPES = frozenset({"text/plain", "text/markdown"})
+
+
+def _http2_available() -> bool:
+    """Checks whether the optional HTTP/2 dependency is installed.
+
+    Returns:
+        bool: True if the "h2" package can be imported, False otherwise
+    """
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> "httpx.AsyncClient":
+    """Creates a pooled HTTP client configured from the settings in config.py.
+
+    Returns:
+        httpx.AsyncClient: A new client with keep-alive connection pooling
+    """
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=HTTP_TIMEOUT,
+        limits=limits,
+        http2=HTTP2_ENABLED and _http2_available(),
+    )
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Returns the shared HTTP client, creating it on first use.
+
+    A new client is created if the previous one was closed or belongs to a
+    different event loop, since pooled connections cannot be shared across loops.
+
+    Returns:
+        httpx.AsyncClient: The shared client for the running event loop
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = create_http_client()
+        _http_client_loop = loop
+        _host_semaphores.clear()
+    return _http_client
+
+
+def _import_deferred() -> None:
+    """Imports the libraries deferred to keep startup fast."""
+    import httpx  # noqa: F401
+
+    _search_client_class()
+    # Imported by whichever search runs first otherwise
+    import duckduckgo_search.exceptions  # noqa: F401
+
+
+async def warm_up(delay: float = WARM_UP_DELAY) -> None:
+    """Loads the deferred libraries off the event loop and opens the HTTP client.
+
+    Started in the background by the server lifespan. Waiting a moment first
+    lets the MCP handshake finish before the imports compete with it for the
+    interpreter, while the first tool call usually still finds everything
+    loaded.
+
+    Args:
+        delay (float): Seconds to wait before importing
+    """
+    await asyncio.sleep(delay)
+    with span("warm_up"):
+        await asyncio.to_thread(_import_deferred)
+    get_http_client()
+
+
+async def close_http_client() -> None:
+    """Closes the shared HTTP client and releases its pooled connections."""
+    global _http_client, _http_client_loop
+    client = _http_client
+    _http_client = None
+    _http_client_loop = None
+    _host_semaphores.clear()
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def _claim_refresh() -> bool:
+    """Decides whether this process runs the background refresh.
+
+    With several server workers sharing the caches, the refresh runs in the
+    one worker holding an exclusive lock on REFRESH_LOCK_PATH, so popular
+    pages are refreshed once rather than once per worker. The lock goes away
+    with its process, so a worker started in its place takes over. Where
+    file locks are not available the refresh stays off in that mode.
+
+    Returns:
+        bool: True if this process should run the refresh
+    """
+    global _refresh_lock
+    if not REFRESH_SINGLE_WORKER or _refresh_lock is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    os.makedirs(os.path.dirname(REFRESH_LOCK_PATH), exist_ok=True)
+    lock = open(REFRESH_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return False
+    _refresh_lock = lock
+    return True
+
+
+def start_background_refresh() -> Optional[RefreshScheduler]:
+    """Starts refreshing stale and popular pages in the background.
+
+    Called by the server lifespan. The popular pages are first checked once
+    the warm-up has had time to load httpx, then every PREWARM_INTERVAL.
+    Workers that do not run the refresh (see _claim_refresh) revalidate
+    stale pages inline instead.
+
+    Returns:
+        Optional[RefreshScheduler]: The running scheduler, or None if
+            REFRESH_ENABLED is off or another worker runs the refresh
+    """
+    global _refresher
+    if not REFRESH_ENABLED or not _claim_refresh():
+        return None
+    if _refresher is None:
+        _refresher = RefreshScheduler(is_busy=lambda: _live_requests > 0)
+        _refresher.start()
+        _refresher.every(PREWARM_INTERVAL, prewarm_popular_pages, delay=WARM_UP_DELAY)
+    return _refresher
+
+
+async def stop_background_refresh() -> None:
+    """Stops the background refresh, dropping jobs that have not run yet."""
+    global _refresher, _refresh_lock
+    refresher, _refresher = _refresher, None
+    if refresher is not None:
+        await refresher.stop()
+    lock, _refresh_lock = _refresh_lock, None
+    if lock is not None:
+        lock.close()
+
+
+def _schedule_refresh(key: Hashable, job: RefreshJob) -> bool:
+    """Queues a refresh job if the background refresh is running.
+
+    Args:
+        key (Hashable): Identifies what the job refreshes
+        job (RefreshJob): Performs the refresh
+
+    Returns:
+        bool: True if the job will run, False if the caller must refresh inline
+    """
+    return _refresher is not None and _refresher.schedule(key, job)
+
+
+def _embed_in_background(library: Optional[str], url: str, content: str) -> None:
+    """Embeds a newly cached page for vector retrieval without delaying the fetch.
+
+    Args:
+        library (Optional[str]): The library the page belongs to
+        url (str): The page URL
+        content (str): The extracted page text
+    """
+
+    def done(task: asyncio.Task) -> None:
+        _embedding_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(
+                "embedding_error",
+                extra={"fields": {"url": url, "error": repr(task.exception())}},
+            )
+
+    task = asyncio.create_task(asyncio.to_thread(index_page_vectors, library, url, content))
+    _embedding_tasks.add(task)
+    task.add_done_callback(done)
+
+
+async def wait_for_embeddings() -> None:
+    """Waits until the pages being embedded in the background are stored."""
+    if _embedding_tasks:
+        await asyncio.gather(*_embedding_tasks, return_exceptions=True)
+
+
+@contextmanager
+def _live_request() -> Iterator[None]:
+    """Counts a search or fetch made for a tool call while it runs."""
+    global _live_requests
+    _live_requests += 1
+    try:
+        yield
+    finally:
+        _live_requests -= 1
+
+
+def prewarm_popular_pages() -> int:
+    """Schedules refreshes of the most requested pages that are about to expire.
 
+    Looks at the PREWARM_PAGES_PER_LIBRARY most requested pages of every
+    library in the popularity log and refreshes those that are missing or
+    will expire before the next check, so that they are fresh when asked for.
 
-async def search_web(query: str) -> List[str]:
+    Returns:
+        int: The number of refresh jobs scheduled
+    """
+    page_cache = get_page_cache()
+    if page_cache is None or _refresher is None:
+        return 0
+    horizon = time.time() + PREWARM_INTERVAL
+    scheduled = 0
+    for library in get_registry().names():
+        ttl = get_ttl(library)
+        for url in page_cache.popular(library, PREWARM_PAGES_PER_LIBRARY):
+            fetched_at = page_cache.fetched_at(url)
+            if fetched_at is not None and fetched_at + ttl > horizon:
+                continue
+            if _schedule_refresh(("page", url), partial(refresh_page, url)):
+                scheduled += 1
+    if scheduled:
+        logger.info("prewarm", extra={"fields": {"scheduled": scheduled}})
+    return scheduled
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    """Returns the semaphore limiting concurrent connections to a URL's host.
+
+    Args:
+        url (str): The URL about to be requested
+
+    Returns:
+        asyncio.Semaphore: The semaphore shared by all requests to that host
+    """
+    host = urlsplit(url).netloc.lower()
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST)
+    return _host_semaphores[host]
+
+
+def _host_limiter(host: str, library: Optional[str]) -> TokenBucket:
+    """Returns the token bucket limiting the request rate to a host.
+
+    Args:
+        host (str): The lowercased host name
+        library (Optional[str]): The library served by the host, whose
+            registry entry may set its own rate_limit
+
+    Returns:
+        TokenBucket: The bucket shared by all requests to that host
+    """
+    entry = get_library(library)
+    rate = entry.rate_limit if entry and entry.rate_limit else HOST_RATE_LIMIT
+    limiter = _host_limiters.get(host)
+    if limiter is None:
+        limiter = _host_limiters[host] = TokenBucket(rate, min(HOST_RATE_BURST, max(1.0, rate)))
+    limiter.rate = rate
+    return limiter
+
+
+def _host_breaker(host: str) -> CircuitBreaker:
+    """Returns the circuit breaker of a documentation host."""
+    if host not in _host_breakers:
+        _host_breakers[host] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+    return _host_breakers[host]
+
+
+def reset_upstream_state() -> None:
+    """Forgets all rate limiter and circuit breaker state."""
+    global _search_limiter, _search_breaker
+    _search_limiter = TokenBucket(SEARCH_RATE_LIMIT, SEARCH_RATE_BURST)
+    _search_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN)
+    _host_limiters.clear()
+    _host_breakers.clear()
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """Returns the thread pool reserved for blocking search calls.
+
+    Searches get their own bounded pool so that a burst of slow searches
+    cannot starve the event loop's default executor.
+
+    Returns:
+        ThreadPoolExecutor: The shared search executor
+    """
+    global _search_executor
+    if _search_executor is None:
+        _search_executor = ThreadPoolExecutor(
+            max_workers=SEARCH_EXECUTOR_WORKERS, thread_name_prefix="search"
+        )
+    return _search_executor
+
+
+def shutdown_search_executor() -> None:
+    """Shuts down the search executor, dropping searches that have not started."""
+    global _search_executor
+    executor = _search_executor
+    _search_executor = None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def search_queue_depth() -> int:
+    """Returns the number of searches queued or running in the search executor."""
+    return _search_queue_depth
+
+
+def _search_client_class() -> type:
+    """Returns the DDGS class, importing duckduckgo_search on first use.
+
+    Returns:
+        type: The DuckDuckGo search client class
+    """
+    global DDGS
+    if DDGS is None:
+        from duckduckgo_search import DDGS as client_class
+
+        DDGS = client_class
+    return DDGS
+
+
+def _submit_search(query: str, max_results: int = MAX_SEARCH_RESULTS) -> Future:
+    """Submits a blocking DuckDuckGo search to the search executor.
+
+    Args:
+        query (str): The search query to execute
+        max_results (int): Maximum number of results to request
+
+    Returns:
+        Future: Resolves to the raw DuckDuckGo results
+    """
+    global _search_queue_depth
+
+    client_class = _search_client_class()
+
+    def run() -> list:
+        return list(
+            client_class(timeout=int(SEARCH_TIMEOUT)).text(query, max_results=max_results)
+        )
+
+    def finished(_: Future) -> None:
+        global _search_queue_depth
+        with _search_queue_lock:
+            _search_queue_depth -= 1
+
+    with _search_queue_lock:
+        _search_queue_depth += 1
+    future = get_search_executor().submit(run)
+    future.add_done_callback(finished)
+    return future
+
+
+async def search_web(query: str, max_results: int = MAX_SEARCH_RESULTS) -> List[str]:
     """Performs a web search using DuckDuckGo and returns result URLs.
 
+    Results are memoized in the search cache under a normalized key, and
+    concurrent identical searches share a single in-flight request.
+
     Args:
         query (str): The search query to execute
+        max_results (int): Maximum number of results to return
 
     Returns:
         List[str]: A list of URLs from the search results
+
+    Raises:
+        SearchUnavailableError: If the search failed or the provider is being skipped
     """
-    try:
-        # Run the synchronous DDGS in a thread pool
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(
-            None, 
-            lambda: list(DDGS().text(query, max_results=MAX_SEARCH_RESULTS))
+    search_cache = get_search_cache()
+    key = normalize_search_key(query, max_results)
+    if search_cache is not None:
+        cached = search_cache.get(key)
+        if cached is not None:
+            metrics.increment("search_cache", result="hit")
+            return cached
+        stale = search_cache.get_stale(key)
+        if stale is not None and _schedule_refresh(
+            ("search", key), partial(refresh_search, query, max_results)
+        ):
+            metrics.increment("search_cache", result="stale")
+            return stale
+        metrics.increment("search_cache", result="miss")
+    with _live_request():
+        urls = await _search_flight.do(
+            key, lambda: _search_web_uncached(query, key, max_results)
         )
-        
-        urls = []
-        for item in results:
-            if isinstance(item, dict) and "href" in item:
-                urls.append(item["href"])
-        
-        print(f"DEBUG: Search query: {query}")
-        print(f"DEBUG: Found {len(urls)} URLs: {urls}")
-        return urls
-    except Exception as e:
-        print(f"DEBUG: Search error: {e}")
-        return []
+    return list(urls)
+
+
+async def refresh_search(query: str, max_results: int = MAX_SEARCH_RESULTS) -> None:
+    """Repeats a search to replace its expired cache entry.
 
+    Args:
+        query (str): The search query
+        max_results (int): Maximum number of results
 
-async def fetch_url(url: str) -> str:
+    Raises:
+        SearchUnavailableError: If the search failed or the provider is being skipped
+    """
+    key = normalize_search_key(query, max_results)
+    await _search_flight.do(key, lambda: _search_web_uncached(query, key, max_results))
+
+
+async def _search_web_uncached(query: str, key: str, max_results: int) -> List[str]:
+    """Runs a DuckDuckGo search and caches the result if it succeeded.
+
+    Each attempt waits for the search rate limiter. Failed attempts are
+    retried with jittered exponential backoff, except timeouts, which would
+    most likely time out again. While the circuit breaker is open the
+    provider is not called at all.
+
+    Args:
+        query (str): The search query to execute
+        key (str): The normalized cache key for the query
+        max_results (int): Maximum number of results to return
+
+    Returns:
+        List[str]: A list of URLs from the search results
+
+    Raises:
+        SearchUnavailableError: If the search failed or the provider is being skipped
+    """
+    from duckduckgo_search.exceptions import TimeoutException as SearchTimeoutException
+
+    for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+        if not _search_breaker.allow():
+            metrics.increment("circuit_open", upstream="search")
+            raise SearchUnavailableError(
+                f"search provider is failing, retrying in {_search_breaker.retry_in():.0f}s"
+            )
+        await _search_limiter.acquire()
+        try:
+            # Run the synchronous DDGS in the dedicated search thread pool
+            future = _submit_search(query, max_results)
+            results = await asyncio.wait_for(asyncio.wrap_future(future), SEARCH_TIMEOUT)
+        except (asyncio.TimeoutError, SearchTimeoutException) as e:
+            _search_breaker.record_failure()
+            logger.warning("search_timeout", extra={"fields": {"query": query}})
+            raise SearchUnavailableError(f"search timed out after {SEARCH_TIMEOUT}s") from e
+        except Exception as e:
+            _search_breaker.record_failure()
+            logger.warning(
+                "search_error",
+                extra={"fields": {"query": query, "attempt": attempt, "error": repr(e)}},
+            )
+            if attempt == RETRY_MAX_ATTEMPTS:
+                raise SearchUnavailableError(f"search failed: {e}") from e
+            metrics.increment("retries", upstream="search")
+            await asyncio.sleep(backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY))
+            continue
+        _search_breaker.record_success()
+        break
+
+    urls = []
+    for item in results:
+        if isinstance(item, dict) and "href" in item:
+            urls.append(item["href"])
+    logger.debug("search", extra={"fields": {"query": query, "urls": urls}})
+
+    search_cache = get_search_cache()
+    if search_cache is not None:
+        search_cache.put(key, urls)
+    return urls
+
+
+async def fetch_url(url: str, max_chars: Optional[int] = None) -> str:
     """Asynchronously fetches and extracts text content from a URL.
 
+    Concurrent calls for the same URL and max_chars, e.g. from several
+    queries of one batch that found the same page, share a single download.
+    Each call is counted in the popularity log of the page cache.
+
     Args:
         url (str): The URL to fetch content from
+        max_chars (Optional[int]): Maximum number of characters to return
 
     Returns:
         str: The extracted text content or error message if fetch fails
     """
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        try:
-            response = await client.get(url, timeout=HTTP_TIMEOUT)
-            response.raise_for_status()
+    page_cache = get_page_cache()
+    library = get_library_for_url(url)
+    if page_cache is not None and library is not None:
+        page_cache.record_hit(url, library)
+    with _live_request():
+        return await _fetch_flight.do(
+            (url, max_chars), lambda: _fetch_url_uncached(url, max_chars)
+        )
+
+
+async def refresh_page(url: str) -> None:
+    """Revalidates a page with its origin and updates the page cache.
+
+    Args:
+        url (str): The page URL
+
+    Raises:
+        RuntimeError: If the page could not be fetched
+    """
+    content = await _fetch_url_uncached(url, revalidate=True)
+    if content.startswith("❌"):
+        raise RuntimeError(content)
+
+
+async def _fetch_url_uncached(
+    url: str, max_chars: Optional[int] = None, revalidate: bool = False
+) -> str:
+    """Fetches and extracts text content from a URL.
+
+    The response body is streamed through an incremental parser that keeps
+    headings and code blocks and drops scripts, styles, navigation and footers.
+    Pages are served from the persistent page cache while fresh. Stale pages
+    are revalidated with a conditional request, reusing the cached text when
+    the server answers 304 Not Modified. While the background refresh runs,
+    a stale page within PAGE_CACHE_MAX_STALE is returned right away and
+    revalidated by a refresh job instead.
+
+    When max_chars is given, reading stops as soon as that much main content
+    has been extracted; text outside it does not count, so pages without main
+    content are read in full. Such a page is cached as partial, and only
+    answers later requests with the same or a smaller budget; larger
+    requests fetch it again. Responses whose Content-Type is not in
+    FETCH_CONTENT_TYPES (PDFs, images, other binaries) are abandoned before
+    their body is read, and at most MAX_RESPONSE_BYTES of a body are read
+    after decompression. A page cut off at that limit ends with a note
+    saying so. Plain text and Markdown are kept as they are instead of being
+    parsed as HTML.
+
+    Args:
+        url (str): The URL to fetch content from
+        max_chars (Optional[int]): Maximum number of characters to return
+        revalidate (bool): Contact the origin even if the cached page is fresh
+
+    Returns:
+        str: The extracted text content or error message if fetch fails
+    """
+    import httpx
+
+    with span("fetch", url=url) as attributes:
+        page_cache = get_page_cache()
+        library = get_library_for_url(url)
+        cached = page_cache.get(url, library) if page_cache else None
+        # A page read only up to a smaller budget cannot answer this request
+        if cached and not cached.covers(max_chars):
+            cached = None
+        if cached and not revalidate:
+            if cached.is_fresh:
+                attributes["cache"] = "hit"
+                metrics.increment("page_cache", result="hit")
+                return cached.content[:max_chars]
+            if cached.is_servable and _schedule_refresh(
+                ("page", url), partial(refresh_page, url)
+            ):
+                attributes["cache"] = "stale"
+                metrics.increment("page_cache", result="stale")
+                return cached.content[:max_chars]
+
+        host = urlsplit(url).netloc.lower()
+        breaker = _host_breaker(host)
+        limiter = _host_limiter(host, library)
+        client = get_http_client()
+        headers = cached.conditional_headers() if cached else {}
+        for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+            if not breaker.allow():
+                attributes["error"] = "circuit_open"
+                metrics.increment("circuit_open", upstream="host")
+                return f"❌ Skipped: {host} is failing, retrying in {breaker.retry_in():.0f}s"
+            await limiter.acquire()
+            try:
+                async with _host_semaphore(url):
+                    async with client.stream(
+                        "GET", url, timeout=HTTP_TIMEOUT, headers=headers
+                    ) as response:
+                        if cached and response.status_code == 304:
+                            breaker.record_success()
+                            attributes["cache"] = "revalidated"
+                            metrics.increment("page_cache", result="revalidated")
+                            page_cache.touch(url)
+                            return cached.content[:max_chars]
+                        response.raise_for_status()
+                        content_type = _media_type(response.headers.get("Content-Type"))
+                        if content_type and content_type not in FETCH_CONTENT_TYPES:
+                            breaker.record_success()
+                            attributes["error"] = "content_type"
+                            metrics.increment("skipped_content_type")
+                            return f"❌ Unsupported content type: {content_type}"
+                        attributes["cache"] = "miss"
+                        metrics.increment("page_cache", result="miss")
+
+                        # Parse while the body streams in instead of buffering it
+                        entry = get_library(library)
+                        if content_type in PLAIN_TEXT_TYPES:
+                            extractor = PlainTextExtractor()
+                        else:
+                            extractor = StreamingExtractor(
+                                selectors=entry.selectors if entry else ()
+                            )
+                        decoder = _text_decoder(response.encoding)
+                        truncated = over_limit = False
+                        received = 0
+                        parse_seconds = 0.0
+                        async for data in response.aiter_bytes():
+                            if received + len(data) > MAX_RESPONSE_BYTES:
+                                data = data[: MAX_RESPONSE_BYTES - received]
+                                truncated = over_limit = True
+                            received += len(data)
+                            parse_start = time.perf_counter()
+                            extractor.feed(decoder.decode(data, final=over_limit))
+                            parse_seconds += time.perf_counter() - parse_start
+                            if over_limit:
+                                break
+                            if max_chars is not None and extractor.chars >= max_chars:
+                                truncated = True
+                                break
+                        else:
+                            extractor.feed(decoder.decode(b"", final=True))
+                        downloaded = int(response.num_bytes_downloaded)
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status == 429 or status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if status in RETRY_STATUSES and attempt < RETRY_MAX_ATTEMPTS:
+                    retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                    metrics.increment("retries", upstream="host")
+                    await asyncio.sleep(
+                        backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY, retry_after)
+                    )
+                    continue
+                attributes["error"] = "http_status"
+                return f"❌ HTTP error: {e}"
+            except httpx.TimeoutException as e:
+                breaker.record_failure()
+                attributes["error"] = "timeout"
+                return f"❌ Timeout error: {e}"
+            except httpx.RequestError as e:
+                breaker.record_failure()
+                if isinstance(e, httpx.ConnectError) and attempt < RETRY_MAX_ATTEMPTS:
+                    metrics.increment("retries", upstream="host")
+                    await asyncio.sleep(backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY))
+                    continue
+                attributes["error"] = "request"
+                return f"❌ Request error: {e}"
+            breaker.record_success()
+            break
+
+        parse_start = time.perf_counter()
+        content = extractor.close()
+        parse_seconds += time.perf_counter() - parse_start
+        record("parse", parse_seconds, url=url, chars=len(content))
+        metrics.increment("bytes_downloaded", downloaded)
+        attributes.update(
+            bytes=downloaded, received=received, truncated=truncated, attempts=attempt
+        )
+        if over_limit:
+            metrics.increment("truncated_responses")
+            content += (
+                f"\n\n[Truncated: only the first {MAX_RESPONSE_BYTES // 1024} KB "
+                "of this page were read]"
+            )
+
+        # A page cut off at the byte limit would be cut off again, so it is complete
+        if page_cache:
+            page_cache.put(
+                url,
+                content,
+                library=library,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                fingerprints=page_fingerprints(url, content) if DEDUP_ENABLED else None,
+                read_for_chars=max_chars if truncated and not over_limit else None,
+            )
+            if get_vector_store() is not None:
+                _embed_in_background(library, url, content)
+        return content[:max_chars]
+
+
+def _media_type(content_type: Optional[str]) -> str:
+    """Extracts the media type from a Content-Type header.
+
+    Args:
+        content_type (Optional[str]): The header value, e.g. "text/html; charset=utf-8"
+
+    Returns:
+        str: The lowercased media type, e.g. "text/html", or "" if absent
+    """
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def _text_decoder(encoding: Optional[str]) -> codecs.IncrementalDecoder:
+    """Creates an incremental decoder for a response body.
+
+    Args:
+        encoding (Optional[str]): The response's text encoding; UTF-8 if
+            missing or unknown
+
+    Returns:
+        codecs.IncrementalDecoder: A decoder replacing undecodable bytes
+    """
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+async def fetch_all(
+    urls: List[str],
+    max_chars: Optional[int] = None,
+    on_page: Optional[PageCallback] = None,
+) -> List[str]:
+    """Fetches several URLs concurrently, preserving the input order.
+
+    At most MAX_CONCURRENT_FETCHES requests run at once. Pages that have not
+    finished within FETCH_DEADLINE seconds are cancelled and reported as
+    timeouts, so one slow page cannot hold up the whole response. With a
+    max_chars budget, the remaining fetches are cancelled as soon as the
+    leading pages (in result order) already provide that much text.
+
+    Args:
+        urls (List[str]): The URLs to fetch
+        max_chars (Optional[int]): Total characters of content needed
+        on_page (Optional[PageCallback]): Called with the URL and content (or
+            error message) of each page as soon as it is known
+
+    Returns:
+        List[str]: The extracted content or error message for each URL, in order
+    """
+    if not urls:
+        return []
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    fetch_kwargs = {} if max_chars is None else {"max_chars": max_chars}
+
+    async def bounded_fetch(url: str) -> str:
+        async with semaphore:
+            return await fetch_url(url, **fetch_kwargs)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + FETCH_DEADLINE
+    tasks = [asyncio.create_task(bounded_fetch(url)) for url in urls]
+    pending = set(tasks)
+    budget_met = False
+    try:
+        while pending and not budget_met:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if on_page:
+                for url, task in zip(urls, tasks):
+                    if task in done and (task.cancelled() or not task.exception()):
+                        await on_page(url, _fetch_result(task))
+            budget_met = max_chars is not None and _leading_chars(tasks) >= max_chars
+    finally:
+        # Also when on_page raised or this call was cancelled
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if budget_met:
+        skipped = "❌ Skipped: output budget already reached"
+    else:
+        skipped = f"❌ Timeout error: no response within {FETCH_DEADLINE}s"
+    if on_page:
+        for url, task in zip(urls, tasks):
+            if task in pending:
+                await on_page(url, skipped)
+    return [skipped if task in pending else _fetch_result(task) for task in tasks]
+
+
+def _fetch_result(task: asyncio.Task) -> str:
+    """Returns the content or error message of a finished fetch task.
+
+    Args:
+        task (asyncio.Task): A done task of fetch_all
+
+    Returns:
+        str: The task's result, or an error message if it was cancelled
+    """
+    if task.cancelled():
+        return "❌ Cancelled: the fetch was cancelled before it finished"
+    return task.result()
+
+
+def _leading_chars(tasks: List[asyncio.Task]) -> int:
+    """Counts the content characters of the finished tasks at the front of a list.
+
+    Args:
+        tasks (List[asyncio.Task]): Fetch tasks in result order
+
+    Returns:
+        int: Characters of successful content before the first unfinished task
+    """
+    total = 0
+    for task in tasks:
+        if not task.done():
+            break
+        if not task.cancelled() and not task.exception():
+            content = task.result()
+            if not content.startswith("❌"):
+                total += len(content)
+    return total
+
+
+def build_search_strategies(query: str, site_url: str) -> List[Tuple[str, str]]:
+    """Builds the named search queries tried for a documentation site.
+
+    Args:
+        query (str): The search query
+        site_url (str): The documentation site URL
+
+    Returns:
+        List[Tuple[str, str]]: (strategy name, search query) pairs in default priority order
+    """
+    bare_url = site_url.replace("https://", "").replace("http://", "")
+    return [
+        ("site", f"site:{site_url} {query}"),  # Site-specific search
+        ("site_bare", f"{query} site:{bare_url}"),  # Without protocol
+        ("mention", f"{query} {site_url}"),  # Direct URL mention
+        ("general", f"{query} documentation"),  # General search, filtered by domain
+    ]
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            return soup.get_text()
-        except httpx.TimeoutException as e:
-            return f"❌ Timeout error: {e}"
-        except httpx.HTTPStatusError as e:
-            return f"❌ HTTP error: {e}"
-        except httpx.RequestError as e:
-            return f"❌ Request error: {e}"
 
+async def run_search_strategy(
+    name: str, search_query: str, site_url: str, max_results: int = MAX_SEARCH_RESULTS
+) -> List[str]:
+    """Runs a single search strategy and filters its results when needed.
 
-async def search_documentation(query: str, site_url: str) -> str:
+    Args:
+        name (str): The strategy name from build_search_strategies
+        search_query (str): The search query for that strategy
+        site_url (str): The documentation site URL
+        max_results (int): Maximum number of results to request
+
+    Returns:
+        List[str]: The result URLs for the strategy
+    """
+    with span("search_strategy", strategy=name, query=search_query) as attributes:
+        urls = await search_web(search_query, max_results)
+        if name == "general":
+            # Filter for URLs that might be from the target site
+            site_domain = site_url.replace("https://", "").replace("http://", "").split("/")[0]
+            urls = [url for url in urls if site_domain in url]
+        attributes["results"] = len(urls)
+    return urls
+
+
+def order_search_strategies(
+    strategies: List[Tuple[str, str]], site_url: str
+) -> List[Tuple[str, str]]:
+    """Moves the strategy that last succeeded for a site to the front.
+
+    Args:
+        strategies (List[Tuple[str, str]]): The strategies in default order
+        site_url (str): The documentation site URL
+
+    Returns:
+        List[Tuple[str, str]]: The strategies with the preferred one first
+    """
+    preferred = _preferred_strategies.get(site_url)
+    return sorted(strategies, key=lambda strategy: strategy[0] != preferred)
+
+
+async def _search_sequential(
+    strategies: List[Tuple[str, str]], site_url: str, max_results: int
+) -> Tuple[Optional[str], List[str]]:
+    """Tries each strategy in turn and stops at the first one with results.
+
+    A search error ends the search instead of moving on to the next
+    strategy, since the remaining strategies use the same provider.
+    """
+    for name, search_query in strategies:
+        urls = await run_search_strategy(name, search_query, site_url, max_results)
+        if urls:
+            return name, urls
+    return None, []
+
+
+async def _search_race(
+    strategies: List[Tuple[str, str]], site_url: str, max_results: int
+) -> Tuple[Optional[str], List[str]]:
+    """Runs all strategies concurrently and returns the first non-empty answer.
+
+    Raises the first search error if every strategy failed.
+    """
+    tasks = {
+        asyncio.create_task(
+            run_search_strategy(name, search_query, site_url, max_results)
+        ): name
+        for name, search_query in strategies
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the highest-priority strategy among those finishing together
+            for task in sorted(done, key=lambda t: list(tasks).index(t)):
+                if not task.exception() and task.result():
+                    return tasks[task], task.result()
+        errors = [task.exception() for task in tasks if task.exception()]
+        if len(errors) == len(tasks):
+            raise errors[0]
+        return None, []
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _search_merge(
+    strategies: List[Tuple[str, str]], site_url: str, max_results: int
+) -> Tuple[Optional[str], List[str]]:
+    """Runs all strategies concurrently and merges their deduplicated URLs.
+
+    Raises the first search error if every strategy failed.
+    """
+    results = await asyncio.gather(
+        *(
+            run_search_strategy(name, search_query, site_url, max_results)
+            for name, search_query in strategies
+        ),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors and len(errors) == len(results):
+        raise errors[0]
+    winner = None
+    merged: List[str] = []
+    for (name, _), urls in zip(strategies, results):
+        if isinstance(urls, BaseException) or not urls:
+            continue
+        winner = winner or name
+        merged.extend(url for url in urls if url not in merged)
+    return winner, merged[:max_results]
+
+
+_SEARCH_MODES = {
+    "sequential": _search_sequential,
+    "race": _search_race,
+    "merge": _search_merge,
+}
+
+
+async def find_result_urls(
+    query: str, site_url: str, max_results: int = MAX_SEARCH_RESULTS
+) -> List[str]:
+    """Finds documentation result URLs using the configured strategy mode.
+
+    In "sequential" mode strategies are tried one at a time. In "race" mode they
+    run concurrently and the first non-empty answer wins, cancelling the rest.
+    In "merge" mode all strategies run concurrently and their URLs are merged
+    and deduplicated. The winning strategy is remembered per site and tried
+    first next time.
+
+    Args:
+        query (str): The search query
+        site_url (str): The documentation site URL
+        max_results (int): Maximum number of result URLs
+
+    Returns:
+        List[str]: The result URLs, or an empty list if nothing was found
+
+    Raises:
+        SearchUnavailableError: If the search provider failed
+    """
+    strategies = order_search_strategies(build_search_strategies(query, site_url), site_url)
+    search = _SEARCH_MODES.get(SEARCH_STRATEGY_MODE, _search_sequential)
+    with span("search", mode=SEARCH_STRATEGY_MODE) as attributes:
+        winner, urls = await search(strategies, site_url, max_results)
+        attributes.update(winner=winner, results=len(urls))
+    if winner:
+        _preferred_strategies[site_url] = winner
+    return urls
+
+
+def _stored_fingerprints(url: str) -> Optional[PageFingerprints]:
+    """Returns the fingerprints the page cache holds for a page, if any."""
+    page_cache = get_page_cache()
+    return page_cache.get_fingerprints(url) if page_cache else None
+
+
+def drop_duplicate_urls(urls: List[str]) -> List[str]:
+    """Cleans result URLs and drops those that would fetch a duplicate page.
+
+    Spellings of the same URL are merged, and a page the page cache knows to
+    be a near-duplicate of a better ranked result is not fetched at all.
+
+    Args:
+        urls (List[str]): Result URLs, best first
+
+    Returns:
+        List[str]: The URLs worth fetching, in the same order
+    """
+    kept: List[str] = []
+    seen: List[int] = []
+    for url in unique_urls(urls):
+        stored = _stored_fingerprints(url)
+        if stored and stored[0] and is_near_duplicate(stored[0], seen):
+            continue
+        kept.append(url)
+        if stored:
+            seen.append(stored[0])
+    metrics.increment("duplicates", len(urls) - len(kept), stage="url")
+    return kept
+
+
+def drop_duplicate_pages(pages: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Drops fetched pages whose text nearly repeats an earlier page.
+
+    Args:
+        pages (List[Tuple[str, str]]): (url, content) of each fetched page, best first
+
+    Returns:
+        List[Tuple[str, str]]: The distinct pages, in the same order
+    """
+    kept: List[Tuple[str, str]] = []
+    seen: List[int] = []
+    for url, content in pages:
+        stored = _stored_fingerprints(url)
+        fingerprint = stored[0] if stored else page_fingerprints(url, content)[0]
+        if fingerprint and is_near_duplicate(fingerprint, seen):
+            metrics.increment("duplicates", stage="page")
+            continue
+        kept.append((url, content))
+        seen.append(fingerprint)
+    return kept
+
+
+def assemble_results(
+    query: str, pages: List[Tuple[str, str]], max_chars: Optional[int] = None
+) -> str:
+    """Combines fetched pages into the text returned to the caller.
+
+    With passage ranking enabled only the passages relevant to the query are
+    kept, each with its source URL; otherwise the pages are concatenated.
+    Passages repeating an earlier one nearly word for word are left out.
+
+    Args:
+        query (str): The search query
+        pages (List[Tuple[str, str]]): (url, content) of each fetched page
+        max_chars (Optional[int]): Maximum length of the combined text
+
+    Returns:
+        str: The combined text, empty if there was no content
+    """
+    if PASSAGE_RANKING_ENABLED and pages:
+        # Return only the passages relevant to the query, with their sources
+        passages = []
+        fingerprints: List[int] = []
+        for url, content in pages:
+            page_passages = split_passages(url, content)
+            passages.extend(page_passages)
+            if DEDUP_ENABLED:
+                stored = _stored_fingerprints(url)
+                if stored and len(stored[1]) == len(page_passages):
+                    fingerprints.extend(stored[1])
+                else:
+                    fingerprints.extend(passage_fingerprints(page_passages))
+        if DEDUP_ENABLED:
+            unique = dedupe_passages(passages, fingerprints)
+            metrics.increment("duplicates", len(passages) - len(unique), stage="passage")
+            passages = unique
+        return format_hits(rank_passages(query, passages))[:max_chars]
+    return "".join(content + "\n\n" for _, content in pages)[:max_chars]
+
+
+async def search_documentation(
+    query: str,
+    site_url: str,
+    max_chars: Optional[int] = None,
+    on_page: Optional[PageCallback] = None,
+    max_results: Optional[int] = None,
+) -> str:
     """Searches documentation on a specific site and returns combined results.
 
+    Result pages are found with the library's search providers from the
+    registry, or the SEARCH_PROVIDERS chain when it does not name any.
+
     Args:
         query (str): The search query
         site_url (str): The documentation site URL
+        max_chars (Optional[int]): Maximum length of the combined text
+        on_page (Optional[PageCallback]): Called with the URL and content (or
+            error message) of each result page as soon as it is fetched
+        max_results (Optional[int]): Number of result pages to fetch,
+            defaults to MAX_SEARCH_RESULTS
 
     Returns:
         str: Combined text content from search results
     """
-    # Try multiple search strategies
-    strategies = [
-        f"site:{site_url} {query}",  # Site-specific search
-        f"{query} site:{site_url.replace('https://', '').replace('http://', '')}",  # Without protocol
-        f"{query} {site_url}",  # Direct URL mention
-    ]
-    
-    results = []
-    for strategy in strategies:
-        print(f"DEBUG: Trying search strategy: {strategy}")
-        search_results = await search_web(strategy)
-        if search_results:
-            results = search_results
-            break
-    
-    # If no results with site-specific search, try a general search and filter
-    if not results:
-        print(f"DEBUG: Site-specific search failed, trying general search")
-        general_results = await search_web(f"{query} documentation")
-        # Filter for URLs that might be from the target site
-        site_domain = site_url.replace('https://', '').replace('http://', '').split('/')[0]
-        results = [url for url in general_results if site_domain in url]
-    
+    library = get_library_for_url(site_url)
+    entry = get_library(library)
+    chain = entry.search_providers if entry and entry.search_providers else SEARCH_PROVIDERS
+    try:
+        results = await search_providers(
+            chain, query, library, site_url, max_results or MAX_SEARCH_RESULTS
+        )
+    except SearchUnavailableError as e:
+        return f"❌ Search unavailable: {e}"
+
     if not results:
         return f"❌ No results found for {query}"
 
-    combined_text = ""
-    for result in results:
-        content = await fetch_url(result)
-        if not content.startswith("❌"):
-            combined_text += content + "\n\n"
+    if DEDUP_ENABLED:
+        results = drop_duplicate_urls(results)
+    # Ranking may pick passages from anywhere in a page, so it gets more text
+    # than the output holds; the output is cut to max_chars after ranking
+    read_chars = max_chars
+    if max_chars is not None and PASSAGE_RANKING_ENABLED:
+        read_chars = max_chars * PASSAGE_READ_FACTOR
+    pages = [
+        (url, content)
+        for url, content in zip(
+            results, await fetch_all(results, max_chars=read_chars, on_page=on_page)
+        )
+        if not content.startswith("❌")
+    ]
+    if DEDUP_ENABLED:
+        pages = drop_duplicate_pages(pages)
+    with span("assemble", pages=len(pages), ranked=PASSAGE_RANKING_ENABLED) as attributes:
+        combined_text = assemble_results(query, pages, max_chars)
+        attributes["chars"] = len(combined_text)
 
     if not combined_text:
         return f"❌ Could not fetch content from search results"
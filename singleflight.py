@@ -0,0 +1,70 @@
+"""Collapsing of concurrent identical async operations into one in-flight call."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """An in-flight call and the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one in-flight call per key.
+
+    Callers that ask for a key while a call for it is already running await
+    the same task instead of starting their own. The result (or exception) is
+    shared by every waiter, and the key is forgotten once the call completes.
+    A cancelled waiter does not affect the others, but when the last waiter
+    is cancelled the call itself is cancelled.
+    """
+
+    def __init__(self):
+        """Creates an empty group of in-flight calls."""
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs fn for key, or joins the call already in flight for key.
+
+        Args:
+            key (Hashable): Identifies calls that are interchangeable
+            fn (Callable[[], Awaitable[Any]]): Starts the call when none is in flight
+
+        Returns:
+            Any: The result of the shared call
+        """
+        loop = asyncio.get_running_loop()
+        call = self._calls.get(key)
+        if call is None or call.task.get_loop() is not loop:
+            call = _Call(loop.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda done: self._forget(key, done))
+        call.waiters += 1
+        try:
+            # Shield so one cancelled waiter does not cancel the call for the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget the call first: a caller arriving before it has finished
+                # cancelling must start a new call rather than join this one
+                self._forget(key, call.task)
+                call.task.cancel()
+
+    def running(self, key: Hashable) -> bool:
+        """Returns whether a call for key is in flight, so a new caller would join it."""
+        call = self._calls.get(key)
+        return call is not None and not call.task.done()
+
+    def in_flight(self) -> int:
+        """Returns the number of calls currently running."""
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """Removes a completed or abandoned call unless a newer call has replaced it."""
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
@@ -20,3 +20,56 @@ def mock_library_aliases() -> Dict[str, str]:
         "test": "test-lib",
         "another": "another-lib",
     }
+
+
+@pytest.fixture(autouse=True)
+def isolated_page_cache(tmp_path, monkeypatch):
+    """Fixture pointing the persistent page cache at a per-test database."""
+    import cache
+
+    cache.close_page_cache()
+    monkeypatch.setattr(cache, "PAGE_CACHE_PATH", str(tmp_path / "pages.sqlite3"))
+    yield
+    cache.close_page_cache()
+
+
+@pytest.fixture(autouse=True)
+def empty_search_cache():
+    """Fixture clearing the in-memory search result cache around each test."""
+    from cache import get_search_cache
+
+    get_search_cache().clear()
+    yield
+    get_search_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def isolated_docs_index(tmp_path, monkeypatch):
+    """Fixture pointing the local documentation index at a per-test database."""
+    import indexing
+
+    indexing.close_docs_index()
+    monkeypatch.setattr(indexing, "LOCAL_INDEX_PATH", str(tmp_path / "index.sqlite3"))
+    yield
+    indexing.close_docs_index()
+
+
+@pytest.fixture(autouse=True)
+def isolated_vector_store(tmp_path, monkeypatch):
+    """Fixture pointing the passage vector store at a per-test directory."""
+    import vectors
+
+    vectors.close_vector_store()
+    monkeypatch.setattr(vectors, "VECTOR_INDEX_PATH", str(tmp_path / "vectors"))
+    yield
+    vectors.close_vector_store()
+
+
+@pytest.fixture(autouse=True)
+def reset_upstream_state():
+    """Fixture giving each test fresh rate limiters and circuit breakers."""
+    import services
+
+    services.reset_upstream_state()
+    yield
+    services.reset_upstream_state()
@@ -0,0 +1,342 @@
+"""Unit tests for the caches in the MCP Documentation Search Server.
+
+This module contains tests for the SQLite-backed page cache that stores
+extracted documentation text between requests and server restarts, and for
+the in-memory search result cache. These tests verify freshness, conditional
+request headers, persistence, key normalization and LRU eviction.
+"""
+
+import pytest
+from unittest.mock import patch
+from registry import LibraryEntry
+from cache import PageCache, SearchCache, SharedSearchCache, get_ttl, normalize_search_key
+
+
+def test_put_and_get(tmp_path):
+    """Test storing and retrieving a page.
+
+    This test verifies that a stored page is returned with its content
+    and validators, and is considered fresh right after being stored.
+    """
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    cache.put("http://test.com", "Test content", etag='"abc"', last_modified="Mon")
+
+    page = cache.get("http://test.com")
+
+    assert page.content == "Test content"
+    assert page.is_fresh
+    assert page.conditional_headers() == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon",
+    }
+    assert cache.get("http://missing.com") is None
+
+
+def test_survives_reopen(tmp_path):
+    """Test that cached pages persist across cache instances.
+
+    This simulates a server restart by closing the cache and opening a
+    new instance on the same database file.
+    """
+    path = str(tmp_path / "pages.sqlite3")
+    cache = PageCache(path)
+    cache.put("http://test.com", "Persistent content")
+    cache.close()
+
+    reopened = PageCache(path)
+    assert reopened.get("http://test.com").content == "Persistent content"
+
+
+def test_lru_eviction(tmp_path):
+    """Test that the least recently used pages are evicted first.
+
+    When the stored size exceeds the byte budget, pages that were not
+    accessed recently must be removed while recently used ones remain.
+    """
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    cache.put("http://a.com", "a" * 1000)
+    cache.put("http://b.com", "b" * 1000)
+    cache.max_bytes = cache.total_bytes()
+    cache.get("http://a.com")
+
+    cache.put("http://c.com", "c" * 1000)
+
+    assert cache.get("http://a.com") is not None
+    assert cache.get("http://b.com") is None
+    assert cache.get("http://c.com") is not None
+    assert cache.total_bytes() <= cache.max_bytes
+
+
+def test_cache_hits_write_access_times_in_batches(tmp_path):
+    """Test that reading a page is not a write until a batch is complete."""
+    import sqlite3
+
+    path = str(tmp_path / "pages.sqlite3")
+    cache = PageCache(path)
+    cache.put("http://a.com", "a")
+    changes = cache._conn.total_changes
+
+    with patch("cache.PAGE_CACHE_ACCESS_FLUSH_EVERY", 3):
+        cache.get("http://a.com")
+        cache.get("http://a.com")
+        assert cache._conn.total_changes == changes
+        cache.get("http://a.com")
+        assert cache._conn.total_changes > changes
+
+    cache.get("http://a.com")
+    cache.close()
+
+    conn = sqlite3.connect(path)
+    (accessed_at,) = conn.execute("SELECT accessed_at FROM pages").fetchone()
+    conn.close()
+    assert accessed_at > 0
+
+
+def test_total_bytes_is_kept_across_replacements_and_instances(tmp_path):
+    """Test that the running size total matches the stored pages.
+
+    Two instances on one file stand in for two server workers.
+    """
+    path = str(tmp_path / "pages.sqlite3")
+    first, second = PageCache(path), PageCache(path)
+    try:
+        first.put("http://a.com", "a" * 1000)
+        second.put("http://b.com", "b" * 1000)
+        first.put("http://a.com", "x y z " * 1000)
+        second.put("http://a.com", "short")
+
+        (expected,) = first._conn.execute("SELECT SUM(size) FROM pages").fetchone()
+        assert first.total_bytes() == second.total_bytes() == expected
+    finally:
+        first.close()
+        second.close()
+
+
+def test_per_library_ttl():
+    """Test that TTLs come from the library registry with a default fallback."""
+    entries = {"nextjs": LibraryEntry(name="nextjs", url="https://nextjs.org/docs", ttl=10)}
+    with (
+        patch("cache.get_library", entries.get),
+        patch("cache.PAGE_CACHE_DEFAULT_TTL", 99),
+    ):
+        assert get_ttl("nextjs") == 10
+        assert get_ttl("unknown") == 99
+        assert get_ttl(None) == 99
+
+
+@pytest.mark.parametrize(
+    "first,second",
+    [
+        ("Flexbox  Grid", "flexbox grid"),  # Case and whitespace
+        ("site:https://x.com flexbox", "flexbox site:https://x.com"),  # Operator position
+        ("  Routing\tsite:x.com ", "routing site:x.com"),  # Tabs and padding
+    ],
+)
+def test_normalize_search_key(first: str, second: str):
+    """Test that equivalent queries normalize to the same key.
+
+    Args:
+        first: A query as an agent might send it
+        second: An equivalent spelling of the same query
+    """
+    assert normalize_search_key(first) == normalize_search_key(second)
+
+
+def test_search_cache_expiry():
+    """Test that positive and negative entries expire after their TTLs.
+
+    Empty results are cached with the shorter negative TTL, so they stop
+    being served before non-empty results do.
+    """
+    cache = SearchCache(ttl=100, negative_ttl=10)
+    with patch("cache.time.monotonic", return_value=0):
+        cache.put("hit", ["http://a.com"])
+        cache.put("miss", [])
+
+    with patch("cache.time.monotonic", return_value=50):
+        assert cache.get("hit") == ["http://a.com"]
+        assert cache.get("miss") is None
+
+    with patch("cache.time.monotonic", return_value=150):
+        assert cache.get("hit") is None
+
+
+def test_search_cache_negative_entry():
+    """Test that an empty result is a cache hit rather than a miss."""
+    cache = SearchCache()
+    cache.put("nothing", [])
+
+    assert cache.get("nothing") == []
+
+
+def test_search_cache_lru_eviction():
+    """Test that the least recently used query is evicted when full."""
+    cache = SearchCache(max_entries=2)
+    cache.put("a", ["http://a.com"])
+    cache.put("b", ["http://b.com"])
+    cache.get("a")
+    cache.put("c", ["http://c.com"])
+
+    assert cache.get("a") == ["http://a.com"]
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_shared_search_cache_is_shared_between_instances(tmp_path):
+    """Test that results stored by one worker are seen by another.
+
+    Two caches opened on the same database stand in for two server
+    processes; negative entries and expiry must behave as in memory.
+    """
+    path = str(tmp_path / "searches.sqlite3")
+    first = SharedSearchCache(path, ttl=100, negative_ttl=10)
+    second = SharedSearchCache(path, ttl=100, negative_ttl=10)
+    try:
+        with patch("cache.time.time", return_value=0):
+            first.put("hit", ["http://a.com"])
+            first.put("miss", [])
+            assert second.get("miss") == []
+
+        with patch("cache.time.time", return_value=50):
+            assert second.get("hit") == ["http://a.com"]
+            assert second.get("miss") is None
+
+        with patch("cache.time.time", return_value=150):
+            assert second.get("hit") is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_shared_search_cache_lru_eviction(tmp_path):
+    """Test that the least recently used query is evicted when full."""
+    cache = SharedSearchCache(str(tmp_path / "searches.sqlite3"), max_entries=2)
+    try:
+        for now, (key, urls) in enumerate(
+            [("a", ["http://a.com"]), ("b", ["http://b.com"]), ("a", None), ("c", [])]
+        ):
+            with patch("cache.time.time", return_value=float(now)):
+                cache.get(key) if urls is None else cache.put(key, urls)
+
+        with patch("cache.time.time", return_value=4.0):
+            assert cache.get("a") == ["http://a.com"]
+            assert cache.get("b") is None
+            assert len(cache) == 2
+    finally:
+        cache.close()
+
+
+def test_popularity_log_survives_reopen(tmp_path):
+    """Test that the most requested pages are ranked and kept across restarts.
+
+    Requests are counted in memory; closing the cache must write them so
+    that the next server process can pre-warm the same pages.
+    """
+    path = str(tmp_path / "pages.sqlite3")
+    cache = PageCache(path)
+    for url, hits in [("http://a.com/1", 3), ("http://a.com/2", 5), ("http://a.com/3", 1)]:
+        for _ in range(hits):
+            cache.record_hit(url, "lib")
+    cache.record_hit("http://b.com/1", "other")
+    cache.close()
+
+    reopened = PageCache(path)
+    try:
+        assert reopened.popular("lib", 2) == ["http://a.com/2", "http://a.com/1"]
+        assert reopened.popular("other", 10) == ["http://b.com/1"]
+    finally:
+        reopened.close()
+
+
+def test_popularity_log_forgets_old_requests(tmp_path):
+    """Test that pages not requested within the window are not popular."""
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    try:
+        with patch("cache.time.time", return_value=0.0):
+            cache.record_hit("http://a.com/old", "lib")
+            cache.popular("lib", 1)
+        with patch("cache.time.time", return_value=10 ** 9):
+            cache.record_hit("http://a.com/new", "lib")
+            assert cache.popular("lib", 10) == ["http://a.com/new"]
+    finally:
+        cache.close()
+
+
+def test_search_cache_serves_stale_results():
+    """Test that expired results stay available to get_stale() for a while.
+
+    Only non-empty results are served stale, and only until max_stale
+    seconds past their expiry.
+    """
+    cache = SearchCache(ttl=100, negative_ttl=10, max_stale=50)
+    with patch("cache.time.monotonic", return_value=0):
+        cache.put("hit", ["http://a.com"])
+        cache.put("miss", [])
+        assert cache.get_stale("hit") is None
+
+    with patch("cache.time.monotonic", return_value=120):
+        assert cache.get("hit") is None
+        assert cache.get_stale("hit") == ["http://a.com"]
+        assert cache.get_stale("miss") is None
+
+    with patch("cache.time.monotonic", return_value=200):
+        assert cache.get_stale("hit") is None
+
+
+def test_shared_search_cache_serves_stale_results(tmp_path):
+    """Test that the shared cache keeps expired results like the in-memory one."""
+    cache = SharedSearchCache(
+        str(tmp_path / "searches.sqlite3"), ttl=100, negative_ttl=10, max_stale=50
+    )
+    try:
+        with patch("cache.time.time", return_value=0):
+            cache.put("hit", ["http://a.com"])
+            cache.put("miss", [])
+        with patch("cache.time.time", return_value=120):
+            assert cache.get("hit") is None
+            assert cache.get_stale("hit") == ["http://a.com"]
+            assert cache.get_stale("miss") is None
+        with patch("cache.time.time", return_value=200):
+            assert cache.get_stale("hit") is None
+    finally:
+        cache.close()
+
+
+def test_fingerprints_stored_with_page(tmp_path):
+    """Test that page fingerprints round-trip, 64-bit values included."""
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    try:
+        cache.put("http://a.com", "Text", fingerprints=(2 ** 64 - 1, [1, 2 ** 63]))
+        cache.put("http://b.com", "Text")
+
+        assert cache.get_fingerprints("http://a.com") == (2 ** 64 - 1, [1, 2 ** 63])
+        assert cache.get_fingerprints("http://b.com") is None
+        assert cache.get_fingerprints("http://missing.com") is None
+    finally:
+        cache.close()
+
+
+def test_opens_database_without_fingerprints_column(tmp_path):
+    """Test that a page cache created before fingerprints existed is upgraded."""
+    import sqlite3
+
+    path = str(tmp_path / "pages.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE pages (
+            url TEXT PRIMARY KEY, library TEXT, content BLOB NOT NULL,
+            size INTEGER NOT NULL, etag TEXT, last_modified TEXT,
+            fetched_at REAL NOT NULL, accessed_at REAL NOT NULL
+        )
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    cache = PageCache(path)
+    try:
+        cache.put("http://a.com", "Text", fingerprints=(7, [7]))
+        assert cache.get_fingerprints("http://a.com") == (7, [7])
+    finally:
+        cache.close()
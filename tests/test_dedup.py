@@ -0,0 +1,136 @@
+"""Unit tests for duplicate elimination in the MCP Documentation Search Server.
+
+This module contains tests for URL canonicalization and the SimHash
+fingerprints used to fetch and return duplicated documentation only once.
+These tests verify which URL spellings are merged, that near-duplicate
+texts get close fingerprints while unrelated texts do not, and that only
+the first copy of a repeated passage is kept.
+"""
+
+import pytest
+from config import SIMHASH_MAX_DISTANCE
+from indexing import Section
+from ranking import split_passages
+from dedup import (
+    canonical_url,
+    clean_url,
+    dedupe_passages,
+    hamming_distance,
+    is_near_duplicate,
+    page_fingerprints,
+    passage_fingerprints,
+    simhash,
+    unique_urls,
+)
+
+TEXT = (
+    "Middleware allows you to run code before a request is completed. Then, based "
+    "on the incoming request, you can modify the response by rewriting, redirecting, "
+    "modifying the request or response headers, or responding directly. Middleware "
+    "runs before cached content and routes are matched. Use the file middleware.ts "
+    "in the root of your project to define middleware, and the matcher config to "
+    "filter it to run on specific paths."
+)
+
+
+@pytest.mark.parametrize(
+    "first,second",
+    [
+        ("https://nextjs.org/docs/app/", "https://nextjs.org/docs/app"),
+        ("https://NextJS.org/docs/app", "https://nextjs.org/docs/app"),
+        ("https://nextjs.org:443/docs/app", "https://nextjs.org/docs/app"),
+        ("https://nextjs.org/docs/app?ref=nav", "https://nextjs.org/docs/app"),
+        ("https://nextjs.org/docs/app?utm_source=x&utm_medium=y", "https://nextjs.org/docs/app"),
+        ("https://nextjs.org/docs/app#routing", "https://nextjs.org/docs/app"),
+        ("https://nextjs.org/docs/index.html", "https://nextjs.org/docs/"),
+        ("https://nextjs.org/api?b=2&a=1", "https://nextjs.org/api?a=1&b=2"),
+    ],
+)
+def test_canonical_url_merges_spellings(first: str, second: str):
+    """Test that spellings of the same page share a canonical URL.
+
+    Args:
+        first: A URL as found in search results
+        second: Another spelling of the same page
+    """
+    assert canonical_url(first) == canonical_url(second)
+
+
+def test_canonical_url_keeps_distinct_pages_apart():
+    """Test that different paths and meaningful parameters stay different."""
+    assert canonical_url("https://nextjs.org/docs/app") != canonical_url(
+        "https://nextjs.org/docs/pages"
+    )
+    assert canonical_url("https://x.com/search?q=a") != canonical_url(
+        "https://x.com/search?q=b"
+    )
+
+
+def test_unique_urls_keeps_first_spelling_cleaned():
+    """Test that the first spelling is fetched, without tracking parameters."""
+    urls = unique_urls(
+        [
+            "https://nextjs.org/docs/app/?ref=nav#top",
+            "https://nextjs.org/docs/app",
+            "https://nextjs.org/docs/pages?page=2&utm_source=ddg",
+        ]
+    )
+
+    assert urls == ["https://nextjs.org/docs/app/", "https://nextjs.org/docs/pages?page=2"]
+    assert clean_url("https://x.com/a?ref=1&v=2") == "https://x.com/a?v=2"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://x.com/search?flag",
+        "https://x.com/search?q=hello%20world&empty=",
+        "https://x.com/search?q=a+b&q=c",
+    ],
+)
+def test_clean_url_keeps_other_parameters_as_written(url: str):
+    """Test that a URL without tracking parameters is fetched unchanged.
+
+    Args:
+        url: A URL whose query must survive byte for byte
+    """
+    assert clean_url(url) == url
+    assert clean_url(url + "&utm_source=ddg#top") == url
+
+
+def test_simhash_near_duplicates_are_close():
+    """Test that a small edit changes few bits and unrelated text many."""
+    edited = TEXT.replace("specific paths", "particular paths")
+    unrelated = (
+        "Tailwind scans your templates for class names and generates the "
+        "corresponding styles into a static CSS file, which is fast and flexible."
+    )
+
+    assert simhash(TEXT) == simhash(TEXT.upper())
+    assert hamming_distance(simhash(TEXT), simhash(edited)) <= SIMHASH_MAX_DISTANCE
+    assert hamming_distance(simhash(TEXT), simhash(unrelated)) > SIMHASH_MAX_DISTANCE
+    assert simhash("") == 0
+
+
+def test_dedupe_passages_keeps_first_copy():
+    """Test that a passage repeated on a mirror page is returned once."""
+    passages = [
+        Section(url="https://a.com/1", heading="Middleware", text=TEXT),
+        Section(url="https://a.com/1", heading="Cookies", text="Read and set cookies."),
+        Section(url="https://mirror.com/1", heading="Middleware", text=TEXT + " "),
+    ]
+
+    kept = dedupe_passages(passages)
+
+    assert [passage.url for passage in kept] == ["https://a.com/1", "https://a.com/1"]
+    assert is_near_duplicate(simhash(TEXT), [0, simhash(TEXT)])
+
+
+def test_page_fingerprints_match_passages():
+    """Test that stored passage fingerprints equal freshly computed ones."""
+    content = f"# Middleware\n\n{TEXT}\n\n# Cookies\n\nRead and set cookies."
+
+    page, passages = page_fingerprints("https://a.com", content)
+
+    assert passages == passage_fingerprints(split_passages("https://a.com", content))
+    assert len(passages) == 2 and page not in (0, *passages)
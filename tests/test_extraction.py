@@ -0,0 +1,158 @@
+"""Unit tests for HTML text extraction in the MCP Documentation Search Server.
+
+This module contains tests for the incremental extractor used by fetch_url.
+Each test runs against every parser backend, verifying that noise is
+dropped, headings and code blocks are kept, and chunked input gives the
+same result as a single feed.
+"""
+
+import pytest
+from extraction import StreamingExtractor, extract_text, resolve_backend
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>Guide</title><style>body { color: red; }</style></head>
+<body>
+<header>Logo</header>
+<nav><a href="/">Home</a> <a href="/docs">Docs</a></nav>
+<main>
+  <h1>Data Fetching</h1>
+  <p>Use   <code>fetch</code> in
+     server components.</p>
+  <pre><code>async function Page() {
+    const data = await fetch(url)
+}</code></pre>
+  <h2>Caching &amp; revalidation</h2>
+  <ul><li>Static</li><li>Dynamic</li></ul>
+  <script>window.analytics = {};</script>
+</main>
+<footer>Copyright 2024</footer>
+</body></html>
+"""
+
+BACKENDS = ["html.parser", "lxml"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_extract_text_drops_noise(backend: str):
+    """Test that scripts, styles, navigation, headers and footers are removed.
+
+    Args:
+        backend: The parser backend to use
+    """
+    text = extract_text(PAGE, backend)
+
+    for noise in ["color: red", "Home", "Logo", "analytics", "Copyright"]:
+        assert noise not in text
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_extract_text_keeps_headers_inside_main_content(backend: str):
+    """Test that an article's own header is kept, unlike the page header.
+
+    Args:
+        backend: The parser backend to use
+    """
+    text = extract_text(
+        "<body><header>Logo</header><article><header><h1>useState</h1>"
+        "<p>Hook summary</p></header><p>Body text</p>"
+        "<footer>Last updated</footer></article></body>",
+        backend,
+    )
+
+    assert "Logo" not in text
+    assert "# useState" in text
+    assert "Hook summary" in text
+    assert "Body text" in text
+    assert "Last updated" in text
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_extract_text_keeps_structure(backend: str):
+    """Test that headings, paragraphs and code blocks are preserved.
+
+    Args:
+        backend: The parser backend to use
+    """
+    text = extract_text(PAGE, backend)
+
+    assert "# Data Fetching" in text
+    assert "## Caching & revalidation" in text
+    assert "Use fetch in server components." in text
+    assert "```\nasync function Page() {\n    const data = await fetch(url)\n}" in text
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_chunked_feed_matches_single_feed(backend: str):
+    """Test that feeding small chunks gives the same text as one feed.
+
+    Args:
+        backend: The parser backend to use
+    """
+    extractor = StreamingExtractor(backend)
+    for start in range(0, len(PAGE), 7):
+        extractor.feed(PAGE[start : start + 7])
+
+    assert extractor.close() == extract_text(PAGE, backend)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_chars_counts_only_main_content(backend: str):
+    """Test that sidebar text before <main> does not count toward chars.
+
+    The title is kept apart from the text.
+
+    Args:
+        backend: The parser backend to use
+    """
+    extractor = StreamingExtractor(backend)
+    extractor.feed("<html><head><title>Guide</title></head><body>")
+    extractor.feed(f"<div class='sidebar'>{'Link ' * 100}</div>")
+    before_main = extractor.chars
+    extractor.feed("<main><p>Body text</p></main></body></html>")
+
+    assert before_main == 0
+    assert extractor.chars >= len("Body text")
+    assert extractor.title == "Guide"
+    assert extractor.close() == "Body text"
+
+
+def test_without_main_element_uses_whole_body():
+    """Test that pages without a main element keep all body text."""
+    text = extract_text("<body><div>First</div><p>Second</p></body>")
+
+    assert text == "First\n\nSecond"
+
+
+def test_unknown_backend_falls_back():
+    """Test that an unknown backend name falls back to the stdlib parser."""
+    assert resolve_backend("unknown") == "html.parser"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_content_selectors(backend: str):
+    """Test that library content selectors replace the main/article default.
+
+    Only the matching element is kept, including nested elements of the
+    same tag, and text after it is dropped.
+    """
+    html = (
+        '<body><div class="sidebar"><div>Sidebar</div></div>'
+        '<div class="docs-content"><h1>Title</h1><div><p>Body text</p></div></div>'
+        "<div>Related links</div></body>"
+    )
+
+    text = extract_text(html, backend, selectors=["div.docs-content"])
+
+    assert text == "# Title\n\nBody text"
+
+
+@pytest.mark.parametrize("selector", ["div > p", "a[href]", ""])
+def test_unsupported_selectors_are_rejected(selector: str):
+    """Test that only tag, class and id selectors are accepted.
+
+    Args:
+        selector: A selector outside the supported subset
+    """
+    with pytest.raises(ValueError):
+        StreamingExtractor(selectors=[selector])
@@ -0,0 +1,298 @@
+"""Unit tests for the offline documentation index in the MCP Documentation Search Server.
+
+This module contains tests for the crawler and BM25 inverted index that let
+get_docs answer from local data. The crawler is exercised against a local
+HTTP fixture server serving a small static documentation site.
+"""
+
+import pytest
+import asyncio
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import httpx
+from registry import LibraryEntry
+from indexing import DocsIndex, Section, crawl_library, split_sections, tokenize
+
+
+PAGES = {
+    "docs/index.html": """
+        <html><head><title>Docs Home</title></head><body>
+        <nav><a href="/docs/routing.html">Routing</a></nav>
+        <main><h1>Welcome</h1><p>Start here.</p>
+        <a href="/docs/styling.html">Styling</a>
+        <a href="https://elsewhere.com/docs">External</a></main>
+        </body></html>
+    """,
+    "docs/routing.html": """
+        <html><body><main>
+        <h1>Routing</h1><p>The app router maps folders to routes.</p>
+        <h2>Dynamic routes</h2><p>Use brackets for dynamic segments.</p>
+        </main><footer>Copyright</footer></body></html>
+    """,
+    "docs/styling.html": """
+        <html><body><main>
+        <h1>Styling</h1><p>Use CSS modules or global stylesheets.</p>
+        <script>var tracking = 1;</script>
+        </main></body></html>
+    """,
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler that does not log requests to stderr."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def docs_site(tmp_path):
+    """Fixture serving PAGES from a local HTTP server.
+
+    Yields:
+        Tuple of the site root path and the base URL of the documentation
+    """
+    root = tmp_path / "site"
+    for name, html in PAGES.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(html)
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietHandler, directory=str(root))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield root, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_async(coroutine):
+    """Helper function to run an async function synchronously.
+
+    Args:
+        coroutine: The coroutine to execute
+
+    Returns:
+        The result of the coroutine execution
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def crawl(library, index, docs_url):
+    """Runs a crawl of one library with a fresh HTTP client."""
+
+    async def scenario():
+        async with httpx.AsyncClient(follow_redirects=True) as client:
+            entry = LibraryEntry(name=library, url=docs_url)
+            with patch("indexing.get_library", {library: entry}.get):
+                return await crawl_library(library, index, client)
+
+    return run_async(scenario())
+
+
+def test_tokenize():
+    """Test that text is split into lowercase alphanumeric terms."""
+    assert tokenize("App Router, next.js 14!") == ["app", "router", "next", "js", "14"]
+
+
+def test_split_sections():
+    """Test that pages are split at headings and noise is dropped.
+
+    Footer and script content must not appear in any section, and each
+    heading must start a new section.
+    """
+    sections = split_sections("http://x.com", PAGES["docs/routing.html"])
+
+    assert [section.heading for section in sections] == ["Routing", "Dynamic routes"]
+    assert "brackets" in sections[1].text
+    assert all("Copyright" not in section.text for section in sections)
+
+
+def test_split_sections_at_h1_to_h3_outside_code():
+    """Test that h4 headings and "#" lines in code blocks do not split sections."""
+    sections = split_sections(
+        "http://x.com",
+        "<html><head><title>Config</title></head><body><main><p>Intro</p>"
+        "<h2>Install</h2><pre># install it\npip install x</pre>"
+        "<h4>Windows</h4><p>Use py.</p><template>Hidden</template></main></body></html>",
+    )
+
+    assert [section.heading for section in sections] == ["Config", "Install"]
+    assert "pip install x" in sections[1].text
+    assert "Use py." in sections[1].text
+    assert "Hidden" not in sections[1].text
+
+
+def test_split_sections_keeps_article_header():
+    """Test that an article's own header is kept, unlike the page header."""
+    sections = split_sections(
+        "http://x.com",
+        "<body><header>Logo</header><article><header><h1>useState</h1>"
+        "<p>Hook summary</p></header><p>Body text</p></article></body>",
+    )
+
+    assert [section.heading for section in sections] == ["useState"]
+    assert "Hook summary" in sections[0].text
+    assert "Logo" not in sections[0].text
+
+
+def test_search_ranks_by_bm25(tmp_path):
+    """Test that the index ranks the most relevant section first."""
+    index = DocsIndex(str(tmp_path / "index.sqlite3"))
+    index.index_page(
+        "lib",
+        "http://x.com/a",
+        [
+            Section("http://x.com/a", "Routing", "router routes router folders"),
+            Section("http://x.com/a", "Styling", "css modules and stylesheets"),
+        ],
+        "hash-a",
+    )
+
+    hits = index.search("lib", "router")
+
+    assert [hit.heading for hit in hits] == ["Routing"]
+    assert index.search("other-lib", "router") == []
+    assert index.search("lib", "how to use the router") == hits
+    assert index.search("lib", "router and images", min_coverage=0.5) == hits
+    assert index.search("lib", "router images layouts", min_coverage=0.5) == []
+
+
+def test_crawl_follows_links(docs_site):
+    """Test crawling a site without a sitemap by following links.
+
+    Only pages under the documentation prefix are visited, and their
+    sections become searchable.
+    """
+    root, base_url = docs_site
+    index = DocsIndex(str(root / "index.sqlite3"))
+
+    stats = crawl("lib", index, f"{base_url}/docs")
+
+    assert stats.indexed == 3
+    assert index.page_urls("lib") == {
+        f"{base_url}/docs",
+        f"{base_url}/docs/routing.html",
+        f"{base_url}/docs/styling.html",
+    }
+    assert index.search("lib", "stylesheets")[0].url == f"{base_url}/docs/styling.html"
+
+
+def test_crawl_from_sitemap(docs_site):
+    """Test that sitemap.xml is used to discover pages when present."""
+    root, base_url = docs_site
+    (root / "sitemap.xml").write_text(
+        '<?xml version="1.0"?>'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"<url><loc>{base_url}/docs/routing.html</loc></url>"
+        f"<url><loc>{base_url}/docs/styling.html</loc></url>"
+        "<url><loc>https://elsewhere.com/page</loc></url>"
+        "</urlset>"
+    )
+    index = DocsIndex(str(root / "index.sqlite3"))
+
+    stats = crawl("lib", index, f"{base_url}/docs")
+
+    assert stats.indexed == 2
+    hits = index.search("lib", "dynamic segments")
+    assert hits[0].url == f"{base_url}/docs/routing.html"
+
+
+def test_incremental_recrawl(docs_site):
+    """Test that a re-crawl only reindexes pages that changed.
+
+    Unchanged pages are skipped via conditional requests, changed pages
+    are reindexed, and pages that disappeared are removed.
+    """
+    root, base_url = docs_site
+    index = DocsIndex(str(root / "index.sqlite3"))
+    docs_url = f"{base_url}/docs"
+    (root / "docs" / "index.html").unlink()
+    (root / "sitemap.xml").write_text(
+        "<urlset>"
+        f"<url><loc>{docs_url}/routing.html</loc></url>"
+        f"<url><loc>{docs_url}/styling.html</loc></url>"
+        "</urlset>"
+    )
+    assert crawl("lib", index, docs_url).indexed == 2
+
+    styling = root / "docs" / "styling.html"
+    styling.write_text("<main><h1>Styling</h1><p>Tailwind utilities.</p></main>")
+    os.utime(styling, (styling.stat().st_atime, styling.stat().st_mtime + 10))
+    stats = crawl("lib", index, docs_url)
+
+    assert (stats.indexed, stats.unchanged) == (1, 1)
+    assert index.search("lib", "tailwind utilities")[0].url == f"{docs_url}/styling.html"
+
+    (root / "sitemap.xml").write_text(
+        f"<urlset><url><loc>{docs_url}/routing.html</loc></url></urlset>"
+    )
+    stats = crawl("lib", index, docs_url)
+
+    assert stats.removed == 1
+    assert index.page_urls("lib") == {f"{docs_url}/routing.html"}
+
+
+def test_recrawl_with_etags_keeps_pages_behind_304(tmp_path):
+    """Test that pages linked from unchanged or failing pages are kept.
+
+    A 304 response has no body to take links from, so the links stored with
+    the page are followed instead. A crawl in which a fetch failed must not
+    remove pages it could not reach.
+    """
+    docs_url = "https://docs.example.com/docs"
+    pages = {
+        f"{docs_url}": PAGES["docs/index.html"],
+        f"{docs_url}/routing.html": PAGES["docs/routing.html"],
+        f"{docs_url}/styling.html": PAGES["docs/styling.html"],
+    }
+    failing = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url in failing:
+            return httpx.Response(503)
+        if url not in pages:
+            return httpx.Response(404)
+        etag = f'"{hash(pages[url])}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(
+            200, text=pages[url], headers={"ETag": etag, "Content-Type": "text/html"}
+        )
+
+    def crawl_mock():
+        async def scenario():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+                entry = LibraryEntry(name="lib", url=docs_url)
+                with patch("indexing.get_library", {"lib": entry}.get):
+                    return await crawl_library("lib", index, client)
+
+        return run_async(scenario())
+
+    index = DocsIndex(str(tmp_path / "index.sqlite3"))
+    assert crawl_mock().indexed == 3
+
+    stats = crawl_mock()
+
+    assert (stats.unchanged, stats.removed) == (3, 0)
+    assert len(index.page_urls("lib")) == 3
+
+    failing.add(docs_url)
+    stats = crawl_mock()
+
+    assert (stats.failed, stats.removed) == (1, 0)
+    assert len(index.page_urls("lib")) == 3
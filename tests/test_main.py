@@ -9,6 +9,9 @@ aliases, and returns appropriate responses.
 import pytest
 from unittest.mock import patch, AsyncMock
 import asyncio
+import os
+from config import OUTPUT_BUDGET_CHARS
+from vectors import numpy_available
 
 
 def run_async(coroutine):
@@ -51,6 +54,172 @@ def test_get_docs_valid_library():
         mock_search.assert_called_once()
 
 
+def test_get_docs_answers_from_local_index():
+    """Test that indexed documentation is answered without web search.
+
+    When the local index has sections matching the query, get_docs_impl
+    must return them with their source URL and skip the web search.
+    """
+    from main import get_docs_impl
+    from indexing import Section, get_docs_index
+
+    get_docs_index().index_page(
+        "nextjs",
+        "https://nextjs.org/docs/app",
+        [Section("https://nextjs.org/docs/app", "App Router", "The app router uses folders.")],
+        "hash",
+    )
+
+    with patch("main.search_documentation", new_callable=AsyncMock) as mock_search:
+        result = run_async(get_docs_impl("app router", "nextjs"))
+
+    assert "The app router uses folders." in result
+    assert "Source: https://nextjs.org/docs/app" in result
+    mock_search.assert_not_called()
+
+
+def test_get_docs_unrelated_query_falls_through_to_web_search():
+    """Test that sharing only common words with a section is not a hit.
+
+    The indexed section and the query have "the" and "use" in common, but
+    none of the query's meaningful terms, so get_docs must search the web.
+    """
+    from main import get_docs_impl
+    from indexing import Section, get_docs_index
+
+    get_docs_index().index_page(
+        "nextjs",
+        "https://nextjs.org/docs/app",
+        [Section("https://nextjs.org/docs/app", "App Router", "Use the app router for folders.")],
+        "hash",
+    )
+
+    with patch("main.search_documentation", new_callable=AsyncMock) as mock_search:
+        mock_search.return_value = "Image component docs"
+        result = run_async(get_docs_impl("how to use the image component", "nextjs"))
+
+    assert "Image component docs" in result
+    mock_search.assert_called_once()
+
+
+@pytest.mark.skipif(not numpy_available(), reason="numpy is not installed")
+def test_get_docs_answers_from_vectors():
+    """Test that similar cached passages are answered without web search.
+
+    With vector retrieval enabled, a page cached by an earlier fetch is
+    embedded, and a query worded differently than the page is answered
+    from it when the keyword index has no match.
+    """
+    from main import get_docs_impl
+    from vectors import index_page_vectors
+
+    with patch("vectors.SEMANTIC_SEARCH_ENABLED", True):
+        index_page_vectors(
+            "nextjs",
+            "https://nextjs.org/docs/app/images",
+            "# Image optimization\n\nThe Image component resizes pictures and lazy loads them.",
+        )
+        with patch("main.search_documentation", new_callable=AsyncMock) as mock_search:
+            result = run_async(get_docs_impl("optimizing images", "nextjs"))
+
+    assert "The Image component resizes pictures" in result
+    assert "Source: https://nextjs.org/docs/app/images" in result
+    mock_search.assert_not_called()
+
+
+def test_get_docs_page_over_budget_is_fetched_once():
+    """Test that a page longer than the output budget is served from cache.
+
+    The first call stops reading the page at the budget; the second call
+    for the same query must be answered from the cached partial page
+    without another request.
+    """
+    import httpx
+    from main import get_docs_impl
+
+    url = "https://nextjs.org/docs/app/api-reference"
+    body = "<main>" + "<p>Routing with the app router and layouts.</p>" * 2000 + "</main>"
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url))
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/html"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("services.search_providers", new_callable=AsyncMock) as mock_search, patch(
+        "services.get_http_client", return_value=client
+    ):
+        mock_search.return_value = [url]
+        first = run_async(get_docs_impl("app router layouts", "nextjs"))
+        second = run_async(get_docs_impl("app router layouts", "nextjs"))
+
+    assert len(body) > 2 * OUTPUT_BUDGET_CHARS
+    assert requests == [url]
+    assert "Routing with the app router" in second
+    assert len(second) == len(first)
+
+
+def test_get_docs_skips_vector_search_when_disabled():
+    """Test that disabled vector retrieval costs no thread-pool hop."""
+    from main import get_docs_impl
+
+    with patch("main.search_documentation", new_callable=AsyncMock) as mock_search, patch(
+        "main.search_vectors"
+    ) as mock_vectors:
+        mock_search.return_value = "docs"
+        run_async(get_docs_impl("routing", "nextjs"))
+
+    mock_vectors.assert_not_called()
+
+
+def test_get_docs_max_chars():
+    """Test that max_chars is passed down as the output budget.
+
+    Without max_chars the configured default budget is used.
+    """
+    from main import get_docs_impl
+
+    with patch("main.search_documentation", new_callable=AsyncMock) as mock_search:
+        mock_search.return_value = "docs"
+
+        run_async(get_docs_impl("routing", "nextjs", max_chars=500))
+        _, kwargs = mock_search.call_args
+        assert kwargs["max_chars"] == 500
+
+        run_async(get_docs_impl("routing", "nextjs"))
+        _, kwargs = mock_search.call_args
+        assert kwargs["max_chars"] == OUTPUT_BUDGET_CHARS
+
+
+@pytest.mark.parametrize(
+    "max_results,expected",
+    [
+        (None, None),  # Default result count
+        (5, 5),
+        (0, 1),  # Raised to one page
+        (100, 10),  # Capped at MAX_SEARCH_RESULTS_LIMIT
+    ],
+)
+def test_get_docs_max_results(max_results, expected):
+    """Test that max_results is bounded and passed down to the search.
+
+    Args:
+        max_results: The result count requested by the caller
+        expected: The result count the search should receive
+    """
+    from main import get_docs_impl
+
+    with (
+        patch("main.MAX_SEARCH_RESULTS_LIMIT", 10),
+        patch("main.search_documentation", new_callable=AsyncMock) as mock_search,
+    ):
+        mock_search.return_value = "docs"
+        run_async(get_docs_impl("routing", "nextjs", max_results=max_results))
+
+    _, kwargs = mock_search.call_args
+    assert kwargs["max_results"] == expected
+
+
 def test_get_docs_invalid_library():
     """Test documentation retrieval for an invalid library.
 
@@ -129,4 +298,273 @@ def test_get_docs_various_aliases(library: str, expected_in_result: str):
         result = run_async(get_docs_impl("test", library))
 
         assert mock_search.called
-        assert f"Docs for {expected_in_result}" in result
\ No newline at end of file
+        assert f"Docs for {expected_in_result}" in result
+
+
+def test_get_docs_coalesces_identical_calls():
+    """Test that concurrent identical get_docs calls share one answer.
+
+    Queries differing only in case and whitespace, for the same library
+    under different aliases, must run a single search. A different
+    max_chars needs its own answer.
+    """
+    from main import get_docs_impl
+
+    async def fake_search(query, docs_url, max_chars=None, on_page=None, max_results=None):
+        await asyncio.sleep(0.05)
+        return f"docs for {query}"
+
+    async def scenario():
+        return await asyncio.gather(
+            get_docs_impl("App Router", "nextjs"),
+            get_docs_impl("app  router", "next.js"),
+            get_docs_impl("app router", "nextjs"),
+            get_docs_impl("app router", "nextjs", max_chars=100),
+        )
+
+    with patch("main.search_documentation", side_effect=fake_search) as mock_search:
+        results = run_async(scenario())
+
+    assert results[:3] == ["docs for App Router"] * 3
+    assert mock_search.call_count == 2
+
+
+def test_get_docs_coalesced_errors_reach_every_caller():
+    """Test that a failure of the shared call is raised to every caller."""
+    from main import get_docs_impl
+
+    async def failing_search(query, docs_url, max_chars=None, on_page=None, max_results=None):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(get_docs_impl("routing", "nextjs") for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    with patch("main.search_documentation", side_effect=failing_search) as mock_search:
+        results = run_async(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert mock_search.call_count == 1
+
+
+def test_get_docs_batch_results_in_order():
+    """Test that a batch answers every query in the order given.
+
+    Duplicate (query, library) pairs must be answered by a single call,
+    and every answer must be reported as soon as it is ready.
+    """
+    from main import get_docs_batch_impl
+
+    async def fake_get_docs(query, library, max_chars=None):
+        await asyncio.sleep(0.05 if library == "nextjs" else 0)
+        return f"{library} docs for {query}"
+
+    reported = []
+
+    async def on_result(index, result):
+        reported.append(index)
+
+    queries = [
+        {"query": "routing", "library": "nextjs"},
+        {"query": "routing", "library": "tailwind"},
+        {"query": "routing", "library": "nextjs"},
+    ]
+    with patch("main.get_docs_impl", side_effect=fake_get_docs) as mock_get_docs:
+        results = run_async(get_docs_batch_impl(queries, on_result=on_result))
+
+    assert [result["result"] for result in results] == [
+        "nextjs docs for routing",
+        "tailwind docs for routing",
+        "nextjs docs for routing",
+    ]
+    assert mock_get_docs.call_count == 2
+    # The faster tailwind answer is reported first
+    assert reported == [1, 0, 2]
+
+
+def test_get_docs_batch_limit():
+    """Test that queries beyond the batch limit are rejected individually."""
+    from main import get_docs_batch_impl
+
+    queries = [{"query": f"q{i}", "library": "nextjs"} for i in range(12)]
+    with (
+        patch("main.MAX_BATCH_QUERIES", 10),
+        patch("main.get_docs_impl", new_callable=AsyncMock) as mock_get_docs,
+    ):
+        mock_get_docs.return_value = "docs"
+        results = run_async(get_docs_batch_impl(queries))
+
+    assert [result["result"] for result in results[:10]] == ["docs"] * 10
+    assert all("Batch limit" in result["result"] for result in results[10:])
+    assert mock_get_docs.call_count == 10
+
+
+def test_get_docs_batch_tool_streams_progress():
+    """Test that the batch tool sends each answer as a progress notification."""
+    from fastmcp import Client
+    from main import mcp
+
+    progress = []
+
+    async def on_progress(current, total, message):
+        progress.append((current, total, message))
+
+    async def scenario():
+        async with Client(mcp, progress_handler=on_progress) as client:
+            return await client.call_tool(
+                "get_docs_batch",
+                {
+                    "queries": [
+                        {"query": "routing", "library": "nextjs"},
+                        {"query": "colors", "library": "tailwind"},
+                    ]
+                },
+            )
+
+    with (
+        patch("main.warm_up", new_callable=AsyncMock),
+        patch("main.close_http_client", new_callable=AsyncMock),
+        patch("main.get_docs_impl", new_callable=AsyncMock) as mock_get_docs,
+    ):
+        mock_get_docs.side_effect = lambda query, library, max_chars: f"{library}: {query}"
+        result = run_async(scenario())
+
+    assert [item["result"] for item in result.structured_content["result"]] == [
+        "nextjs: routing",
+        "tailwind: colors",
+    ]
+    assert sorted(current for current, _, _ in progress) == [1, 2]
+    assert all(total == 2 for _, total, _ in progress)
+    assert any("tailwind: colors" in message for _, _, message in progress)
+
+
+def test_get_docs_progressive_reports_pages():
+    """Test that progressive mode sends each page before the final answer.
+
+    Every fetched page must be passed on as partial content, and the final
+    answer must end with a summary of which URLs succeeded.
+    """
+    from main import get_docs_progressive_impl
+
+    async def fake_search(query, site_url, max_chars=None, on_page=None, max_results=None):
+        await on_page("http://a.com", "# Routing\nRouting with the app router.")
+        await on_page("http://b.com", "❌ Timeout error: too slow")
+        return "Combined routing answer"
+
+    partials = []
+
+    async def on_partial(content):
+        partials.append(content)
+
+    with patch("main.search_documentation", side_effect=fake_search):
+        result = run_async(
+            get_docs_progressive_impl("routing", "nextjs", on_partial=on_partial)
+        )
+
+    assert len(partials) == 1
+    assert "Routing with the app router." in partials[0]
+    assert result.startswith("Combined routing answer")
+    assert "✅ http://a.com" in result
+    assert "❌ http://b.com (Timeout error: too slow)" in result
+
+
+def test_lifespan_closes_http_client():
+    """Test that the server lifespan owns the shared HTTP client.
+
+    This test verifies that the client is warmed up in the background when
+    the server starts and closed again when the server shuts down.
+    """
+    from main import lifespan, mcp
+
+    with (
+        patch("main.warm_up", new_callable=AsyncMock) as mock_warm_up,
+        patch("main.close_http_client", new_callable=AsyncMock) as mock_close,
+    ):
+
+        async def scenario():
+            async with lifespan(mcp):
+                await asyncio.sleep(0)
+                mock_warm_up.assert_awaited_once()
+                mock_close.assert_not_called()
+
+        run_async(scenario())
+
+        mock_close.assert_awaited_once()
+
+
+def test_main_imports_no_heavy_dependencies():
+    """Test that starting the server defers the HTTP and search libraries.
+
+    Importing main in a fresh interpreter must not import httpx,
+    duckduckgo_search, bs4 or numpy; they are loaded by warm_up() or on first use.
+    """
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, main; "
+        "print(sorted(m for m in ('httpx', 'duckduckgo_search', 'bs4', 'numpy') if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert output.strip() == "[]"
+
+
+def test_http_app_serves_health_and_metrics():
+    """Test the /health and /metrics endpoints of the HTTP transport."""
+    from starlette.testclient import TestClient
+    from main import create_http_app
+    from tracing import metrics
+
+    metrics.increment("page_cache", result="hit")
+    with TestClient(create_http_app()) as client:
+        health = client.get("/health")
+        exported = client.get("/metrics")
+
+    assert health.status_code == 200
+    assert health.json()["status"] == "ok"
+    assert exported.status_code == 200
+    assert 'docs_page_cache_total{result="hit"}' in exported.text
+
+
+def test_serve_http_shares_state_between_workers():
+    """Test that several workers get stateless sessions and a shared cache.
+
+    Only one of them may run the background refresh of that cache.
+
+    SSE cannot be spread over workers and must be rejected.
+    """
+    from main import parse_args, serve_http
+
+    with patch.dict(os.environ), patch("uvicorn.run") as mock_run:
+        for name in (
+            "DOCS_MCP_TRANSPORT",
+            "DOCS_MCP_STATELESS",
+            "DOCS_REFRESH_SINGLE_WORKER",
+            "DOCS_SEARCH_CACHE",
+        ):
+            os.environ.pop(name, None)
+        serve_http("http", "127.0.0.1", 8000, 4)
+
+        assert os.environ["DOCS_MCP_STATELESS"] == "1"
+        assert os.environ["DOCS_REFRESH_SINGLE_WORKER"] == "1"
+        assert os.environ["DOCS_SEARCH_CACHE"] == "sqlite"
+
+    args, kwargs = mock_run.call_args
+    assert args == ("main:create_http_app",)
+    assert kwargs["factory"] and kwargs["workers"] == 4
+
+    with pytest.raises(ValueError):
+        serve_http("sse", "127.0.0.1", 8000, 2)
+    with pytest.raises(SystemExit):
+        parse_args(["--transport", "sse", "--workers", "2"])
+    assert parse_args([]).transport == "stdio"
@@ -0,0 +1,237 @@
+"""Unit tests for search providers in the MCP Documentation Search Server.
+
+This module contains tests for the built-in search providers and provider
+fallback chains, using an in-memory provider over a fixed set of pages.
+"""
+
+import pytest
+import asyncio
+from typing import List, Mapping, Optional
+from unittest.mock import patch
+from urllib.parse import urlsplit
+from indexing import Section, get_docs_index, tokenize
+from providers import (
+    LocalIndexProvider,
+    SearchProvider,
+    SearchUnavailableError,
+    search_providers,
+)
+from registry import LibraryEntry
+from services import search_documentation
+
+
+def run_async(coroutine):
+    """Helper function to run an async function synchronously.
+
+    Args:
+        coroutine: The coroutine to execute
+
+    Returns:
+        The result of the coroutine execution
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class UnavailableProvider(SearchProvider):
+    """A provider that always fails."""
+
+    name = "down"
+
+    async def search(self, query, library, site_url, max_results):
+        raise SearchUnavailableError("provider down")
+
+
+class InMemoryProvider(SearchProvider):
+    """Searches a fixed set of pages held in memory.
+
+    Pages under the documentation URL are ranked by how many of the query's
+    terms they contain; pages containing none are not returned.
+    """
+
+    def __init__(self, pages: Mapping[str, str], name: str = "memory"):
+        """Indexes the pages.
+
+        Args:
+            pages (Mapping[str, str]): Text content per page URL
+            name (str): The name the provider is registered under
+        """
+        self.name = name
+        self._terms = {url: set(tokenize(text)) for url, text in pages.items()}
+        self.calls = 0
+
+    async def search(
+        self, query: str, library: Optional[str], site_url: str, max_results: int
+    ) -> List[str]:
+        self.calls += 1
+        terms = set(tokenize(query))
+        site = urlsplit(site_url)
+        matches = []
+        for url, page_terms in self._terms.items():
+            parts = urlsplit(url)
+            if parts.netloc != site.netloc or not parts.path.startswith(site.path):
+                continue
+            score = len(terms & page_terms)
+            if score:
+                matches.append((score, url))
+        matches.sort(key=lambda match: -match[0])
+        return [url for _, url in matches[:max_results]]
+
+
+PAGES = {
+    "http://test.com/docs/routing": "Routing with dynamic segments and layouts.",
+    "http://test.com/docs/layouts": "Nested layouts share UI between routes.",
+    "http://test.com/docs/images": "Optimize images automatically.",
+    "http://other.com/docs/routing": "Routing and layouts of another library.",
+}
+
+
+def test_provider_without_search_cannot_be_created():
+    """Test that an incomplete provider fails before it is registered."""
+
+    class Incomplete(SearchProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_in_memory_provider_ranks_site_pages():
+    """Test that pages are ranked by shared query terms and kept to the site."""
+    provider = InMemoryProvider(PAGES)
+
+    urls = run_async(provider.search("routing layouts", None, "http://test.com/docs", 5))
+
+    assert urls == ["http://test.com/docs/routing", "http://test.com/docs/layouts"]
+    assert run_async(provider.search("routing", None, "http://test.com/docs", 1)) == [
+        "http://test.com/docs/routing"
+    ]
+
+
+def test_local_index_provider_returns_matching_pages():
+    """Test that the local provider returns each matching page once."""
+    url = "https://nextjs.org/docs/app"
+    get_docs_index().index_page(
+        "nextjs",
+        url,
+        [
+            Section(url, "App Router", "The app router uses folders."),
+            Section(url, "Routing", "Folders define routes in the app router."),
+        ],
+        "hash",
+    )
+
+    urls = run_async(
+        LocalIndexProvider().search("app router", "nextjs", "https://nextjs.org/docs", 2)
+    )
+
+    assert urls == [url]
+
+
+def test_local_index_provider_unavailable_when_disabled():
+    """Test that a disabled index makes the provider unavailable, not empty."""
+    with patch("providers.get_docs_index", return_value=None):
+        with pytest.raises(SearchUnavailableError):
+            run_async(LocalIndexProvider().search("q", "nextjs", "https://nextjs.org/docs", 2))
+
+
+@pytest.mark.parametrize(
+    "chain,expected",
+    [
+        (["down", "memory"], ["http://test.com/docs/images"]),  # Unavailable provider skipped
+        (["empty", "memory"], ["http://test.com/docs/images"]),  # Empty result falls through
+        (["unknown", "memory"], ["http://test.com/docs/images"]),  # Unknown name ignored
+        (["empty"], []),  # Nothing found anywhere
+    ],
+)
+def test_search_providers_fallback(chain, expected):
+    """Test that providers are tried in order until one finds pages.
+
+    Args:
+        chain: The provider names to try
+        expected: The URLs expected from the chain
+    """
+    providers = {
+        "down": UnavailableProvider(),
+        "empty": InMemoryProvider({}, name="empty"),
+        "memory": InMemoryProvider(PAGES),
+    }
+    with patch.dict("providers._providers", providers):
+        urls = run_async(search_providers(chain, "images", None, "http://test.com/docs", 2))
+
+    assert urls == expected
+
+
+def test_search_providers_raises_when_nothing_found_and_provider_down():
+    """Test that an unavailable provider is reported rather than "no results"."""
+    providers = {"down": UnavailableProvider(), "empty": InMemoryProvider({}, name="empty")}
+    with patch.dict("providers._providers", providers):
+        with pytest.raises(SearchUnavailableError):
+            run_async(search_providers(["empty", "down"], "q", None, "http://test.com/docs", 2))
+
+
+def test_search_documentation_uses_library_providers():
+    """Test that the registry's provider chain and max_results are honored.
+
+    The library's in-memory provider must answer without any web search,
+    and only max_results pages may be fetched.
+    """
+    memory = InMemoryProvider(PAGES)
+    entry = LibraryEntry(
+        name="test", url="http://test.com/docs", search_providers=("memory",)
+    )
+
+    async def fake_fetch(url, **kwargs):
+        return PAGES[url]
+
+    with (
+        patch.dict("providers._providers", {"memory": memory}),
+        patch("services.get_library_for_url", return_value="test"),
+        patch("services.get_library", return_value=entry),
+        patch("services.fetch_url", side_effect=fake_fetch) as mock_fetch,
+        patch("services.search_web") as mock_search,
+    ):
+        result = run_async(
+            search_documentation("routing layouts", "http://test.com/docs", max_results=1)
+        )
+
+    assert "dynamic segments" in result
+    assert mock_fetch.call_count == 1
+    assert memory.calls == 1
+    mock_search.assert_not_called()
+
+
+def test_get_docs_fetches_pages_of_weak_local_matches():
+    """Test the "local" provider through get_docs for a partial index match.
+
+    The indexed section contains only one of the four query terms, too few
+    to answer from the index directly. The local provider must still offer
+    its page, which is then fetched instead of searching the web.
+    """
+    from main import get_docs_impl
+
+    url = "https://nextjs.org/docs/app/redirects"
+    get_docs_index().index_page(
+        "nextjs", url, [Section(url, "Redirects", "Configure redirects in next.config.js.")], "hash"
+    )
+    entry = LibraryEntry(
+        name="nextjs", url="https://nextjs.org/docs", search_providers=("local",)
+    )
+
+    async def fake_fetch(fetched_url, **kwargs):
+        return "Redirects, rewrites and headers run before middleware."
+
+    with (
+        patch("services.get_library", return_value=entry),
+        patch("services.fetch_url", side_effect=fake_fetch) as mock_fetch,
+        patch("services.search_web") as mock_search,
+    ):
+        result = run_async(get_docs_impl("redirects middleware headers rewrites", "nextjs"))
+
+    assert "run before middleware" in result
+    assert mock_fetch.call_args[0][0] == url
+    mock_search.assert_not_called()
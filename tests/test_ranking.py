@@ -0,0 +1,80 @@
+"""Unit tests for passage ranking in the MCP Documentation Search Server.
+
+This module contains tests for splitting fetched pages into passages and
+ranking them against the query, so that get_docs returns only the parts of
+pages relevant to the question.
+"""
+
+from indexing import Section
+from ranking import rank_passages, split_passages
+
+
+PAGE = """# Middleware
+
+Middleware runs before a request is completed.
+
+## Matching paths
+
+Use the matcher config to filter paths.
+
+```
+# not a heading
+export const config = { matcher: '/about' }
+
+```
+
+## Cookies
+
+Read and set cookies on the response."""
+
+
+def test_split_passages_at_headings():
+    """Test that each heading starts a new passage.
+
+    Lines starting with "#" inside code blocks must not be treated as
+    headings, and code blocks must stay in one passage.
+    """
+    passages = split_passages("http://x.com", PAGE)
+
+    assert [p.heading for p in passages] == ["Middleware", "Matching paths", "Cookies"]
+    assert "# not a heading" in passages[1].text
+    assert passages[1].text.endswith("```")
+
+
+def test_split_long_section_at_paragraphs():
+    """Test that sections longer than the limit are split at blank lines."""
+    text = "# Title\n\n" + "\n\n".join(f"Paragraph {i} " + "x" * 40 for i in range(5))
+
+    passages = split_passages("http://x.com", text, max_chars=100)
+
+    assert len(passages) > 1
+    assert all(p.heading == "Title" for p in passages)
+
+
+def test_rank_passages_prefers_relevant():
+    """Test that the passage matching the query ranks first.
+
+    Passages that share no terms with the query are dropped.
+    """
+    passages = split_passages("http://x.com", PAGE)
+
+    hits = rank_passages("set cookies", passages)
+
+    assert [hit.heading for hit in hits] == ["Cookies"]
+    assert hits[0].url == "http://x.com"
+
+
+def test_rank_passages_respects_top_k():
+    """Test that at most top_k passages are returned."""
+    passages = [Section("http://x.com", f"H{i}", "routing guide") for i in range(5)]
+
+    assert len(rank_passages("routing", passages, top_k=2)) == 2
+
+
+def test_rank_passages_without_matches_keeps_order():
+    """Test that unmatched queries fall back to the leading passages."""
+    passages = split_passages("http://x.com", PAGE)
+
+    hits = rank_passages("unrelated words", passages, top_k=2)
+
+    assert [hit.heading for hit in hits] == ["Middleware", "Matching paths"]
@@ -0,0 +1,155 @@
+"""Unit tests for the background refresh scheduler.
+
+This module contains tests for the RefreshScheduler that refreshes stale
+cache entries after they were served. These tests verify that jobs are
+deduplicated by key, wait while live requests run, survive failing jobs,
+and that a stopped or full scheduler refuses new jobs.
+"""
+
+import asyncio
+from refresh import RefreshScheduler
+
+
+def run_async(coroutine):
+    """Helper function to run an async function synchronously.
+
+    Args:
+        coroutine: The coroutine to execute
+
+    Returns:
+        The result of the coroutine execution
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def wait_idle(scheduler: RefreshScheduler) -> None:
+    """Waits until the scheduler has no queued or running jobs."""
+    while scheduler.pending():
+        await asyncio.sleep(0.01)
+
+
+def test_scheduler_runs_each_key_once():
+    """Test that a key already queued is not queued a second time.
+
+    Stale hits on a popular page schedule the same refresh over and over;
+    only one of them may reach the origin.
+    """
+    runs = []
+
+    async def job(name):
+        runs.append(name)
+
+    async def scenario():
+        scheduler = RefreshScheduler(lambda: False, concurrency=1, rate=1000)
+        scheduler.start()
+        try:
+            assert scheduler.schedule("a", lambda: job("a"))
+            assert scheduler.schedule("a", lambda: job("a again"))
+            assert scheduler.schedule("b", lambda: job("b"))
+            await wait_idle(scheduler)
+        finally:
+            await scheduler.stop()
+
+    run_async(scenario())
+
+    assert runs == ["a", "b"]
+
+
+def test_scheduler_waits_for_live_requests():
+    """Test that jobs do not start while live requests are running."""
+    busy = True
+
+    async def scenario():
+        nonlocal busy
+        done = asyncio.Event()
+
+        async def job():
+            done.set()
+
+        scheduler = RefreshScheduler(lambda: busy, concurrency=1, rate=1000)
+        scheduler.start()
+        try:
+            scheduler.schedule("a", job)
+            await asyncio.sleep(0.5)
+            started_while_busy = done.is_set()
+            busy = False
+            await asyncio.wait_for(done.wait(), 1)
+            return started_while_busy
+        finally:
+            await scheduler.stop()
+
+    assert run_async(scenario()) is False
+
+
+def test_scheduler_survives_failing_job():
+    """Test that a failing job is dropped and later jobs still run."""
+    runs = []
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def succeeding():
+        runs.append("good")
+
+    async def scenario():
+        scheduler = RefreshScheduler(lambda: False, concurrency=1, rate=1000)
+        scheduler.start()
+        try:
+            scheduler.schedule("bad", failing)
+            scheduler.schedule("good", succeeding)
+            await wait_idle(scheduler)
+            # The failed key may be scheduled again
+            assert scheduler.schedule("bad", failing)
+            await wait_idle(scheduler)
+        finally:
+            await scheduler.stop()
+
+    run_async(scenario())
+
+    assert runs == ["good"]
+
+
+def test_scheduler_refuses_jobs_when_stopped_or_full():
+    """Test that schedule() reports when the caller must refresh itself."""
+
+    async def scenario():
+        scheduler = RefreshScheduler(lambda: True, concurrency=1, queue_size=1)
+        refused_before_start = not scheduler.schedule("a", asyncio.sleep)
+        scheduler.start()
+        try:
+            # The worker takes the first job and waits; the second fills the queue
+            scheduler.schedule("a", lambda: asyncio.sleep(0))
+            await asyncio.sleep(0)
+            scheduler.schedule("b", lambda: asyncio.sleep(0))
+            refused_when_full = not scheduler.schedule("c", lambda: asyncio.sleep(0))
+        finally:
+            await scheduler.stop()
+        refused_after_stop = not scheduler.schedule("d", lambda: asyncio.sleep(0))
+        return refused_before_start, refused_when_full, refused_after_stop
+
+    assert run_async(scenario()) == (True, True, True)
+
+
+def test_scheduler_runs_plan_periodically():
+    """Test that every() calls the plan after the delay and then repeatedly."""
+    calls = []
+
+    async def scenario():
+        scheduler = RefreshScheduler(lambda: False)
+        scheduler.start()
+        try:
+            scheduler.every(0.05, lambda: calls.append(1), delay=0.05)
+            await asyncio.sleep(0.01)
+            before_delay = len(calls)
+            await asyncio.sleep(0.2)
+            return before_delay
+        finally:
+            await scheduler.stop()
+
+    assert run_async(scenario()) == 0
+    assert len(calls) >= 2
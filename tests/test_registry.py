@@ -0,0 +1,157 @@
+"""Unit tests for the library registry in the MCP Documentation Search Server.
+
+This module contains tests for loading library definitions from TOML and
+JSON files, validating them, reloading them when the file changes, and
+keeping the library name resolver in sync with the registry.
+"""
+
+import pytest
+import json
+import os
+from unittest.mock import patch
+from registry import (
+    LibraryEntry,
+    LibraryRegistry,
+    RegistryError,
+    load_registry_file,
+    parse_registry,
+)
+import utils
+
+TOML_REGISTRY = """
+[libraries.nextjs]
+url = "https://nextjs.org/docs"
+aliases = ["next", "next.js"]
+sitemap = "https://nextjs.org/sitemap.xml"
+ttl = 3600
+selectors = ["article"]
+rate_limit = 5
+search_providers = ["local", "duckduckgo"]
+
+[libraries.svelte]
+url = "https://svelte.dev/docs"
+"""
+
+
+def write_json(path, libraries):
+    """Writes a JSON registry file.
+
+    Args:
+        path: The file to write
+        libraries: The library definitions by name
+    """
+    path.write_text(json.dumps({"libraries": libraries}))
+
+
+def test_load_toml_registry(tmp_path):
+    """Test that every field of a TOML registry entry is loaded."""
+    path = tmp_path / "libraries.toml"
+    path.write_text(TOML_REGISTRY)
+
+    entries = load_registry_file(str(path))
+
+    assert entries["nextjs"] == LibraryEntry(
+        name="nextjs",
+        url="https://nextjs.org/docs",
+        aliases=("next", "next.js"),
+        sitemap="https://nextjs.org/sitemap.xml",
+        ttl=3600.0,
+        selectors=("article",),
+        rate_limit=5.0,
+        search_providers=("local", "duckduckgo"),
+    )
+    assert entries["svelte"] == LibraryEntry(name="svelte", url="https://svelte.dev/docs")
+
+
+@pytest.mark.parametrize(
+    "definition,message",
+    [
+        ({}, "url"),  # Missing URL
+        ({"url": "ftp://x.com"}, "url"),  # Not an http(s) URL
+        ({"url": "https://x.com", "aliases": "x"}, "aliases"),  # Not a list
+        ({"url": "https://x.com", "ttl": -1}, "ttl"),  # Not positive
+        ({"url": "https://x.com", "selectors": ["div > p"]}, "selector"),  # Unsupported
+        ({"url": "https://x.com", "search_providers": "local"}, "search_providers"),
+    ],
+)
+def test_invalid_entries_are_rejected(definition, message):
+    """Test that malformed entries raise RegistryError naming the problem.
+
+    Args:
+        definition: The invalid library definition
+        message: Text expected in the error
+    """
+    with pytest.raises(RegistryError, match=message):
+        parse_registry({"libraries": {"broken": definition}})
+
+
+def test_registry_loads_lazily(tmp_path):
+    """Test that the file is not read until the registry is first used."""
+    path = tmp_path / "libraries.json"
+    registry = LibraryRegistry(str(path))
+    write_json(path, {"svelte": {"url": "https://svelte.dev/docs"}})
+
+    assert registry.version == 0
+    assert registry.names() == ["svelte"]
+
+
+def test_registry_hot_reloads(tmp_path):
+    """Test that changes on disk are picked up without a restart.
+
+    An invalid edit must keep the previous definitions in effect.
+    """
+    path = tmp_path / "libraries.json"
+    write_json(path, {"svelte": {"url": "https://svelte.dev/docs"}})
+    registry = LibraryRegistry(str(path), check_interval=0)
+    assert registry.names() == ["svelte"]
+
+    write_json(
+        path,
+        {"svelte": {"url": "https://svelte.dev/docs"}, "vue": {"url": "https://vuejs.org/guide"}},
+    )
+    os.utime(path, ns=(0, 10**18))
+    assert registry.names() == ["svelte", "vue"]
+    version = registry.version
+
+    path.write_text("{not json")
+    assert registry.names() == ["svelte", "vue"]
+    assert registry.version == version
+
+
+def test_missing_registry_uses_builtin_libraries(tmp_path):
+    """Test that the libraries from config are used without a registry file."""
+    registry = LibraryRegistry(str(tmp_path / "missing.toml"))
+
+    assert "nextjs" in registry.names()
+    assert registry.get("tailwind").ttl == 7 * 24 * 60 * 60
+
+
+def test_resolver_follows_registry_reloads(tmp_path):
+    """Test that library resolution uses the current registry contents."""
+    path = tmp_path / "libraries.json"
+    write_json(path, {"svelte": {"url": "https://svelte.dev/docs", "aliases": ["sveltekit"]}})
+    registry = LibraryRegistry(str(path), check_interval=0)
+
+    with patch("utils.get_registry", return_value=registry):
+        assert utils.resolve_library("SvelteKit") == ("svelte", "https://svelte.dev/docs")
+
+        write_json(path, {"vue": {"url": "https://vuejs.org/guide"}})
+        os.utime(path, ns=(0, 10**18))
+        assert utils.resolve_library("sveltekit") is None
+        assert utils.resolve_library("vue") == ("vue", "https://vuejs.org/guide")
+
+
+def test_unsupported_library_message_stays_short(tmp_path):
+    """Test that the error for an unknown library does not list every library."""
+    path = tmp_path / "libraries.json"
+    write_json(path, {f"lib{i}": {"url": f"https://lib{i}.dev/docs"} for i in range(1000)})
+    registry = LibraryRegistry(str(path))
+
+    with patch("utils.get_registry", return_value=registry):
+        unknown = utils.unsupported_library_message("react")
+        close = utils.unsupported_library_message("lib-one-hundred")
+
+    assert unknown.startswith("❌ Library not supported: react.")
+    assert "1000 libraries are available" in unknown
+    assert len(unknown) < 200
+    assert "Did you mean" in close
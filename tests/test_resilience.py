@@ -0,0 +1,133 @@
+"""Unit tests for rate limiting and backoff in the MCP Documentation Search Server.
+
+This module contains tests for the token bucket, the circuit breaker and the
+retry delay helpers used to keep searches and page fetches within upstream
+limits.
+"""
+
+import pytest
+import asyncio
+import time
+from email.utils import formatdate
+from unittest.mock import patch
+from resilience import CircuitBreaker, TokenBucket, backoff_delay, parse_retry_after
+
+
+def run_async(coroutine):
+    """Helper function to run an async function synchronously.
+
+    Args:
+        coroutine: The coroutine to execute
+
+    Returns:
+        The result of the coroutine execution
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_token_bucket_allows_burst_then_rate():
+    """Test that a burst passes at once and further calls are paced."""
+    bucket = TokenBucket(rate=20, burst=3)
+
+    async def scenario():
+        start = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+        return time.perf_counter() - start
+
+    elapsed = run_async(scenario())
+
+    # Two calls beyond the burst need two refills at 20 per second
+    assert 0.08 <= elapsed < 0.5
+
+
+def test_token_bucket_returns_token_when_cancelled():
+    """Test that a cancelled waiter does not use up a token."""
+    bucket = TokenBucket(rate=10, burst=1)
+
+    async def scenario():
+        await bucket.acquire()
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return bucket.reserve()
+
+    # Only the refill time of one token remains to be waited for
+    assert run_async(scenario()) < 0.1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test the closed, open and half-open states of the breaker.
+
+    The breaker opens at the failure threshold, lets a single trial call
+    through after the cooldown, and closes again when the trial succeeds.
+    """
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one trial at a time
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.retry_in() == 0
+
+
+def test_circuit_breaker_failed_trial_reopens():
+    """Test that a failed trial call opens the breaker for another cooldown."""
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert not breaker.allow()
+    assert breaker.retry_in() > 0
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("120", 120.0),  # Delay in seconds
+        (None, None),  # Header absent
+        ("soon", None),  # Invalid value
+    ],
+)
+def test_parse_retry_after(value, expected):
+    """Test parsing of Retry-After delays.
+
+    Args:
+        value: The header value
+        expected: The expected delay in seconds
+    """
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    """Test that an HTTP-date Retry-After is converted to a delay."""
+    delay = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+
+    assert 28 <= delay <= 31
+
+
+def test_backoff_delay():
+    """Test that backoff grows exponentially and honors Retry-After.
+
+    The jittered delay stays within the exponential bound and the cap,
+    while a Retry-After sets the minimum, up to RETRY_AFTER_MAX.
+    """
+    for attempt in range(1, 8):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=4.0) <= min(4.0, 0.5 * 2 ** (attempt - 1))
+
+    assert backoff_delay(1, base=0.5, cap=4.0, retry_after=3.0) >= 3.0
+    with patch("resilience.RETRY_AFTER_MAX", 10.0):
+        assert backoff_delay(1, base=0.5, cap=4.0, retry_after=3600) == 10.0
@@ -7,9 +7,26 @@ and handles various response scenarios.
 """
 
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import asyncio
-from services import search_web, fetch_url, search_documentation
+import time
+import services
+from tracing import metrics
+from services import (
+    search_web,
+    fetch_url,
+    fetch_all,
+    find_result_urls,
+    search_documentation,
+    get_http_client,
+    close_http_client,
+    warm_up,
+    search_queue_depth,
+    shutdown_search_executor,
+    SearchUnavailableError,
+)
+from resilience import CircuitBreaker
+import threading
 import httpx
 
 
@@ -34,6 +51,35 @@ def run_async(coroutine):
         loop.close()
 
 
+def mock_stream_response(body="", status_code=200, headers=None, chunk_size=None):
+    """Builds a mock streamed HTTP response for client.stream().
+
+    Args:
+        body: The response body text
+        status_code: The HTTP status code
+        headers: The response headers
+        chunk_size: Split the UTF-8 encoded body into chunks of this many bytes
+
+    Returns:
+        A MagicMock usable as the async context manager returned by stream()
+    """
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.encoding = "utf-8"
+    data = body.encode("utf-8")
+
+    async def aiter_bytes():
+        size = chunk_size or max(len(data), 1)
+        for start in range(0, len(data), size):
+            yield data[start : start + size]
+
+    response.aiter_bytes = aiter_bytes
+    stream = MagicMock()
+    stream.__aenter__.return_value = response
+    return stream
+
+
 def test_search_web():
     """Test web search functionality using DuckDuckGo.
 
@@ -52,6 +98,217 @@ def test_search_web():
         mock_ddgs.return_value.text.assert_called_once_with("test query", max_results=2)
 
 
+def test_search_web_writes_nothing_to_stdout(capsys):
+    """Test that searching never writes to stdout.
+
+    stdout carries the stdio MCP transport, so diagnostics must go to
+    stderr only.
+    """
+    with patch("services.DDGS") as mock_ddgs:
+        mock_ddgs.return_value.text.return_value = [{"href": "http://test1.com"}]
+        run_async(search_web("quiet query"))
+
+    assert capsys.readouterr().out == ""
+
+
+def test_search_web_memoized():
+    """Test that repeated equivalent searches reuse the cached result.
+
+    Queries differing only in case and whitespace must hit DuckDuckGo
+    once, and later callers get their own copy of the result list.
+    """
+    mock_results = [{"href": "http://test1.com"}]
+
+    with patch("services.DDGS") as mock_ddgs:
+        mock_ddgs.return_value.text.return_value = mock_results
+        first = run_async(search_web("Test  Query"))
+        first.append("http://mutated.com")
+        second = run_async(search_web("test query"))
+
+    assert second == ["http://test1.com"]
+    mock_ddgs.return_value.text.assert_called_once()
+
+
+def test_search_web_collapses_concurrent_calls():
+    """Test that concurrent identical searches share one request.
+
+    Several callers asking for the same query at the same time must be
+    served by a single DuckDuckGo call.
+    """
+    mock_results = [{"href": "http://test1.com"}]
+
+    async def scenario():
+        return await asyncio.gather(*(search_web("same query") for _ in range(5)))
+
+    with patch("services.DDGS") as mock_ddgs:
+        mock_ddgs.return_value.text.side_effect = lambda *a, **k: (
+            time.sleep(0.05) or mock_results
+        )
+        results = run_async(scenario())
+
+    assert results == [["http://test1.com"]] * 5
+    mock_ddgs.return_value.text.assert_called_once()
+
+
+def test_search_web_retries_errors():
+    """Test that a failed search is retried with backoff.
+
+    A transient provider error must be retried instead of being returned
+    as an empty result.
+    """
+    with (
+        patch("services.DDGS") as mock_ddgs,
+        patch("services.RETRY_BASE_DELAY", 0.01),
+    ):
+        mock_ddgs.return_value.text.side_effect = [
+            RuntimeError("rate limited"),
+            [{"href": "http://test1.com"}],
+        ]
+        results = run_async(search_web("flaky query"))
+
+    assert results == ["http://test1.com"]
+    assert mock_ddgs.return_value.text.call_count == 2
+
+
+def test_search_web_errors_not_cached():
+    """Test that a search failing on every attempt raises and is not cached.
+
+    The next call must search again instead of serving a cached miss.
+    """
+    with (
+        patch("services.DDGS") as mock_ddgs,
+        patch("services.RETRY_BASE_DELAY", 0.01),
+        patch("services.RETRY_MAX_ATTEMPTS", 2),
+    ):
+        mock_ddgs.return_value.text.side_effect = [
+            RuntimeError("rate limited"),
+            RuntimeError("rate limited"),
+            [{"href": "http://test1.com"}],
+        ]
+        with pytest.raises(SearchUnavailableError):
+            run_async(search_web("flaky query"))
+        second = run_async(search_web("flaky query"))
+
+    assert second == ["http://test1.com"]
+
+
+def test_search_circuit_breaker_skips_failing_provider():
+    """Test that repeated search failures stop calls to the provider.
+
+    Once the breaker has opened, searches fail immediately without
+    calling DuckDuckGo, and documentation searches report the outage
+    instead of trying the remaining strategies.
+    """
+    with (
+        patch("services.DDGS") as mock_ddgs,
+        patch("services.RETRY_BASE_DELAY", 0.0),
+        patch("services.RETRY_MAX_ATTEMPTS", 1),
+        patch("services._search_breaker", CircuitBreaker(2, 60)),
+    ):
+        mock_ddgs.return_value.text.side_effect = RuntimeError("rate limited")
+        for query in ("first", "second"):
+            with pytest.raises(SearchUnavailableError):
+                run_async(search_web(query))
+        calls = mock_ddgs.return_value.text.call_count
+        result = run_async(search_documentation("third", "http://test.com"))
+
+    assert calls == 2
+    assert mock_ddgs.return_value.text.call_count == 2
+    assert result.startswith("❌ Search unavailable: search provider is failing")
+
+
+def test_search_web_runs_on_dedicated_executor():
+    """Test that searches run on the search thread pool, not the default one.
+
+    The queue-depth metric must count the running search and return to
+    zero once it has finished.
+    """
+    thread_names = []
+    depths = []
+
+    def fake_text(*args, **kwargs):
+        thread_names.append(threading.current_thread().name)
+        depths.append(search_queue_depth())
+        return [{"href": "http://test1.com"}]
+
+    with patch("services.DDGS") as mock_ddgs:
+        mock_ddgs.return_value.text.side_effect = fake_text
+        run_async(search_web("executor query"))
+
+    assert thread_names[0].startswith("search")
+    assert depths == [1]
+    assert search_queue_depth() == 0
+
+
+def test_search_web_timeout():
+    """Test that a search exceeding SEARCH_TIMEOUT is abandoned.
+
+    The caller gets an error quickly, the search is not retried, and the
+    timeout is not cached as a negative result.
+    """
+    release = threading.Event()
+
+    def slow_text(*args, **kwargs):
+        release.wait(5)
+        return [{"href": "http://late.com"}]
+
+    with (
+        patch("services.DDGS") as mock_ddgs,
+        patch("services.SEARCH_TIMEOUT", 0.05),
+    ):
+        mock_ddgs.return_value.text.side_effect = slow_text
+        start = time.perf_counter()
+        with pytest.raises(SearchUnavailableError):
+            run_async(search_web("slow query"))
+        elapsed = time.perf_counter() - start
+        release.set()
+
+    from cache import get_search_cache, normalize_search_key
+
+    mock_ddgs.return_value.text.assert_called_once()
+    assert elapsed < 1
+    assert get_search_cache().get(normalize_search_key("slow query", 2)) is None
+
+
+def test_queued_search_cancelled():
+    """Test that cancelling a caller drops its search if not yet started.
+
+    With a single worker busy, a second search waits in the queue; when
+    its caller is cancelled, the queued search must never run.
+    """
+    release = threading.Event()
+    started = []
+
+    def fake_text(query, **kwargs):
+        started.append(query)
+        release.wait(5)
+        return []
+
+    async def scenario():
+        busy = asyncio.create_task(search_web("first query"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(search_web("second query"))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        await busy
+
+    shutdown_search_executor()
+    try:
+        with (
+            patch("services.DDGS") as mock_ddgs,
+            patch("services.SEARCH_EXECUTOR_WORKERS", 1),
+        ):
+            mock_ddgs.return_value.text.side_effect = fake_text
+            run_async(scenario())
+    finally:
+        shutdown_search_executor()
+
+    assert started == ["first query"]
+
+
 def test_fetch_url_success():
     """Test successful URL content fetching.
 
@@ -60,17 +317,143 @@ def test_fetch_url_success():
     - Processes the HTML response
     - Extracts and returns the text content
     """
-    mock_response = AsyncMock()
-    mock_response.text = "<html><body>Test content</body></html>"
+    mock_response = mock_stream_response("<html><body>Test content</body></html>")
 
-    with patch("services.httpx.AsyncClient") as mock_client:
-        mock_client.return_value.__aenter__.return_value.get.return_value = (
-            mock_response
-        )
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = mock_response
         content = run_async(fetch_url("http://test.com"))
 
         assert "Test content" in content
-        mock_client.return_value.__aenter__.return_value.get.assert_called_once()
+        mock_get_client.return_value.stream.assert_called_once()
+
+
+def test_fetch_url_embeds_new_pages_in_background():
+    """Test that embedding a cached page does not delay the fetch.
+
+    The embedding is blocked until the fetch has returned; it must then
+    still complete and be awaitable before the vector store is closed.
+    """
+    release = threading.Event()
+    embedded = []
+
+    def slow_index(library, url, content):
+        release.wait(5)
+        embedded.append(url)
+
+    async def scenario():
+        with patch("services.get_http_client") as mock_get_client:
+            mock_get_client.return_value.stream.return_value = mock_stream_response(
+                "<main><p>Embedded text</p></main>"
+            )
+            content = await fetch_url("https://nextjs.org/docs/app")
+        returned_before_embedding = not embedded
+        release.set()
+        await services.wait_for_embeddings()
+        return content, returned_before_embedding
+
+    with patch("services.get_vector_store", return_value=object()), patch(
+        "services.index_page_vectors", side_effect=slow_index
+    ):
+        content, returned_before_embedding = run_async(scenario())
+
+    assert "Embedded text" in content
+    assert returned_before_embedding
+    assert embedded == ["https://nextjs.org/docs/app"]
+
+
+def test_fetch_url_coalesces_concurrent_fetches():
+    """Test that concurrent fetches of the same page share one download.
+
+    Several queries of a batch can find the same page; it must be
+    downloaded only once and every caller must get its content.
+    """
+    mock_response = mock_stream_response("<html><body>Shared page</body></html>")
+
+    async def fetch_twice():
+        return await asyncio.gather(
+            fetch_url("http://test.com/shared"), fetch_url("http://test.com/shared")
+        )
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = mock_response
+        first, second = run_async(fetch_twice())
+
+    assert first == second
+    assert "Shared page" in first
+    mock_get_client.return_value.stream.assert_called_once()
+
+
+def mock_error_response(status_code, headers=None):
+    """Builds a mock streamed response whose status check fails.
+
+    Args:
+        status_code: The HTTP error status
+        headers: The response headers
+
+    Returns:
+        A MagicMock usable as the async context manager returned by stream()
+    """
+    stream = mock_stream_response(status_code=status_code, headers=headers)
+    response = stream.__aenter__.return_value
+    response.raise_for_status.side_effect = httpx.HTTPStatusError(
+        f"{status_code} error",
+        request=httpx.Request("GET", "http://test.com"),
+        response=response,
+    )
+    return stream
+
+
+def test_fetch_url_retries_with_retry_after():
+    """Test that throttled fetches are retried after the server's Retry-After.
+
+    A 503 answer must be retried, waiting at least as long as the server
+    asked, and the retried page returned.
+    """
+    responses = [
+        mock_error_response(503, {"Retry-After": "2"}),
+        mock_stream_response("<html><body>Recovered</body></html>"),
+    ]
+
+    with (
+        patch("services.get_http_client") as mock_get_client,
+        patch("services.backoff_delay", return_value=0.0) as mock_backoff,
+    ):
+        mock_get_client.return_value.stream.side_effect = responses
+        content = run_async(fetch_url("http://test.com/throttled"))
+
+    assert "Recovered" in content
+    assert mock_get_client.return_value.stream.call_count == 2
+    assert mock_backoff.call_args.args[3] == 2.0
+
+
+def test_fetch_url_does_not_retry_client_errors():
+    """Test that a 404 is reported at once instead of being retried."""
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = mock_error_response(404)
+        content = run_async(fetch_url("http://test.com/missing"))
+
+    assert content.startswith("❌ HTTP error")
+    mock_get_client.return_value.stream.assert_called_once()
+
+
+def test_fetch_url_skips_failing_host():
+    """Test that a host whose breaker is open is not contacted.
+
+    After enough server errors the host is skipped for the cooldown, so
+    other pages on it fail fast instead of adding load.
+    """
+    with (
+        patch("services.get_http_client") as mock_get_client,
+        patch("services.RETRY_MAX_ATTEMPTS", 1),
+        patch("services.BREAKER_FAILURE_THRESHOLD", 2),
+    ):
+        mock_get_client.return_value.stream.return_value = mock_error_response(500)
+        run_async(fetch_url("http://down.com/a"))
+        run_async(fetch_url("http://down.com/b"))
+        skipped = run_async(fetch_url("http://down.com/c"))
+
+    assert skipped.startswith("❌ Skipped: down.com is failing")
+    assert mock_get_client.return_value.stream.call_count == 2
 
 
 def test_fetch_url_timeout():
@@ -80,15 +463,485 @@ def test_fetch_url_timeout():
     timeout errors by returning an appropriate error message rather
     than failing with an exception.
     """
-    with patch("services.httpx.AsyncClient") as mock_client:
-        mock_client.return_value.__aenter__.return_value.get.side_effect = (
-            httpx.TimeoutException("Connection timed out")
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.side_effect = httpx.TimeoutException(
+            "Connection timed out"
         )
 
         content = run_async(fetch_url("http://test.com"))
         assert "❌ Timeout error" in content
 
 
+def test_fetch_url_streams_and_strips_noise():
+    """Test that chunked responses are parsed incrementally.
+
+    The body arrives in small chunks that split tags; navigation and
+    script content must be dropped while headings and code are kept.
+    """
+    body = (
+        "<html><body><nav>Site menu</nav><main><h2>Install</h2>"
+        "<pre>npm install next</pre><script>track()</script></main>"
+        "<footer>Copyright</footer></body></html>"
+    )
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = mock_stream_response(
+            body, chunk_size=5
+        )
+        content = run_async(fetch_url("http://test.com/install"))
+
+    assert "## Install" in content
+    assert "npm install next" in content
+    assert "Site menu" not in content
+    assert "track()" not in content
+    assert "Copyright" not in content
+
+
+def test_fetch_url_stops_at_budget():
+    """Test that streaming stops once the character budget is met.
+
+    Later chunks must not be read, the result must fit the budget, and
+    the partial page must be cached as partial: it answers requests for at
+    most as much text, while larger requests fetch the page again.
+    """
+    from cache import get_page_cache
+
+    chunks_read = []
+    response = mock_stream_response()
+
+    async def aiter_bytes():
+        yield b"<main>"
+        for index in range(100):
+            chunks_read.append(index)
+            yield f"<p>{'x' * 100}</p>".encode()
+
+    response.__aenter__.return_value.aiter_bytes = aiter_bytes
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = response
+        content = run_async(fetch_url("http://test.com/big", max_chars=250))
+        first_read = len(chunks_read)
+        smaller = run_async(fetch_url("http://test.com/big", max_chars=200))
+        fetches_after_smaller = mock_get_client.return_value.stream.call_count
+        run_async(fetch_url("http://test.com/big"))
+
+    assert len(content) <= 250
+    assert first_read < 10
+    assert smaller == content[:200]
+    assert fetches_after_smaller == 1
+    assert mock_get_client.return_value.stream.call_count == 2
+    assert not get_page_cache().get("http://test.com/big").partial
+
+
+def test_fetch_url_budget_ignores_sidebar_before_main():
+    """Test that a long sidebar does not stop the download before <main>."""
+    body = f"<body><div>{'Menu entry ' * 100}</div><main><p>Body text</p></main></body>"
+    response = mock_stream_response(body, chunk_size=64)
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = response
+        content = run_async(fetch_url("http://test.com/sidebar", max_chars=200))
+
+    assert content == "Body text"
+
+
+def test_fetch_url_partial_page_answers_same_budget_again():
+    """Test that a page cut off at the budget is not fetched again for it.
+
+    Indentation and blank lines count while the page streams in but are
+    removed from the cached text, which ends up shorter than the budget.
+    """
+    block = "<div>\n  <div>\n    <div>\n      <p>word</p>\n    </div>\n  </div>\n</div>\n"
+    response = mock_stream_response("<main>" + block * 2000, chunk_size=4096)
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = response
+        first = run_async(fetch_url("http://test.com/spaced", max_chars=2000))
+        second = run_async(fetch_url("http://test.com/spaced", max_chars=2000))
+
+    assert len(first) < 2000
+    assert second == first
+    assert mock_get_client.return_value.stream.call_count == 1
+
+
+def test_fetch_url_keeps_markdown_lines():
+    """Test that Markdown is not parsed as HTML, which would join its lines."""
+    body = "# Routing\r\n\r\nFolders map to routes.\r\n\r\n\r\n\r\n- app/page.tsx\r\n- app/blog/page.tsx\r\n"
+    response = mock_stream_response(
+        body, headers={"Content-Type": "text/markdown; charset=utf-8"}, chunk_size=10
+    )
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = response
+        content = run_async(fetch_url("http://test.com/routing.md"))
+
+    assert content == (
+        "# Routing\n\nFolders map to routes.\n\n- app/page.tsx\n- app/blog/page.tsx"
+    )
+
+
+def test_fetch_url_skips_non_html_content_type():
+    """Test that binary responses are abandoned before their body is read."""
+    response = mock_stream_response(
+        "%PDF-1.7 ...", headers={"Content-Type": "application/pdf"}
+    )
+    body_read = []
+
+    async def aiter_bytes():
+        body_read.append(True)
+        yield b"%PDF-1.7"
+
+    response.__aenter__.return_value.aiter_bytes = aiter_bytes
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = response
+        content = run_async(fetch_url("http://test.com/manual.pdf"))
+
+    assert content == "❌ Unsupported content type: application/pdf"
+    assert body_read == []
+
+
+def test_fetch_url_caps_response_bytes():
+    """Test that reading stops at MAX_RESPONSE_BYTES and the page says so.
+
+    The cut-off page is still cached, since fetching it again would stop
+    at the same place.
+    """
+    from cache import get_page_cache
+
+    body = "<html><body>" + "<p>héllo wörld</p>" * 1000 + "</body></html>"
+    response = mock_stream_response(
+        body, headers={"Content-Type": "text/html; charset=utf-8"}, chunk_size=7
+    )
+
+    with (
+        patch("services.MAX_RESPONSE_BYTES", 2048),
+        patch("services.get_http_client") as mock_get_client,
+    ):
+        mock_get_client.return_value.stream.return_value = response
+        content = run_async(fetch_url("http://test.com/huge"))
+
+    text, notice = content.rsplit("\n\n", 1)
+    assert notice == "[Truncated: only the first 2 KB of this page were read]"
+    assert "héllo wörld" in text and "\ufffd" not in text
+    assert len(text) < 2048
+    assert get_page_cache().get("http://test.com/huge").content == content
+
+
+def test_fetch_url_decompresses_gzip():
+    """Test that a gzip-encoded page is decompressed before extraction."""
+    import gzip
+
+    def handler(request):
+        assert "gzip" in request.headers["Accept-Encoding"]
+        return httpx.Response(
+            200,
+            headers={"Content-Type": "text/html", "Content-Encoding": "gzip"},
+            content=gzip.compress(b"<html><body><p>Compressed docs</p></body></html>"),
+        )
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            with patch("services.get_http_client", return_value=client):
+                return await fetch_url("http://test.com/gzipped")
+
+    assert "Compressed docs" in run_async(scenario())
+
+
+def test_get_http_client_is_shared():
+    """Test that the HTTP client is reused across calls.
+
+    This test verifies that get_http_client returns the same pooled client
+    within an event loop, and that close_http_client releases it so the
+    next call creates a fresh one.
+    """
+
+    async def scenario():
+        first = get_http_client()
+        second = get_http_client()
+        await close_http_client()
+        third = get_http_client()
+        await close_http_client()
+        return first, second, third
+
+    first, second, third = run_async(scenario())
+
+    assert first is second
+    assert first.is_closed
+    assert third is not first
+
+
+def test_get_http_client_per_event_loop():
+    """Test that a new client is created when the event loop changes.
+
+    Pooled connections are bound to the loop that opened them, so a client
+    created on one loop must not be reused from another.
+    """
+
+    async def get_client():
+        return get_http_client()
+
+    first = run_async(get_client())
+    second = run_async(get_client())
+
+    assert first is not second
+    run_async(close_http_client())
+
+
+def test_warm_up_opens_http_client():
+    """Test that warming up loads the search client and opens the HTTP client."""
+    import services
+
+    async def scenario():
+        await warm_up(delay=0)
+        client = services._http_client
+        await close_http_client()
+        return client
+
+    with patch("services.DDGS", None):
+        client = run_async(scenario())
+        loaded = services.DDGS
+
+    assert client is not None and client.is_closed
+    assert loaded is not None
+
+
+def test_fetch_url_served_from_cache():
+    """Test that repeat fetches of a fresh page make no network call.
+
+    The first fetch stores the extracted text in the page cache; the
+    second fetch of the same URL must be answered from the cache.
+    """
+    mock_response = mock_stream_response(
+        "<html><body>Cached content</body></html>", headers={"ETag": '"v1"'}
+    )
+
+    with patch("services.get_http_client") as mock_get_client:
+        mock_get_client.return_value.stream.return_value = mock_response
+        first = run_async(fetch_url("https://nextjs.org/docs/page"))
+        second = run_async(fetch_url("https://nextjs.org/docs/page"))
+
+    assert first == second
+    assert "Cached content" in second
+    mock_get_client.return_value.stream.assert_called_once()
+    counters = {
+        counter["labels"].get("result"): counter["value"]
+        for counter in metrics.snapshot()["counters"]
+        if counter["name"] == "page_cache"
+    }
+    assert counters["hit"] >= 1 and counters["miss"] >= 1
+
+
+def test_fetch_url_revalidates_stale_page():
+    """Test conditional revalidation of a stale cached page.
+
+    A stale entry must be revalidated with If-None-Match, and a 304
+    response must reuse the cached text instead of re-parsing.
+    """
+    from cache import get_page_cache
+
+    get_page_cache().put("http://test.com/page", "Old content", etag='"v1"')
+    not_modified = mock_stream_response(status_code=304)
+
+    with (
+        patch("cache.PAGE_CACHE_DEFAULT_TTL", 0),
+        patch("services.get_http_client") as mock_get_client,
+    ):
+        mock_get_client.return_value.stream.return_value = not_modified
+        content = run_async(fetch_url("http://test.com/page"))
+
+    assert content == "Old content"
+    _, kwargs = mock_get_client.return_value.stream.call_args
+    assert kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_fetch_all_preserves_order():
+    """Test that concurrent fetching keeps the order of the input URLs.
+
+    Pages that finish first must not be moved ahead of earlier results,
+    and the total time should track the slowest page rather than the sum.
+    """
+    delays = {"http://a.com": 0.2, "http://b.com": 0.0, "http://c.com": 0.1}
+
+    async def fake_fetch(url):
+        await asyncio.sleep(delays[url])
+        return f"content of {url}"
+
+    with patch("services.fetch_url", side_effect=fake_fetch):
+        start = time.perf_counter()
+        results = run_async(fetch_all(list(delays)))
+        elapsed = time.perf_counter() - start
+
+    assert results == [f"content of {url}" for url in delays]
+    assert elapsed < sum(delays.values())
+
+
+def test_fetch_all_deadline():
+    """Test that pages exceeding the deadline are cancelled.
+
+    A slow page must be reported as a timeout while the pages that
+    finished in time are still returned.
+    """
+
+    async def fake_fetch(url):
+        if url == "http://slow.com":
+            await asyncio.sleep(10)
+        return f"content of {url}"
+
+    with (
+        patch("services.fetch_url", side_effect=fake_fetch),
+        patch("services.FETCH_DEADLINE", 0.1),
+    ):
+        results = run_async(fetch_all(["http://slow.com", "http://fast.com"]))
+
+    assert results[0].startswith("❌ Timeout error")
+    assert results[1] == "content of http://fast.com"
+
+
+def test_fetch_all_stops_when_budget_met():
+    """Test that pending fetches are cancelled once the budget is filled.
+
+    When the first pages in result order already provide enough text,
+    slower later pages are skipped instead of awaited.
+    """
+
+    async def fake_fetch(url, max_chars=None):
+        if url == "http://slow.com":
+            await asyncio.sleep(10)
+        return "y" * 100
+
+    with patch("services.fetch_url", side_effect=fake_fetch):
+        start = time.perf_counter()
+        urls = ["http://fast.com", "http://slow.com"]
+        results = run_async(fetch_all(urls, max_chars=50))
+        elapsed = time.perf_counter() - start
+
+    assert results[0] == "y" * 100
+    assert results[1].startswith("❌ Skipped")
+    assert elapsed < 5
+
+
+def test_fetch_all_reports_pages_as_they_finish():
+    """Test that on_page sees each page as soon as it is fetched.
+
+    Pages are reported in completion order, and pages cancelled by the
+    deadline are reported with their error message at the end.
+    """
+    delays = {"http://a.com": 0.1, "http://b.com": 0.0, "http://slow.com": 10}
+    reported = []
+
+    async def fake_fetch(url):
+        await asyncio.sleep(delays[url])
+        return f"content of {url}"
+
+    async def on_page(url, content):
+        reported.append((url, content))
+
+    with (
+        patch("services.fetch_url", side_effect=fake_fetch),
+        patch("services.FETCH_DEADLINE", 0.3),
+    ):
+        run_async(fetch_all(list(delays), on_page=on_page))
+
+    assert [url for url, _ in reported] == ["http://b.com", "http://a.com", "http://slow.com"]
+    assert reported[0][1] == "content of http://b.com"
+    assert reported[2][1].startswith("❌ Timeout error")
+
+
+def test_fetch_all_reports_cancelled_fetches_as_errors():
+    """Test that a fetch cancelled elsewhere becomes an error, not an exception.
+
+    A shared download can be cancelled by another caller; the other pages
+    must still be returned.
+    """
+
+    async def fake_fetch(url):
+        if url == "http://cancelled.com":
+            raise asyncio.CancelledError()
+        return f"content of {url}"
+
+    reported = []
+
+    async def on_page(url, content):
+        reported.append(url)
+
+    with patch("services.fetch_url", side_effect=fake_fetch):
+        urls = ["http://cancelled.com", "http://ok.com"]
+        results = run_async(fetch_all(urls, on_page=on_page))
+
+    assert results[0].startswith("❌ Cancelled")
+    assert results[1] == "content of http://ok.com"
+    assert sorted(reported) == sorted(urls)
+
+
+def test_fetch_all_cancels_pending_fetches_when_on_page_fails():
+    """Test that an error in on_page does not leave fetches running."""
+    cancelled = []
+
+    async def fake_fetch(url):
+        if url == "http://slow.com":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+        return f"content of {url}"
+
+    async def on_page(url, content):
+        raise RuntimeError("client went away")
+
+    with patch("services.fetch_url", side_effect=fake_fetch):
+        with pytest.raises(RuntimeError):
+            run_async(fetch_all(["http://fast.com", "http://slow.com"], on_page=on_page))
+
+    assert cancelled == ["http://slow.com"]
+
+
+def test_search_documentation_respects_budget():
+    """Test that the combined output is cut to max_chars."""
+    with (
+        patch("services.find_result_urls", new_callable=AsyncMock) as mock_find,
+        patch("services.fetch_url", new_callable=AsyncMock) as mock_fetch,
+    ):
+        mock_find.return_value = ["http://a.com", "http://b.com"]
+        mock_fetch.return_value = "z" * 80
+
+        result = run_async(search_documentation("q", "http://a.com", max_chars=100))
+
+    assert len(result) == 100
+    # Ranked pages are read beyond the output budget
+    mock_fetch.assert_called_with("http://b.com", max_chars=100 * services.PASSAGE_READ_FACTOR)
+
+
+def test_search_documentation_ranks_text_beyond_the_output_budget():
+    """Test that ranking sees more of a page than the output holds.
+
+    The passage answering the query sits past the first max_chars of the
+    page and must still be returned, within max_chars.
+    """
+    filler = "".join(f"# Topic {n}\n\n{'Unrelated prose. ' * 20}\n\n" for n in range(5))
+    page = filler + "# Middleware\n\nMiddleware runs before a request is completed."
+    fetched = []
+
+    async def fake_fetch(url, max_chars=None):
+        fetched.append(max_chars)
+        return page[:max_chars]
+
+    with (
+        patch("services.find_result_urls", new_callable=AsyncMock) as mock_find,
+        patch("services.fetch_url", side_effect=fake_fetch),
+    ):
+        mock_find.return_value = ["http://a.com/docs"]
+        result = run_async(
+            search_documentation("middleware request", "http://a.com", max_chars=1000)
+        )
+
+    assert len(page) > 1000
+    assert fetched == [1000 * services.PASSAGE_READ_FACTOR]
+    assert "Middleware runs before a request" in result
+    assert len(result) <= 1000
+
+
 def test_search_documentation():
     """Test documentation search integration.
 
@@ -112,10 +965,93 @@ def test_search_documentation():
         result = run_async(search_documentation("test query", "http://test.com"))
 
         assert mock_content in result
-        mock_search.assert_called_once_with("site:http://test.com test query")
+        mock_search.assert_called_once_with("site:http://test.com test query", 2)
         mock_fetch.assert_called_once_with("http://test.com/docs")
 
 
+def test_search_documentation_drops_duplicates():
+    """Test that duplicated results are fetched and returned only once.
+
+    Two spellings of one URL must be fetched once, and a mirror page with
+    the same text must not repeat its passage in the answer.
+    """
+    text = (
+        "Middleware runs before a request is completed and can rewrite, redirect "
+        "or modify the response headers of the incoming request."
+    )
+    pages = {
+        "http://test.com/docs/middleware": f"# Middleware\n\n{text}",
+        "http://test.com/mirror/middleware": f"# Middleware\n\n{text}",
+    }
+
+    async def fake_fetch(url, max_chars=None):
+        return pages[url.rstrip("/")]
+
+    with (
+        patch(
+            "services.search_web",
+            new_callable=AsyncMock,
+            return_value=[
+                "http://test.com/docs/middleware/?ref=search",
+                "http://test.com/docs/middleware",
+                "http://test.com/mirror/middleware",
+            ],
+        ),
+        patch("services.fetch_url", side_effect=fake_fetch) as mock_fetch,
+    ):
+        result = run_async(
+            search_documentation("middleware", "http://test.com", max_results=3)
+        )
+
+    fetched = [args[0] for args, _ in mock_fetch.call_args_list]
+    assert fetched == [
+        "http://test.com/docs/middleware/",
+        "http://test.com/mirror/middleware",
+    ]
+    assert result.count("Middleware runs before") == 1
+
+
+def test_drop_duplicate_urls_skips_known_duplicates():
+    """Test that a page known from the cache to be a duplicate is not fetched."""
+    from cache import get_page_cache
+
+    page_cache = get_page_cache()
+    page_cache.put("http://test.com/v1/page", "Text", fingerprints=(0b1011, [0b1011]))
+    page_cache.put("http://test.com/v2/page", "Text", fingerprints=(0b1010, [0b1010]))
+
+    urls = services.drop_duplicate_urls(
+        ["http://test.com/v2/page", "http://test.com/v1/page", "http://test.com/other"]
+    )
+
+    assert urls == ["http://test.com/v2/page", "http://test.com/other"]
+
+
+def test_search_documentation_ranks_passages():
+    """Test that only query-relevant passages are returned with sources.
+
+    Of two fetched pages, only the passage matching the query should be
+    returned, followed by the URL it came from.
+    """
+    pages = {
+        "http://test.com/a": "# Install\n\nRun npm install.",
+        "http://test.com/b": "# Deploy\n\nDeploy to production with vercel.",
+    }
+
+    async def fake_fetch(url, **kwargs):
+        return pages[url]
+
+    with (
+        patch("services.find_result_urls", new_callable=AsyncMock) as mock_find,
+        patch("services.fetch_url", side_effect=fake_fetch),
+    ):
+        mock_find.return_value = list(pages)
+        result = run_async(search_documentation("deploy production", "http://test.com"))
+
+    assert "Deploy to production" in result
+    assert "Source: http://test.com/b" in result
+    assert "npm install" not in result
+
+
 def test_search_documentation_no_results():
     """Test documentation search with no results.
 
@@ -128,3 +1064,186 @@ def test_search_documentation_no_results():
 
         result = run_async(search_documentation("test query", "http://test.com"))
         assert "❌ No results found" in result
+
+
+def test_find_result_urls_race_mode():
+    """Test that race mode returns the first useful strategy answer.
+
+    Strategies run concurrently; the fastest non-empty result wins, slower
+    strategies are cancelled, and the winner is remembered for the site.
+    """
+    cancelled = []
+
+    async def fake_search(search_query, max_results=2):
+        if search_query.startswith("site:"):
+            return []
+        if "site:" in search_query:
+            await asyncio.sleep(0.01)
+            return ["http://race.com/docs/a"]
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(search_query)
+            raise
+        return ["http://race.com/docs/slow"]
+
+    with (
+        patch("services.search_web", side_effect=fake_search),
+        patch("services.SEARCH_STRATEGY_MODE", "race"),
+        patch.dict("services._preferred_strategies", clear=True),
+    ):
+        urls = run_async(find_result_urls("query", "http://race.com"))
+        preferred = dict(services._preferred_strategies)
+
+    assert urls == ["http://race.com/docs/a"]
+    assert len(cancelled) == 2
+    assert preferred == {"http://race.com": "site_bare"}
+
+
+def test_find_result_urls_merge_mode():
+    """Test that merge mode combines and deduplicates strategy results.
+
+    URLs returned by several strategies appear once, in strategy priority
+    order, and general-search results from other domains are dropped.
+    """
+    responses = {
+        "site:http://merge.com query": ["http://merge.com/a"],
+        "query site:merge.com": ["http://merge.com/a", "http://merge.com/b"],
+        "query http://merge.com": [],
+        "query documentation": ["http://other.com/x"],
+    }
+
+    async def fake_search(search_query, max_results=2):
+        return responses[search_query]
+
+    with (
+        patch("services.search_web", side_effect=fake_search),
+        patch("services.SEARCH_STRATEGY_MODE", "merge"),
+        patch.dict("services._preferred_strategies", clear=True),
+    ):
+        urls = run_async(find_result_urls("query", "http://merge.com"))
+
+    assert urls == ["http://merge.com/a", "http://merge.com/b"]
+
+
+def test_find_result_urls_prefers_previous_winner():
+    """Test that the strategy that last won for a site is tried first.
+
+    After a site has been answered by the general search, the next
+    sequential query should start with that strategy.
+    """
+    with (
+        patch("services.search_web", new_callable=AsyncMock) as mock_search,
+        patch.dict("services._preferred_strategies", {"http://pref.com": "general"}),
+    ):
+        mock_search.return_value = ["http://pref.com/page"]
+        urls = run_async(find_result_urls("query", "http://pref.com"))
+
+    assert urls == ["http://pref.com/page"]
+    mock_search.assert_called_once_with("query documentation", 2)
+
+
+def test_fetch_url_serves_stale_page_while_refreshing():
+    """Test stale-while-revalidate for cached pages.
+
+    With the background refresh running, a stale page must be returned at
+    once, and the refresh job must then replace it with the new version.
+    """
+    from cache import get_page_cache
+
+    get_page_cache().put("http://test.com/page", "Old content", etag='"v1"')
+    updated = mock_stream_response(
+        "<html><body>New content</body></html>", headers={"ETag": '"v2"'}
+    )
+
+    async def scenario():
+        services.start_background_refresh()
+        try:
+            content = await fetch_url("http://test.com/page")
+            while services._refresher.pending():
+                await asyncio.sleep(0.01)
+            return content
+        finally:
+            await services.stop_background_refresh()
+
+    with (
+        patch("cache.PAGE_CACHE_DEFAULT_TTL", 0),
+        patch("services.get_http_client") as mock_get_client,
+    ):
+        mock_get_client.return_value.stream.return_value = updated
+        content = run_async(scenario())
+
+    assert content == "Old content"
+    _, kwargs = mock_get_client.return_value.stream.call_args
+    assert kwargs["headers"] == {"If-None-Match": '"v1"'}
+    assert "New content" in get_page_cache().get("http://test.com/page").content
+
+
+def test_background_refresh_runs_in_one_worker(tmp_path):
+    """Test that with several workers only the lock holder runs the refresh.
+
+    A second open file holding the lock stands in for another worker.
+    """
+    import fcntl
+
+    lock_path = str(tmp_path / "refresh.lock")
+
+    async def scenario():
+        with open(lock_path, "a") as other_worker:
+            fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            assert services.start_background_refresh() is None
+        try:
+            return services.start_background_refresh()
+        finally:
+            await services.stop_background_refresh()
+
+    with (
+        patch("services.REFRESH_SINGLE_WORKER", True),
+        patch("services.REFRESH_LOCK_PATH", lock_path),
+    ):
+        refresher = run_async(scenario())
+
+    assert refresher is not None
+    assert services._refresh_lock is None
+
+
+def test_prewarm_schedules_expiring_popular_pages():
+    """Test that only popular pages that are missing or expiring are refreshed."""
+    from cache import get_page_cache
+
+    page_cache = get_page_cache()
+    page_cache.put("https://nextjs.org/docs/fresh", "Fresh", library="nextjs")
+    for url in ["https://nextjs.org/docs/fresh", "https://nextjs.org/docs/missing"]:
+        page_cache.record_hit(url, "nextjs")
+    refresher = MagicMock()
+    refresher.schedule.return_value = True
+
+    with patch("services._refresher", refresher):
+        scheduled = services.prewarm_popular_pages()
+
+    assert scheduled == 1
+    (key, _), _ = refresher.schedule.call_args
+    assert key == ("page", "https://nextjs.org/docs/missing")
+
+
+def test_search_web_serves_stale_results():
+    """Test that expired search results are served while being refreshed."""
+    from cache import get_search_cache, normalize_search_key
+
+    key = normalize_search_key("stale query", 2)
+    with patch("cache.time.monotonic", return_value=0):
+        get_search_cache().put(key, ["http://a.com"])
+    refresher = MagicMock()
+    refresher.schedule.return_value = True
+
+    with (
+        patch("cache.time.monotonic", return_value=get_search_cache().ttl + 1),
+        patch("services._refresher", refresher),
+        patch("services._submit_search") as mock_submit,
+    ):
+        urls = run_async(search_web("stale query"))
+
+    assert urls == ["http://a.com"]
+    mock_submit.assert_not_called()
+    (job_key, _), _ = refresher.schedule.call_args
+    assert job_key == ("search", key)
@@ -0,0 +1,159 @@
+"""Unit tests for request coalescing in the MCP Documentation Search Server.
+
+This module contains tests for the SingleFlight helper that collapses
+concurrent identical async calls into one in-flight call. These tests verify
+that results and errors are shared and that keys are released afterwards.
+"""
+
+import pytest
+import asyncio
+from singleflight import SingleFlight
+
+
+def run_async(coroutine):
+    """Helper function to run an async function synchronously.
+
+    Args:
+        coroutine: The coroutine to execute
+
+    Returns:
+        The result of the coroutine execution
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_concurrent_calls_share_result():
+    """Test that concurrent calls for one key run the function once."""
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+
+    assert run_async(scenario()) == ["result"] * 3
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_to_all_waiters():
+    """Test that an exception raised by the shared call reaches every waiter."""
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("key", work) for _ in range(2)), return_exceptions=True
+        )
+
+    results = run_async(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_sequential_calls_run_again():
+    """Test that a completed call is not reused for later callers."""
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    assert run_async(flight.do("key", work)) == 1
+    assert run_async(flight.do("key", work)) == 2
+
+
+def test_waiter_cancellation_keeps_shared_call():
+    """Test that cancelling one waiter does not cancel the call for others."""
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert run_async(scenario()) == "result"
+
+
+def test_last_waiter_cancellation_cancels_call():
+    """Test that the shared call is cancelled when nobody awaits it anymore."""
+    flight = SingleFlight()
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        waiter = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+    run_async(scenario())
+    assert cancelled == [True]
+    assert flight.in_flight() == 0
+
+
+def test_caller_after_last_waiter_cancelled_starts_new_call():
+    """Test that a call being cancelled is not joined by a new caller.
+
+    The new caller arrives before the cancelled call has finished and must
+    get its own result rather than the cancellation.
+    """
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fresh():
+        return "fresh"
+
+    async def scenario():
+        waiter = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await flight.do("key", fresh)
+
+    assert run_async(scenario()) == "fresh"
+
+
+def test_running_reports_in_flight_key():
+    """Test that running() is true only while a call for the key is in flight."""
+    flight = SingleFlight()
+
+    async def scenario():
+        task = asyncio.ensure_future(flight.do("key", lambda: asyncio.sleep(0.01)))
+        await asyncio.sleep(0)
+        during = flight.running("key"), flight.running("other")
+        await task
+        return during, flight.running("key")
+
+    assert run_async(scenario()) == ((True, False), False)
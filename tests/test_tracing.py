@@ -0,0 +1,87 @@
+"""Unit tests for timing instrumentation in the MCP Documentation Search Server.
+
+This module contains tests for the stage spans, JSON event output and the
+in-process metrics registry used to find slow stages in production.
+"""
+
+import pytest
+import io
+import json
+import logging
+from tracing import JsonFormatter, Metrics, logger, metrics, span, trace
+
+
+@pytest.fixture
+def events():
+    """Fixture capturing the JSON events emitted by the trace logger.
+
+    Yields:
+        A function returning the events emitted so far as dicts
+    """
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    try:
+        yield lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_span_emits_json_event(events):
+    """Test that a span emits one JSON event with its duration and fields.
+
+    Attributes added while the stage runs must be included in the event.
+    """
+    with span("fetch", url="http://x.com") as attributes:
+        attributes["bytes"] = 123
+
+    (event,) = events()
+    assert event["stage"] == "fetch"
+    assert event["url"] == "http://x.com"
+    assert event["bytes"] == 123
+    assert event["duration_ms"] >= 0
+
+
+def test_spans_share_trace_id(events):
+    """Test that spans inside a trace carry the trace's id."""
+    with trace("get_docs"):
+        with span("search_strategy"):
+            pass
+
+    inner, outer = events()
+    assert inner["trace_id"] == outer["trace_id"] is not None
+
+
+def test_span_records_errors(events):
+    """Test that an exception inside a span is recorded and re-raised."""
+    with pytest.raises(ValueError):
+        with span("parse"):
+            raise ValueError("bad page")
+
+    assert events()[0]["error"] == "ValueError"
+
+
+def test_span_updates_duration_histogram():
+    """Test that spans feed the shared duration metrics."""
+    before = metrics.snapshot()["durations"].get("assemble", {"count": 0})["count"]
+
+    with span("assemble"):
+        pass
+
+    assert metrics.snapshot()["durations"]["assemble"]["count"] == before + 1
+
+
+def test_prometheus_rendering():
+    """Test the Prometheus text export of counters and histograms."""
+    registry = Metrics()
+    registry.increment("page_cache", result="hit")
+    registry.increment("page_cache", result="hit")
+    registry.observe("fetch", 0.02)
+
+    text = registry.render_prometheus()
+
+    assert 'docs_page_cache_total{result="hit"} 2' in text
+    assert 'docs_stage_duration_seconds_bucket{stage="fetch",le="0.01"} 0' in text
+    assert 'docs_stage_duration_seconds_bucket{stage="fetch",le="0.025"} 1' in text
+    assert 'docs_stage_duration_seconds_count{stage="fetch"} 1' in text
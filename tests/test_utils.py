@@ -6,7 +6,15 @@ library names to their documentation URLs works correctly.
 """
 
 import pytest
-from utils import normalize_library_name, validate_library, get_library_url
+from utils import (
+    LibraryResolver,
+    edit_distance,
+    resolve_library,
+    normalize_library_name,
+    validate_library,
+    get_library_url,
+    get_library_for_url,
+)
 from config import DOCS_URLS, LIBRARY_ALIASES
 
 
@@ -97,6 +105,24 @@ def test_get_library_url(input_name: str, expected_url: str):
     assert get_library_url(input_name) == expected_url
 
 
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("https://nextjs.org/docs/app/routing", "nextjs"),  # Page on docs host
+        ("https://TAILWINDCSS.com/docs/flex", "tailwind"),  # Case-insensitive host
+        ("https://example.com/nextjs", None),  # Unknown host
+    ],
+)
+def test_get_library_for_url(url: str, expected: str):
+    """Test mapping page URLs back to their library.
+
+    Args:
+        url: The page URL
+        expected: The expected library name, or None
+    """
+    assert get_library_for_url(url) == expected
+
+
 def test_all_aliases_are_valid():
     """Test that all defined aliases map to valid libraries.
 
@@ -108,4 +134,69 @@ def test_all_aliases_are_valid():
     for alias, library in LIBRARY_ALIASES.items():
         assert (
             library in DOCS_URLS
-        ), f"Alias '{alias}' maps to invalid library '{library}'"
\ No newline at end of file
+        ), f"Alias '{alias}' maps to invalid library '{library}'"
+
+
+@pytest.mark.parametrize(
+    "input_name,expected",
+    [
+        ("next js", "nextjs"),  # Separators are ignored
+        ("Tailwind_CSS", "tailwind"),  # Separators in aliases too
+        ("tailwnd", "tailwind"),  # One missing letter
+        ("nxetjs", "nextjs"),  # Transposed letters
+        ("tailwindccs", "tailwind"),  # Misspelled alias
+        ("mcp-server-thing", None),  # No substring matching
+        ("mpc", None),  # Short names are never fuzzy-matched
+        ("react", None),  # Unrelated library
+    ],
+)
+def test_resolve_library(input_name: str, expected: str):
+    """Test exact, separator-insensitive and fuzzy library resolution.
+
+    Args:
+        input_name: The library name as typed by the caller
+        expected: The expected library name, or None
+    """
+    resolved = resolve_library(input_name)
+    if expected is None:
+        assert resolved is None
+    else:
+        assert resolved == (expected, DOCS_URLS[expected])
+
+
+@pytest.mark.parametrize(
+    "a,b,expected",
+    [
+        ("nextjs", "nextjs", 0),
+        ("nextjs", "nexjs", 1),
+        ("nextjs", "nxetjs", 1),  # A transposition counts as one edit
+        ("tailwind", "tail", 3),  # Capped at limit + 1
+    ],
+)
+def test_edit_distance(a: str, b: str, expected: int):
+    """Test the bounded edit distance used for fuzzy matching.
+
+    Args:
+        a: The first string
+        b: The second string
+        expected: The expected distance with a limit of 2
+    """
+    assert edit_distance(a, b, 2) == expected
+
+
+def test_resolver_memoizes_and_scales():
+    """Test the resolver with a large registry.
+
+    Exact and fuzzy lookups must still find the right library among
+    thousands, and repeated inputs must be answered from the memo.
+    """
+    docs_urls = {f"library{i}": f"https://docs{i}.example.com" for i in range(5000)}
+    resolver = LibraryResolver(docs_urls, {"lib42": "library42"})
+
+    assert resolver.resolve("LIBRARY1234") == ("library1234", "https://docs1234.example.com")
+    assert resolver.resolve("lib42") == ("library42", "https://docs42.example.com")
+    assert resolver.resolve("libary4321") == ("library4321", "https://docs4321.example.com")
+    assert resolver.library_for_url("https://docs7.example.com/page") == "library7"
+
+    resolver.resolve("libary4321")
+    assert resolver._resolve_normalized.cache_info().hits == 1
@@ -0,0 +1,187 @@
+"""Unit tests for local vector retrieval in the MCP Documentation Search Server.
+
+This module contains tests for the feature-hashing embedder and the
+memory-mapped VectorStore that let get_docs answer from passages similar in
+meaning to a query. These tests verify that similar passages rank first,
+that unchanged pages are not embedded twice, that changed pages replace
+their old passages, and that vector retrieval switches itself off without
+NumPy.
+"""
+
+import pytest
+import os
+from unittest.mock import patch
+import vectors
+from vectors import (
+    HashingEmbedder,
+    VectorStore,
+    index_page_vectors,
+    numpy_available,
+    search_vectors,
+)
+
+requires_numpy = pytest.mark.skipif(not numpy_available(), reason="numpy is not installed")
+
+PAGE = """# Middleware
+
+Middleware allows you to run code before a request is completed. Define it in
+middleware.ts in the root of your project.
+
+# Cookies
+
+Read and set cookies with the cookies() function in server components.
+
+# Image optimization
+
+The Image component optimizes pictures automatically, resizing and lazy loading them.
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture providing an empty vector store with the hashing embedder."""
+    store = VectorStore(str(tmp_path / "vectors"), HashingEmbedder(dim=256))
+    yield store
+    store.close()
+
+
+@requires_numpy
+def test_hashing_embedder_normalizes_and_matches_word_forms():
+    """Test that vectors are unit length and related word forms are similar."""
+    import numpy as np
+
+    embedder = HashingEmbedder(dim=256)
+
+    configure, configuration, unrelated, empty = embedder.embed(
+        ["configure the router", "router configuration", "lazy loading images", ""]
+    )
+
+    assert configure.dtype == np.float32
+    assert np.isclose(np.linalg.norm(configure), 1.0)
+    assert configure @ configuration > configure @ unrelated
+    assert not empty.any()
+
+
+@requires_numpy
+def test_search_ranks_similar_passage_first(store):
+    """Test that the passage closest to the query comes first."""
+    store.add_page("nextjs", "https://nextjs.org/docs/app", PAGE)
+
+    hits = store.search("nextjs", "how do I optimize images", top_k=2)
+
+    assert [hit.heading for hit in hits][0] == "Image optimization"
+    assert hits[0].score > hits[1].score
+    assert hits[0].url == "https://nextjs.org/docs/app"
+    assert store.search("tailwind", "optimize images") == []
+    assert store.search("nextjs", "...") == []
+
+
+@requires_numpy
+def test_add_page_skips_unchanged_and_replaces_changed_pages(store):
+    """Test that pages are appended incrementally without stale passages."""
+    url = "https://nextjs.org/docs/app"
+
+    assert store.add_page("nextjs", url, PAGE) == 3
+    assert store.add_page("nextjs", url, PAGE) == 0
+    store.search("nextjs", "cookies")
+    assert store.add_page("nextjs", url, PAGE + "\n# Fonts\n\nLoad web fonts.") == 4
+
+    hits = store.search("nextjs", "middleware", top_k=10)
+
+    # The old copies of the three passages are no longer returned
+    assert len(hits) == 4
+    assert hits[0].heading == "Middleware"
+    assert os.path.getsize(store._path("nextjs")) == 7 * 256 * 4
+
+
+@requires_numpy
+def test_store_reopens_and_resets_on_embedder_change(tmp_path):
+    """Test that vectors persist, but not across a change of embedder."""
+    directory = str(tmp_path / "vectors")
+    store = VectorStore(directory, HashingEmbedder(dim=256))
+    store.add_page("nextjs", "https://nextjs.org/docs/app", PAGE)
+    store.close()
+
+    reopened = VectorStore(directory, HashingEmbedder(dim=256))
+    assert reopened.search("nextjs", "cookies")[0].heading == "Cookies"
+    reopened.close()
+
+    resized = VectorStore(directory, HashingEmbedder(dim=128))
+    try:
+        assert resized.search("nextjs", "cookies") == []
+        assert resized.add_page("nextjs", "https://nextjs.org/docs/app", PAGE) == 3
+        assert resized.search("nextjs", "cookies")[0].heading == "Cookies"
+    finally:
+        resized.close()
+
+
+@requires_numpy
+def test_search_vectors_applies_min_score_and_switch():
+    """Test the shared store: disabled by default, then answering when enabled."""
+    assert index_page_vectors("nextjs", "https://nextjs.org/docs/app", PAGE) == 0
+    assert search_vectors("nextjs", "cookies") is None
+
+    with patch("vectors.SEMANTIC_SEARCH_ENABLED", True):
+        index_page_vectors("nextjs", "https://nextjs.org/docs/app", PAGE)
+        answer = search_vectors("nextjs", "setting cookies")
+        miss = search_vectors("nextjs", "database migrations")
+
+    assert "## Cookies" in answer
+    assert "Source: https://nextjs.org/docs/app" in answer
+    assert miss is None
+
+
+@requires_numpy
+def test_stores_sharing_a_directory_keep_rows_and_passages_aligned(tmp_path):
+    """Test that concurrent writers, like HTTP workers, do not corrupt the store.
+
+    Two stores on the same directory stand in for two worker processes;
+    each has its own database connection. After both added pages at the
+    same time, every vector row must still belong to its own passage.
+    """
+    import threading
+
+    directory = str(tmp_path / "vectors")
+    stores = [VectorStore(directory, HashingEmbedder(dim=64)) for _ in range(2)]
+    words = [f"topic{i}x{i}" for i in range(40)]
+
+    def add(store, indices):
+        for i in indices:
+            store.add_page("lib", f"https://x.com/{i}", f"# Page {i}\n\n{words[i]} " * 5)
+
+    threads = [
+        threading.Thread(target=add, args=(store, range(n, 40, 2)))
+        for n, store in enumerate(stores)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for store in stores:
+        store.close()
+
+    reopened = VectorStore(directory, HashingEmbedder(dim=64))
+    try:
+        assert os.path.getsize(reopened._path("lib")) == 40 * 64 * 4
+        for i, word in enumerate(words):
+            assert reopened.search("lib", word, top_k=1)[0].url == f"https://x.com/{i}"
+    finally:
+        reopened.close()
+
+
+def test_vector_retrieval_disabled_without_numpy():
+    """Test that a missing NumPy turns vector retrieval off instead of failing."""
+    with patch("vectors.SEMANTIC_SEARCH_ENABLED", True), patch.dict(
+        "sys.modules", {"numpy": None}
+    ):
+        assert not numpy_available()
+        assert vectors.get_vector_store() is None
+        assert search_vectors("nextjs", "cookies") is None
+
+
+def test_create_embedder_falls_back_to_hashing():
+    """Test that an unavailable local model falls back to feature hashing."""
+    with patch.dict("sys.modules", {"sentence_transformers": None}):
+        embedder = vectors.create_embedder("all-MiniLM-L6-v2")
+
+    assert isinstance(embedder, HashingEmbedder)
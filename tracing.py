@@ -0,0 +1,226 @@
+"""Structured timing instrumentation for the documentation search pipeline.
+
+Every stage of a get_docs call (library resolution, each search strategy,
+each fetch, parsing and output assembly) is timed with span() and emitted as
+one JSON line on stderr, never stdout, which carries the stdio MCP transport.
+Durations and counters are also aggregated in-process and can be exported in
+the Prometheus text format, or mirrored to OpenTelemetry when it is installed.
+"""
+
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from config import TRACE_ENABLED, LOG_LEVEL, OTEL_ENABLED
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "trace_id", default=None
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        event.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            event["exception"] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str)
+
+
+def get_logger(name: str = "docs") -> logging.Logger:
+    """Returns a logger writing JSON lines to stderr.
+
+    Args:
+        name (str): The logger name, a child of "docs"
+
+    Returns:
+        logging.Logger: The configured logger
+    """
+    root = logging.getLogger("docs")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return logging.getLogger(name)
+
+
+logger = get_logger("docs.trace")
+
+
+class Metrics:
+    """Thread-safe in-process counters and duration histograms."""
+
+    def __init__(self):
+        """Creates an empty metrics registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._durations: Dict[str, Dict[str, Any]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Adds to a counter.
+
+        Args:
+            name (str): The counter name, e.g. "page_cache"
+            value (float): The amount to add
+            **labels (str): Label values distinguishing series, e.g. result="hit"
+        """
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records the duration of one execution of a stage.
+
+        Args:
+            stage (str): The stage name, e.g. "fetch"
+            seconds (float): How long it took
+        """
+        with self._lock:
+            histogram = self._durations.setdefault(
+                stage, {"count": 0, "sum": 0.0, "buckets": [0] * len(DURATION_BUCKETS)}
+            )
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][index] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable copy of all metrics."""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "durations": {
+                    stage: {"count": h["count"], "sum": h["sum"]}
+                    for stage, h in self._durations.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"docs_{name}_total{{{label_text}}} {value}")
+            if self._durations:
+                lines.append("# TYPE docs_stage_duration_seconds histogram")
+            for stage, h in sorted(self._durations.items()):
+                series = "docs_stage_duration_seconds"
+                for bound, count in zip(DURATION_BUCKETS, h["buckets"]):
+                    lines.append(f'{series}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{series}_bucket{{stage="{stage}",le="+Inf"}} {h["count"]}')
+                lines.append(f'{series}_sum{{stage="{stage}"}} {h["sum"]}')
+                lines.append(f'{series}_count{{stage="{stage}"}} {h["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Clears all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._durations.clear()
+
+
+metrics = Metrics()
+
+
+def _otel_tracer():
+    """Returns an OpenTelemetry tracer, or None if disabled or not installed."""
+    if not OTEL_ENABLED:
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("mcp-server-documentation")
+
+
+def record(stage: str, seconds: float, **fields: Any) -> None:
+    """Records a completed stage: updates metrics and emits a JSON event.
+
+    Args:
+        stage (str): The stage name
+        seconds (float): How long the stage took
+        **fields (Any): Extra attributes for the event, e.g. url or bytes
+    """
+    metrics.observe(stage, seconds)
+    if TRACE_ENABLED:
+        event = {"trace_id": _trace_id.get(), "stage": stage}
+        event["duration_ms"] = round(seconds * 1000, 3)
+        event.update(fields)
+        logger.info("stage", extra={"fields": event})
+
+
+@contextmanager
+def span(stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """Times a block of code as a pipeline stage.
+
+    The yielded dict can be filled with attributes discovered while the stage
+    runs (e.g. bytes downloaded); they are included in the emitted event.
+
+    Args:
+        stage (str): The stage name, e.g. "search_strategy"
+        **fields (Any): Attributes known up front, e.g. the URL
+
+    Yields:
+        Dict[str, Any]: The mutable attributes of the event
+    """
+    tracer = _otel_tracer()
+    otel_span = tracer.start_as_current_span(stage) if tracer else None
+    current = otel_span.__enter__() if otel_span else None
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["error"] = type(e).__name__
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, **fields)
+        if current is not None:
+            for key, value in fields.items():
+                if isinstance(value, (str, bool, int, float)):
+                    current.set_attribute(key, value)
+        if otel_span is not None:
+            otel_span.__exit__(None, None, None)
+
+
+@contextmanager
+def trace(stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """Starts a new trace (one get_docs call) and times it as a stage.
+
+    All spans recorded inside share the trace's id, including those run in
+    tasks created within it.
+
+    Args:
+        stage (str): The stage name of the whole operation
+        **fields (Any): Attributes of the operation
+
+    Yields:
+        Dict[str, Any]: The mutable attributes of the event
+    """
+    token = _trace_id.set(uuid.uuid4().hex[:16])
+    try:
+        with span(stage, **fields) as attributes:
+            yield attributes
+    finally:
+        _trace_id.reset(token)
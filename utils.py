@@ -1,7 +1,243 @@
 """Utility functions for the MCP Documentation Search Server."""
 
-from typing import Optional
-from config import DOCS_URLS, LIBRARY_ALIASES
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from registry import get_registry
+
+# Size of the memo of recently resolved library names
+RESOLVER_CACHE_SIZE = 1024
+# Fuzzy candidates (by shared trigrams) checked with the edit distance
+FUZZY_CANDIDATES = 20
+# Unsupported-library errors list all libraries only up to this many
+MAX_LISTED_LIBRARIES = 10
+
+_SEPARATORS_RE = re.compile(r"[\s._\-/]+")
+
+
+def _compact(name: str) -> str:
+    """Drops separators so "next.js", "next-js" and "next js" compare equal."""
+    return _SEPARATORS_RE.sub("", name)
+
+
+def _trigrams(name: str) -> Set[str]:
+    """Returns the character trigrams of a name, padded at both ends."""
+    padded = f"  {name} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Computes the edit distance between two strings, counting transpositions.
+
+    Args:
+        a (str): The first string
+        b (str): The second string
+        limit (int): Distances above this are not needed exactly
+
+    Returns:
+        int: The distance, or limit + 1 if it is larger than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: list = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class LibraryResolver:
+    """Resolves user-supplied library names to a supported library and its URL.
+
+    All lookup tables are built once: exact names and aliases (also with
+    separators removed) resolve with a single dict lookup, and a trigram
+    index narrows fuzzy matching down to a few candidates that are then
+    checked with the edit distance. Results are memoized per input.
+    """
+
+    def __init__(
+        self,
+        docs_urls: Mapping[str, str],
+        aliases: Mapping[str, str],
+        cache_size: int = RESOLVER_CACHE_SIZE,
+    ):
+        """Builds the lookup tables.
+
+        Args:
+            docs_urls (Mapping[str, str]): Documentation URL per library name
+            aliases (Mapping[str, str]): Library name per alias
+            cache_size (int): Number of resolved inputs to memoize
+        """
+        self._urls = dict(docs_urls)
+        self._names: Dict[str, str] = {}
+        for name in self._urls:
+            self._add_key(name.lower(), name)
+        for alias, name in aliases.items():
+            if name in self._urls:
+                self._add_key(alias.lower(), name)
+        self._hosts = {
+            urlsplit(url).netloc.lower(): name for name, url in self._urls.items()
+        }
+        self._trigram_index: Dict[str, Set[str]] = {}
+        for key in self._names:
+            for trigram in _trigrams(key):
+                self._trigram_index.setdefault(trigram, set()).add(key)
+        self._resolve_normalized = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _add_key(self, key: str, name: str) -> None:
+        """Registers a lookup key and its separator-free form."""
+        self._names.setdefault(key, name)
+        self._names.setdefault(_compact(key), name)
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """The supported library names."""
+        return tuple(self._urls)
+
+    def suggest(self, library: str, limit: int = 3) -> List[str]:
+        """Lists the supported libraries whose names look most like the input.
+
+        Args:
+            library (str): The unresolved library name
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            List[str]: Library names, most similar first
+        """
+        shared = Counter(
+            key
+            for trigram in _trigrams(_compact(library.lower().strip()))
+            for key in self._trigram_index.get(trigram, ())
+        )
+        suggestions: List[str] = []
+        for key, count in shared.most_common():
+            name = self._names[key]
+            if len(suggestions) == limit or count < 2:
+                break
+            if name not in suggestions:
+                suggestions.append(name)
+        return suggestions
+
+    def resolve(self, library: Optional[str]) -> Optional[Tuple[str, str]]:
+        """Resolves a library name, alias or near-miss spelling.
+
+        Args:
+            library (Optional[str]): The library name as given by the caller
+
+        Returns:
+            Optional[Tuple[str, str]]: The library name and documentation URL,
+                or None if no supported library matches
+        """
+        normalized = (library or "").lower().strip()
+        if not normalized:
+            return None
+        return self._resolve_normalized(normalized)
+
+    def library_for_url(self, url: str) -> Optional[str]:
+        """Finds the library whose documentation host serves a URL.
+
+        Args:
+            url (str): A page URL
+
+        Returns:
+            Optional[str]: The library name, or None for unknown hosts
+        """
+        return self._hosts.get(urlsplit(url).netloc.lower())
+
+    def _lookup(self, normalized: str) -> Optional[Tuple[str, str]]:
+        """Resolves a lowercased, stripped name (memoized by resolve)."""
+        name = self._names.get(normalized) or self._names.get(_compact(normalized))
+        if name is None:
+            name = self._fuzzy(_compact(normalized))
+        return (name, self._urls[name]) if name else None
+
+    def _fuzzy(self, key: str) -> Optional[str]:
+        """Finds the closest known key within a length-dependent edit distance.
+
+        Names shorter than four characters are never fuzzy-matched, since a
+        single edit turns them into too many unrelated words.
+        """
+        limit = 0 if len(key) < 4 else 1 if len(key) < 8 else 2
+        if not limit:
+            return None
+        shared = Counter(
+            candidate
+            for trigram in _trigrams(key)
+            for candidate in self._trigram_index.get(trigram, ())
+        )
+        best, best_distance = None, limit + 1
+        for candidate, _ in shared.most_common(FUZZY_CANDIDATES):
+            distance = edit_distance(key, candidate, limit)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return self._names[best] if best else None
+
+
+_resolver: Optional[LibraryResolver] = None
+# The registry and registry version the resolver was built from
+_resolver_source: Tuple[object, int] = (None, -1)
+
+
+def get_library_resolver() -> LibraryResolver:
+    """Returns the shared resolver, rebuilt whenever the registry reloads."""
+    global _resolver, _resolver_source
+    registry = get_registry()
+    entries = registry.entries()
+    if _resolver is None or _resolver_source != (registry, registry.version):
+        _resolver = LibraryResolver(
+            {name: entry.url for name, entry in entries.items()},
+            {alias: name for name, entry in entries.items() for alias in entry.aliases},
+        )
+        _resolver_source = (registry, registry.version)
+    return _resolver
+
+
+def resolve_library(library: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Resolves a library name to its normalized name and documentation URL.
+
+    Args:
+        library (Optional[str]): The library name, alias or a close misspelling
+
+    Returns:
+        Optional[Tuple[str, str]]: The library name and documentation URL, or
+            None if the library is not supported
+    """
+    return get_library_resolver().resolve(library)
+
+
+def unsupported_library_message(library: Optional[str]) -> str:
+    """Builds the error returned for a library that could not be resolved.
+
+    Close matches are suggested when there are any. Otherwise the supported
+    libraries are listed, but only while there are few of them.
+
+    Args:
+        library (Optional[str]): The library name as given by the caller
+
+    Returns:
+        str: The error message
+    """
+    resolver = get_library_resolver()
+    suggestions = resolver.suggest(library or "")
+    if suggestions:
+        return f"❌ Library not supported: {library}. Did you mean: {', '.join(suggestions)}?"
+    names = resolver.names
+    if len(names) <= MAX_LISTED_LIBRARIES:
+        return f"❌ Library not supported: {library}. Available libraries: {', '.join(names)}"
+    return (
+        f"❌ Library not supported: {library}. {len(names)} libraries are available; "
+        "call list_libraries to see them."
+    )
 
 
 def normalize_library_name(library: Optional[str]) -> Optional[str]:
@@ -9,9 +245,8 @@ def normalize_library_name(library: Optional[str]) -> Optional[str]:
 
     This function processes library names to match their standard form by:
     1. Converting to lowercase and removing whitespace
-    2. Checking against known aliases
-    3. Validating against supported libraries
-    4. Attempting partial matching as fallback
+    2. Checking against known names and aliases, with or without separators
+    3. Falling back to the closest known name within a small edit distance
 
     Args:
         library (Optional[str]): The library name to normalize
@@ -27,20 +262,8 @@ def normalize_library_name(library: Optional[str]) -> Optional[str]:
     if not normalized:  # Handle strings that are only whitespace
         return None
 
-    # Check if it's a known variation
-    if normalized in LIBRARY_ALIASES:
-        return LIBRARY_ALIASES[normalized]
-
-    # If already a valid name, return as is
-    if normalized in DOCS_URLS:
-        return normalized
-
-    # Try partial matching
-    for valid_name in DOCS_URLS.keys():
-        if valid_name in normalized or normalized in valid_name:
-            return valid_name
-
-    return normalized
+    resolved = resolve_library(normalized)
+    return resolved[0] if resolved else normalized
 
 
 def validate_library(library: Optional[str]) -> Optional[str]:
@@ -52,11 +275,8 @@ def validate_library(library: Optional[str]) -> Optional[str]:
     Returns:
         Optional[str]: The normalized library name if supported, None otherwise
     """
-    if not library:  # Handle None or empty string
-        return None
-
-    normalized = normalize_library_name(library)
-    return normalized if normalized and normalized in DOCS_URLS else None
+    resolved = resolve_library(library)
+    return resolved[0] if resolved else None
 
 
 def get_library_url(library: str) -> Optional[str]:
@@ -68,5 +288,17 @@ def get_library_url(library: str) -> Optional[str]:
     Returns:
         Optional[str]: The documentation URL if library is supported, None otherwise
     """
-    normalized = normalize_library_name(library)
-    return DOCS_URLS.get(normalized) if normalized else None
+    resolved = resolve_library(library)
+    return resolved[1] if resolved else None
+
+
+def get_library_for_url(url: str) -> Optional[str]:
+    """Finds the library whose documentation site a URL belongs to.
+
+    Args:
+        url (str): A page URL, e.g. from a search result
+
+    Returns:
+        Optional[str]: The library name if the URL is on a known docs host, None otherwise
+    """
+    return get_library_resolver().library_for_url(url)
@@ -0,0 +1,530 @@
+"""Local vector retrieval over cached and crawled documentation passages.
+
+Keyword search misses questions that use different words than the docs.
+With SEMANTIC_SEARCH_ENABLED, passages of the page cache and the offline
+index are embedded into vectors, and get_docs answers from the passages most
+similar to the query before falling back to web search. Everything runs
+locally on the CPU.
+
+Passages are embedded with a small local sentence-transformers model when
+VECTOR_MODEL names one that is installed, and otherwise by feature hashing
+of words and character trigrams, which needs no model at all. The vectors
+of each library are rows of a float32 matrix in a raw file that is searched
+through a NumPy memory map with a single matrix-vector product. Newly cached
+pages are appended as they arrive; passages of a page that changed are
+deactivated rather than rewritten.
+
+NumPy is an optional dependency: without it, vector retrieval is disabled.
+Run ``python vectors.py [library ...]`` to embed the passages already in the
+local index and page cache.
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from config import (
+    SEMANTIC_SEARCH_ENABLED,
+    VECTOR_INDEX_PATH,
+    VECTOR_DIM,
+    VECTOR_MODEL,
+    VECTOR_TOP_K,
+    VECTOR_MIN_SCORE,
+)
+from indexing import SearchHit, format_hits, tokenize
+from ranking import split_passages
+from registry import get_library, get_registry
+from tracing import get_logger
+
+# NumPy is imported on first use, since it is optional and slow to import
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = get_logger("docs.vectors")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def numpy_available() -> bool:
+    """Checks whether the optional NumPy dependency is installed.
+
+    Returns:
+        bool: True if numpy can be imported, False otherwise
+    """
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _features(text: str) -> Counter:
+    """Lists the hashed features of a text: words and character trigrams.
+
+    Trigrams of each word (with boundary marks) let different forms of a
+    word, e.g. "configure" and "configuration", share most features.
+    """
+    features: Counter = Counter()
+    for word in _WORD_RE.findall(text.lower()):
+        features[word] += 1.0
+        if len(word) > 3:
+            marked = f"<{word}>"
+            for i in range(len(marked) - 2):
+                features["#" + marked[i : i + 3]] += 0.5
+    return features
+
+
+class HashingEmbedder:
+    """Embeds texts by feature hashing, without any model.
+
+    Each feature is hashed to one of dim dimensions with a random sign, and
+    weighted by log(1 + count). Vectors are L2-normalized, so
+    the dot product of two vectors is their cosine similarity.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        """Creates the embedder.
+
+        Args:
+            dim (int): Number of dimensions of the vectors
+        """
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """Embeds texts.
+
+        Args:
+            texts (Sequence[str]): The texts
+
+        Returns:
+            np.ndarray: One normalized float32 row per text
+        """
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = _features(text)
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode()) for feature in features),
+                dtype=np.uint32,
+                count=len(features),
+            )
+            weights = np.fromiter(
+                (math.log1p(count) for count in features.values()),
+                dtype=np.float32,
+                count=len(features),
+            )
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dim, signs * weights)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class ModelEmbedder:
+    """Embeds texts with a local sentence-transformers model on the CPU."""
+
+    def __init__(self, model: str):
+        """Loads the model.
+
+        Args:
+            model (str): Model name or path, e.g. "all-MiniLM-L6-v2"; it must
+                already be downloaded, since nothing is fetched at runtime
+
+        Raises:
+            ImportError: If sentence-transformers is not installed
+            OSError: If the model is not available locally
+        """
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model, device="cpu", local_files_only=True)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"model-{model}"
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """Embeds texts.
+
+        Args:
+            texts (Sequence[str]): The texts
+
+        Returns:
+            np.ndarray: One normalized float32 row per text
+        """
+        import numpy as np
+
+        vectors = self._model.encode(list(texts), normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def create_embedder(model: Optional[str] = VECTOR_MODEL) -> Any:
+    """Creates the configured embedder, falling back to feature hashing.
+
+    Args:
+        model (Optional[str]): A local sentence-transformers model, or None
+
+    Returns:
+        Any: A ModelEmbedder if the model could be loaded, otherwise a HashingEmbedder
+    """
+    if model:
+        try:
+            return ModelEmbedder(model)
+        except (ImportError, OSError) as e:
+            logger.warning(
+                "vector_model_unavailable",
+                extra={"fields": {"model": model, "error": repr(e)}},
+            )
+    return HashingEmbedder()
+
+
+class VectorStore:
+    """Passage vectors per library, searched through memory-mapped matrices.
+
+    The vectors of a library are stored row by row in "<library>.f32" in
+    the store directory; the passages themselves and which rows are still
+    active live in a SQLite database next to them. Rows are only appended.
+    Re-adding a page deactivates its previous rows, and a library embedded
+    with a different embedder is cleared before new rows are added.
+
+    Several processes, e.g. the workers of the HTTP server, may share a
+    store directory: vectors are appended and recorded inside one
+    "BEGIN IMMEDIATE" transaction, which holds the database write lock, so
+    only one process at a time appends to the vector files.
+    """
+
+    def __init__(self, directory: str, embedder: Any):
+        """Opens (and creates if needed) the store.
+
+        Args:
+            directory (str): Directory holding the vector files and database
+            embedder (Any): A HashingEmbedder or ModelEmbedder
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "passages.sqlite3"), check_same_thread=False, timeout=10.0
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS libraries (
+                library TEXT PRIMARY KEY,
+                embedder TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                library TEXT NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS passages (
+                library TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                heading TEXT NOT NULL,
+                text TEXT NOT NULL,
+                active INTEGER NOT NULL,
+                PRIMARY KEY (library, row)
+            );
+            CREATE INDEX IF NOT EXISTS passages_url ON passages (url);
+            """
+        )
+        self._conn.commit()
+        # Per library: (version, memory-mapped matrix, active row mask)
+        self._matrices: Dict[str, Tuple[int, Any, Any]] = {}
+
+    def _path(self, library: str) -> str:
+        """Returns the path of a library's vector file."""
+        return os.path.join(self.directory, f"{library}.f32")
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """Runs a block in a write transaction, locking out other processes.
+
+        The caller must hold self._lock.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _library_state(self, library: str) -> Tuple[int, int]:
+        """Returns the row count and version of a library, resetting it if needed.
+
+        A library embedded with another embedder is cleared, since its
+        vectors cannot be compared with the current ones. Must run inside
+        _write(), as the reset changes both the database and the files.
+        """
+        row = self._conn.execute(
+            "SELECT embedder, rows, version FROM libraries WHERE library = ?", (library,)
+        ).fetchone()
+        if row is not None and row[0] == self.embedder.name:
+            return row[1], row[2]
+        version = row[2] + 1 if row else 0
+        self._conn.execute("DELETE FROM passages WHERE library = ?", (library,))
+        self._conn.execute("DELETE FROM pages WHERE library = ?", (library,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO libraries VALUES (?, ?, 0, ?)",
+            (library, self.embedder.name, version),
+        )
+        # Unlink rather than truncate, so that existing memory maps stay valid
+        self._matrices.pop(library, None)
+        if os.path.exists(self._path(library)):
+            os.remove(self._path(library))
+        return 0, version
+
+    def add_page(self, library: str, url: str, content: str) -> int:
+        """Embeds the passages of a page unless they are already stored.
+
+        Args:
+            library (str): The library the page belongs to
+            url (str): The page URL
+            content (str): The extracted page text
+
+        Returns:
+            int: The number of passages embedded, 0 if the page is unchanged
+        """
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock, self._write():
+            self._library_state(library)
+            if self._stored_hash(library, url) == content_hash:
+                return 0
+        passages = split_passages(url, content)
+        # Embed outside the locks; it is the slow part
+        vectors = self.embedder.embed([f"{p.heading}\n{p.text}" for p in passages])
+        with self._lock, self._write():
+            rows, version = self._library_state(library)
+            # Another process may have stored the page in the meantime
+            if self._stored_hash(library, url) == content_hash:
+                return 0
+            path = self._path(library)
+            # Drop rows of an append that was interrupted before it was recorded
+            if os.path.exists(path) and os.path.getsize(path) > rows * self.embedder.dim * 4:
+                os.truncate(path, rows * self.embedder.dim * 4)
+            with open(path, "ab") as file:
+                file.write(vectors.tobytes())
+            self._conn.execute("UPDATE passages SET active = 0 WHERE url = ?", (url,))
+            self._conn.executemany(
+                "INSERT INTO passages VALUES (?, ?, ?, ?, ?, 1)",
+                [
+                    (library, rows + i, url, passage.heading, passage.text)
+                    for i, passage in enumerate(passages)
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", (url, library, content_hash)
+            )
+            self._conn.execute(
+                "UPDATE libraries SET rows = ?, version = ? WHERE library = ?",
+                (rows + len(passages), version + 1, library),
+            )
+        return len(passages)
+
+    def _stored_hash(self, library: str, url: str) -> Optional[str]:
+        """Returns the content hash of a page's stored passages, if any."""
+        row = self._conn.execute(
+            "SELECT content_hash FROM pages WHERE url = ? AND library = ?", (url, library)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _matrix(self, library: str) -> Optional[Tuple[Any, Any]]:
+        """Maps a library's vectors into memory, reusing the map while unchanged.
+
+        Returns:
+            Optional[Tuple[Any, Any]]: The (rows, dim) matrix and the mask of
+                active rows, or None if the library has no vectors
+        """
+        import numpy as np
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedder, rows, version FROM libraries WHERE library = ?", (library,)
+            ).fetchone()
+            if row is None or row[0] != self.embedder.name or not row[1]:
+                return None
+            _, rows, version = row
+            cached = self._matrices.get(library)
+            if cached is not None and cached[0] == version:
+                return cached[1], cached[2]
+            path = self._path(library)
+            # Missing or short if a reset was interrupted before it was recorded
+            if not os.path.exists(path) or os.path.getsize(path) < rows * self.embedder.dim * 4:
+                return None
+            matrix = np.memmap(
+                path, dtype=np.float32, mode="r", shape=(rows, self.embedder.dim)
+            )
+            active = np.zeros(rows, dtype=bool)
+            # Rows added by another process since rows was read are not mapped yet
+            active_rows = [
+                row
+                for (row,) in self._conn.execute(
+                    "SELECT row FROM passages WHERE library = ? AND active = 1 AND row < ?",
+                    (library, rows),
+                )
+            ]
+            active[active_rows] = True
+            self._matrices[library] = (version, matrix, active)
+        return matrix, active
+
+    def search(self, library: str, query: str, top_k: int = VECTOR_TOP_K) -> List[SearchHit]:
+        """Finds the passages of a library most similar to a query.
+
+        Args:
+            library (str): The library to search
+            query (str): The search query
+            top_k (int): Maximum number of passages to return
+
+        Returns:
+            List[SearchHit]: The best passages, scored by cosine similarity, best first
+        """
+        import numpy as np
+
+        mapped = self._matrix(library)
+        if mapped is None or not tokenize(query):
+            return []
+        matrix, active = mapped
+        scores = matrix @ self.embedder.embed([query])[0]
+        scores[~active] = -np.inf
+        k = min(top_k, int(active.sum()))
+        if not k:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        hits = []
+        with self._lock:
+            for row in best:
+                url, heading, text = self._conn.execute(
+                    "SELECT url, heading, text FROM passages WHERE library = ? AND row = ?",
+                    (library, int(row)),
+                ).fetchone()
+                hits.append(SearchHit(url=url, heading=heading, text=text, score=float(scores[row])))
+        return hits
+
+    def close(self) -> None:
+        """Releases the memory maps and closes the database connection."""
+        with self._lock:
+            self._matrices.clear()
+            self._conn.close()
+
+
+_vector_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> Optional[VectorStore]:
+    """Returns the shared vector store, opening it on first use.
+
+    Returns:
+        Optional[VectorStore]: The store, or None if vector retrieval is
+            disabled or NumPy is not installed
+    """
+    global _vector_store
+    if not SEMANTIC_SEARCH_ENABLED or not numpy_available():
+        return None
+    if _vector_store is None:
+        _vector_store = VectorStore(VECTOR_INDEX_PATH, create_embedder())
+    return _vector_store
+
+
+def close_vector_store() -> None:
+    """Closes the shared vector store if it is open."""
+    global _vector_store
+    if _vector_store is not None:
+        _vector_store.close()
+        _vector_store = None
+
+
+def index_page_vectors(library: Optional[str], url: str, content: str) -> int:
+    """Embeds a newly cached page, if vector retrieval is enabled.
+
+    Args:
+        library (Optional[str]): The library the page belongs to, None for unknown sites
+        url (str): The page URL
+        content (str): The extracted page text
+
+    Returns:
+        int: The number of passages embedded
+    """
+    store = get_vector_store()
+    if store is None or library is None:
+        return 0
+    return store.add_page(library, url, content)
+
+
+def search_vectors(library: str, query: str) -> Optional[str]:
+    """Answers a query from the passages most similar to it.
+
+    Args:
+        library (str): The normalized library name
+        query (str): The search query
+
+    Returns:
+        Optional[str]: The formatted passages scoring at least
+            VECTOR_MIN_SCORE, or None if there are none
+    """
+    store = get_vector_store()
+    if store is None:
+        return None
+    hits = [hit for hit in store.search(library, query) if hit.score >= VECTOR_MIN_SCORE]
+    return format_hits(hits) if hits else None
+
+
+def _indexed_pages(library: str) -> Dict[str, str]:
+    """Collects the text of a library's pages from the page cache and local index."""
+    from cache import get_page_cache
+    from indexing import get_docs_index
+
+    pages: Dict[str, str] = {}
+    index = get_docs_index()
+    if index is not None:
+        for section in index.sections(library):
+            heading = f"# {section.heading}\n\n" if section.heading else ""
+            pages[section.url] = pages.get(section.url, "") + f"{heading}{section.text}\n\n"
+    page_cache = get_page_cache()
+    if page_cache is not None:
+        pages.update(page_cache.pages(library))
+    return pages
+
+
+def main(libraries: List[str]) -> None:
+    """Embeds the cached and indexed pages of the given libraries.
+
+    Args:
+        libraries (List[str]): Library names from the registry
+    """
+    store = VectorStore(VECTOR_INDEX_PATH, create_embedder())
+    try:
+        for library in libraries:
+            pages = _indexed_pages(library)
+            embedded = sum(store.add_page(library, url, text) for url, text in pages.items())
+            print(f"{library}: {len(pages)} pages, {embedded} passages embedded")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Embed cached and indexed documentation for vector retrieval."
+    )
+    parser.add_argument("libraries", nargs="*", help="Libraries to embed (default: all)")
+    selected = parser.parse_args().libraries or get_registry().names()
+    unknown = [library for library in selected if not get_library(library)]
+    if unknown:
+        parser.error(f"unknown libraries: {', '.join(unknown)}")
+    if not numpy_available():
+        parser.error("vector retrieval requires numpy: pip install numpy")
+    main(selected)